@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Admission Control
+قبول أو رفض طلبات البحث حسب زمن الانتظار المتوقع لكل لعبة
+- عدد عمليات الجلب الجارية من المصدر لكل لعبة
+- زمن الخدمة الأخير لكل لعبة (وسيط آخر العينات)
+- رفض الطلب الذي لا يمكن خدمته خلال الهدف (SLO) مع مدة دقيقة لإعادة المحاولة
+"""
+
+import math
+import statistics
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+
+@dataclass
+class AdmissionDecision:
+    """نتيجة فحص القبول لطلب واحد"""
+    admitted: bool
+    position: int  # ترتيب الطلب في قائمة الانتظار (0 = يُخدم فوراً)
+    eta: float  # الزمن المتوقع لاكتمال الطلب بالثواني
+    retry_after: int = 0  # الثواني قبل إعادة المحاولة (عند الرفض فقط)
+
+class AdmissionController:
+    """تقدير زمن الانتظار لكل لعبة من عدد العمليات الجارية وزمن الخدمة الأخير"""
+
+    def __init__(self, slo: float = 30.0, default_service_time: float = 2.0, samples_max: int = 100):
+        self.slo = slo
+        self.default_service_time = default_service_time
+        self.samples_max = samples_max
+        self._inflight: Dict[str, int] = {}
+        self._samples: Dict[str, Deque[float]] = {}
+        self.stats = {
+            "admitted": 0,
+            "admitted_best_effort": 0,
+            "rejected": 0
+        }
+
+    def service_time(self, game_type: str) -> float:
+        """زمن الخدمة المتوقع لعملية جلب واحدة (الوسيط، أو القيمة الافتراضية قبل أول عينة)"""
+        samples = self._samples.get(game_type)
+        if not samples:
+            return self.default_service_time
+        return statistics.median(samples)
+
+    def evaluate(self, game_type: str, concurrency: int, slo: Optional[float] = None) -> AdmissionDecision:
+        """
+        تقدير زمن اكتمال طلب جديد وتحديد قبوله
+
+        Args:
+            game_type (str): الاسم الموحد للعبة
+            concurrency (int): عدد عمليات الجلب المتوازية الممكنة للعبة
+            slo (float): أقصى زمن مقبول بالثواني (افتراضياً self.slo)
+        """
+        slo = self.slo if slo is None else slo
+        concurrency = max(1, concurrency)
+        service = self.service_time(game_type)
+
+        # الطلبات الزائدة عن عدد الخانات تنتظر دورها - كل خانة تُنهي طلباً كل service ثانية
+        waiting_ahead = self._inflight.get(game_type, 0) - concurrency + 1
+        if waiting_ahead <= 0:
+            position, wait = 0, 0.0
+        else:
+            position = waiting_ahead
+            wait = waiting_ahead / concurrency * service
+        eta = wait + service
+
+        if eta <= slo or position == 0:
+            # بدون انتظار لا يفيد الرفض: الحمل ليس السبب وإعادة المحاولة لن تقصر زمن الخدمة نفسه
+            # (مهلة العميل أقصر من وسيط زمن الخدمة) - الطلب يُقبل بأفضل جهد ضمن مهلته
+            self.stats["admitted"] += 1
+            if eta > slo:
+                self.stats["admitted_best_effort"] += 1
+            return AdmissionDecision(admitted=True, position=position, eta=eta)
+
+        # الانتظار يقل بمعدل ثانية لكل ثانية - إعادة المحاولة عندما يصبح الانتظار ضمن ما يتبقى من الهدف بعد زمن الخدمة
+        self.stats["rejected"] += 1
+        return AdmissionDecision(admitted=False, position=position, eta=eta,
+                                 retry_after=max(1, math.ceil(wait - max(0.0, slo - service))))
+
+    @asynccontextmanager
+    async def track(self, game_type: str, concurrency: int):
+        """تسجيل عملية جلب جارية من المصدر وقياس زمن خدمتها"""
+        # العينة تُسجل فقط إذا بدأت العملية بخانة متاحة (بدون انتظار داخل قائمة اللعبة نفسها)
+        queued = self._inflight.get(game_type, 0) >= max(1, concurrency)
+        self._inflight[game_type] = self._inflight.get(game_type, 0) + 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._inflight[game_type] -= 1
+            if not queued:
+                samples = self._samples.setdefault(game_type, deque(maxlen=self.samples_max))
+                samples.append(time.monotonic() - started)
+
+    def get_stats(self) -> Dict:
+        """الحصول على إحصائيات القبول لعرضها في /stats"""
+        games = set(self._inflight) | set(self._samples)
+        return {
+            **self.stats,
+            "slo": self.slo,
+            "games": {
+                game: {
+                    "inflight": self._inflight.get(game, 0),
+                    "service_time": self.service_time(game)
+                }
+                for game in sorted(games)
+            }
+        }
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Static Asset Cache
+ذاكرة مشتركة لملفات JS/CSS الثابتة لصفحات MidasBuy بين جميع المتصفحات
+- المحتوى مخزن حسب بصمته (SHA-256) على القرص ويبقى بعد إعادة التشغيل
+- طبقة في الذاكرة لأكثر الملفات استخداماً
+- حد أقصى للحجم مع حذف الأقل استخداماً (LRU)
+- يحترم Cache-Control: لا يخزن no-store / no-cache / private أو ما ليس له max-age، وينتهي الملف بعد max-age
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger("istation.pubg.assets")
+
+INDEX_FILE = "index.json"
+UNCACHEABLE_DIRECTIVES = {"no-store", "no-cache", "private"}
+
+def freshness_lifetime(headers: Dict[str, str]) -> Optional[float]:
+    """
+    مدة صلاحية الملف بالثواني من Cache-Control
+
+    Returns:
+        max-age أو None إذا كان الملف غير قابل للتخزين (no-store / no-cache / private / بدون max-age)
+    """
+    value = next((value for name, value in headers.items() if name.lower() == "cache-control"), "")
+    max_age = None
+    for directive in value.lower().split(","):
+        name, _, argument = directive.strip().partition("=")
+        if name in UNCACHEABLE_DIRECTIVES:
+            return None
+        if name == "max-age":
+            try:
+                max_age = int(argument.strip().strip('"'))
+            except ValueError:
+                return None
+    if max_age is None or max_age <= 0:
+        return None
+    return float(max_age)
+
+class StaticAssetCache:
+    """ذاكرة ملفات ثابتة مفتاحها الرابط ومحتواها مخزن حسب البصمة"""
+
+    def __init__(self, directory: str, max_bytes: int = 200 * 1024 * 1024,
+                 memory_max_bytes: int = 50 * 1024 * 1024, save_every: int = 20,
+                 clock: Callable[[], float] = time.time):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        self.save_every = save_every
+        self._clock = clock
+
+        # الرابط -> (البصمة، الحجم، headers، وقت انتهاء الصلاحية) بترتيب الاستخدام (الأقدم أولاً)
+        self._index: "OrderedDict[str, Tuple[str, int, Dict[str, str], float]]" = OrderedDict()
+        # البصمة -> عدد الروابط التي تستخدمها، ومجموع أحجام البصمات المختلفة (المحتوى المكرر يُحسب مرة)
+        # يُحدثان مع كل تعديل للفهرس (_link / _unlink) فلا يُعاد حساب الحجم بالمرور على الفهرس كاملاً
+        self._refs: Dict[str, int] = {}
+        self._size_bytes = 0
+        # البصمة -> المحتوى (طبقة الذاكرة)
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._unsaved = 0
+        self.stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+            "uncacheable": 0,
+            "bytes_served": 0
+        }
+
+    # ===== عمليات القرص (تعمل في خيط منفصل) =====
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest)
+
+    def _load_index(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        now = self._clock()
+        for entry in entries:
+            # مدخلات بدون وقت انتهاء (نسخة أقدم من الفهرس) أو منتهية الصلاحية لا تُحمل
+            if len(entry) != 5:
+                continue
+            url, digest, size, headers, expires = entry
+            if expires > now and os.path.exists(self._path(digest)):
+                self._link(url, (digest, size, headers, expires))
+
+    def _save_index(self, entries: list):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(path + ".tmp", path)
+
+    def _read(self, digest: str) -> Optional[bytes]:
+        try:
+            with open(self._path(digest), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, digest: str, body: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(digest)
+        if not os.path.exists(path):
+            with open(path + ".tmp", "wb") as f:
+                f.write(body)
+            os.replace(path + ".tmp", path)
+
+    def _delete(self, digests: list):
+        for digest in digests:
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    # ===== الواجهة غير المتزامنة =====
+
+    async def load(self):
+        """تحميل فهرس الملفات المحفوظة من تشغيل سابق"""
+        try:
+            await self._run(self._load_index)
+            logger.info("📦 ذاكرة الملفات الثابتة: %s ملف (%.1fMB)", len(self._index), self.size_bytes / 1024 / 1024)
+        except Exception as e:
+            logger.warning("⚠️ فشل في تحميل فهرس ذاكرة الملفات الثابتة: %s", e)
+
+    @property
+    def size_bytes(self) -> int:
+        # ملفات بنفس البصمة تُحسب مرة واحدة
+        return self._size_bytes
+
+    def _link(self, url: str, entry: Tuple[str, int, Dict[str, str], float]) -> Optional[str]:
+        """
+        إضافة رابط للفهرس (أو استبدال مدخله) مع تحديث العدادات
+
+        Returns:
+            بصمة المحتوى القديم للرابط إذا لم يعد يستخدمها أي رابط
+        """
+        orphan = self._unlink(url)
+        self._index[url] = entry
+        digest = entry[0]
+        self._refs[digest] = self._refs.get(digest, 0) + 1
+        if self._refs[digest] == 1:
+            self._size_bytes += entry[1]
+        return orphan if orphan != digest else None
+
+    def _unlink(self, url: str) -> Optional[str]:
+        """
+        حذف رابط من الفهرس مع تحديث العدادات
+
+        Returns:
+            البصمة إذا لم يعد يستخدمها أي رابط (يُحذف محتواها) أو None
+        """
+        entry = self._index.pop(url, None)
+        if entry is None:
+            return None
+        digest = entry[0]
+        self._refs[digest] -= 1
+        if self._refs[digest]:
+            return None
+        del self._refs[digest]
+        self._size_bytes -= entry[1]
+        return digest
+
+    async def get(self, url: str) -> Optional[Tuple[bytes, Dict[str, str]]]:
+        """
+        جلب ملف مخزن لم تنتهِ صلاحيته
+
+        Returns:
+            (المحتوى، headers) أو None
+        """
+        entry = self._index.get(url)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+
+        digest, size, headers, expires = entry
+        if expires <= self._clock():
+            # انتهت صلاحية max-age - يُحمل من الموقع من جديد
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            await self._remove([url])
+            return None
+        self._index.move_to_end(url)
+
+        body = self._memory.get(digest)
+        if body is not None:
+            self._memory.move_to_end(digest)
+            self.stats["memory_hits"] += 1
+        else:
+            body = await self._run(self._read, digest)
+            if body is None:
+                self._unlink(url)
+                self.stats["misses"] += 1
+                return None
+            self._remember(digest, body)
+
+        self.stats["hits"] += 1
+        self.stats["bytes_served"] += size
+        return body, headers
+
+    async def put(self, url: str, body: bytes, headers: Dict[str, str]):
+        """تخزين ملف بعد أول تحميل له حتى انتهاء max-age في Cache-Control"""
+        lifetime = freshness_lifetime(headers)
+        if lifetime is None:
+            self.stats["uncacheable"] += 1
+            if url in self._index:
+                await self._remove([url])
+            return
+        if len(body) > self.max_bytes:
+            return
+        digest = hashlib.sha256(body).hexdigest()
+        try:
+            await self._run(self._write, digest, body)
+        except Exception as e:
+            logger.warning("⚠️ فشل في حفظ ملف ثابت: %s", e)
+            return
+
+        orphan = self._link(url, (digest, len(body), headers, self._clock() + lifetime))
+        self._remember(digest, body)
+        self.stats["stores"] += 1
+        if orphan is not None:
+            await self._discard({orphan})
+        await self._evict()
+
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            await self.save()
+
+    def _remember(self, digest: str, body: bytes):
+        """إضافة المحتوى لطبقة الذاكرة مع حذف الأقدم عند تجاوز الحد"""
+        if digest in self._memory:
+            self._memory.move_to_end(digest)
+            return
+        self._memory[digest] = body
+        self._memory_bytes += len(body)
+        while self._memory_bytes > self.memory_max_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    async def _evict(self):
+        """حذف الأقل استخداماً حتى يصبح الحجم ضمن الحد"""
+        digests = set()
+        while self._index and self._size_bytes > self.max_bytes:
+            digests.add(self._unlink(next(iter(self._index))))
+            self.stats["evictions"] += 1
+        digests.discard(None)
+        await self._discard(digests)
+
+    async def _remove(self, urls: list):
+        """حذف روابط من الفهرس (منتهية الصلاحية أو لم تعد قابلة للتخزين)"""
+        digests = {self._unlink(url) for url in urls}
+        digests.discard(None)
+        await self._discard(digests)
+
+    async def _discard(self, digests: set):
+        """حذف المحتوى من القرص والذاكرة إذا لم يعد يستخدمه أي رابط"""
+        removed = [digest for digest in digests if digest not in self._refs]
+        for digest in removed:
+            body = self._memory.pop(digest, None)
+            if body is not None:
+                self._memory_bytes -= len(body)
+        if removed:
+            await self._run(self._delete, removed)
+
+    async def save(self):
+        """حفظ الفهرس على القرص"""
+        self._unsaved = 0
+        entries = [[url, *entry] for url, entry in self._index.items()]
+        try:
+            await self._run(self._save_index, entries)
+        except Exception as e:
+            logger.warning("⚠️ فشل في حفظ فهرس ذاكرة الملفات الثابتة: %s", e)
+
+    def get_stats(self) -> Dict:
+        """الحصول على إحصائيات ذاكرة الملفات الثابتة"""
+        return {
+            **self.stats,
+            "entries": len(self._index),
+            "size_mb": self.size_bytes / 1024 / 1024,
+            "memory_mb": self._memory_bytes / 1024 / 1024,
+            "directory": self.directory
+        }
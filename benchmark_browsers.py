@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+مقارنة أداء توزيع خانات PUBG
+- متصفح Chromium كامل لكل خانة (الوضع الحالي)
+- عدة BrowserContext داخل عملية Chromium واحدة
+يقيس الذاكرة (RSS و USS) لكل خانة وعدد عمليات البحث في الثانية
+
+الاستخدام:
+    python benchmark_browsers.py --slots 6 --contexts-per-browser 6 --lookups 30
+"""
+
+import argparse
+import asyncio
+import time
+
+import psutil
+
+from pubg_player import BrowserManager
+
+def measure_process_tree() -> dict:
+    """قياس ذاكرة جميع العمليات الفرعية (Playwright driver + Chromium)"""
+    rss = 0
+    uss = 0
+    count = 0
+    for child in psutil.Process().children(recursive=True):
+        try:
+            info = child.memory_full_info()
+            rss += info.rss
+            uss += getattr(info, "uss", 0)
+            count += 1
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return {"rss_mb": rss / 1024 / 1024, "uss_mb": uss / 1024 / 1024, "processes": count}
+
+async def run_layout(slots: int, contexts_per_browser: int, player_id: str, lookups: int) -> dict:
+    """تشغيل توزيع واحد وقياس الذاكرة والإنتاجية"""
+    manager = BrowserManager(browser_count=slots, headless=True, contexts_per_browser=contexts_per_browser)
+    try:
+        started = time.perf_counter()
+        if not await manager.initialize():
+            return {"error": "فشل في التهيئة"}
+        startup_time = time.perf_counter() - started
+
+        status = await manager.get_status()
+        memory = measure_process_tree()
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*[manager.process_request(player_id) for _ in range(lookups)])
+        elapsed = time.perf_counter() - started
+        successes = sum(1 for result in results if result.get('success') or result.get('not_found'))
+
+        return {
+            "slots": slots,
+            "ready_slots": status['ready'],
+            "contexts_per_browser": contexts_per_browser,
+            "chromium_processes": status['chromium_processes'],
+            "startup_time": startup_time,
+            "rss_per_slot_mb": memory["rss_mb"] / max(1, slots),
+            "uss_per_slot_mb": memory["uss_mb"] / max(1, slots),
+            "total_rss_mb": memory["rss_mb"],
+            "lookups": lookups,
+            "completed": successes,
+            "lookups_per_second": lookups / elapsed if elapsed > 0 else 0
+        }
+    finally:
+        await manager.cleanup()
+
+def print_result(title: str, result: dict):
+    """طباعة نتيجة توزيع واحد"""
+    print(f"\n📊 {title}")
+    print("-" * 50)
+    if "error" in result:
+        print(f"❌ {result['error']}")
+        return
+    print(f"🧩 الخانات الجاهزة: {result['ready_slots']}/{result['slots']} - عمليات Chromium: {result['chromium_processes']}")
+    print(f"⏱️ وقت التهيئة: {result['startup_time']:.1f}ث")
+    print(f"💾 RSS لكل خانة: {result['rss_per_slot_mb']:.0f}MB (USS: {result['uss_per_slot_mb']:.0f}MB) - الإجمالي: {result['total_rss_mb']:.0f}MB")
+    print(f"⚡ عمليات البحث في الثانية: {result['lookups_per_second']:.2f} ({result['completed']}/{result['lookups']} مكتملة)")
+
+async def main():
+    """الدالة الرئيسية"""
+    parser = argparse.ArgumentParser(description="مقارنة توزيع خانات متصفحات PUBG")
+    parser.add_argument("--slots", type=int, default=6, help="عدد خانات البحث المتوازية")
+    parser.add_argument("--contexts-per-browser", type=int, default=6, help="عدد الخانات داخل كل عملية Chromium")
+    parser.add_argument("--lookups", type=int, default=30, help="عدد عمليات البحث لكل توزيع")
+    parser.add_argument("--player-id", default="5443564406", help="معرف لاعب PUBG للاختبار")
+    args = parser.parse_args()
+
+    print("🚀 مقارنة توزيع خانات متصفحات PUBG")
+    print("=" * 50)
+
+    baseline = await run_layout(args.slots, 1, args.player_id, args.lookups)
+    print_result("متصفح كامل لكل خانة", baseline)
+
+    shared = await run_layout(args.slots, args.contexts_per_browser, args.player_id, args.lookups)
+    print_result(f"{args.contexts_per_browser} خانة لكل عملية Chromium", shared)
+
+    if "error" not in baseline and "error" not in shared and shared["rss_per_slot_mb"] > 0:
+        print("\n📈 المقارنة")
+        print("-" * 50)
+        print(f"💾 توفير الذاكرة لكل خانة: {baseline['rss_per_slot_mb'] / shared['rss_per_slot_mb']:.1f}x")
+        if baseline["lookups_per_second"] > 0:
+            print(f"⚡ نسبة الإنتاجية: {shared['lookups_per_second'] / baseline['lookups_per_second']:.2f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
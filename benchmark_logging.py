@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+مقارنة تأثير السجلات على تأخر event loop
+- print() مباشر على stdout (الوضع السابق - سطر بسطر كما في الطرفية)
+- structured_logging: QueueHandler + خيط كتابة منفصل + حد لتكرار الرسائل
+يحاكي عدداً من الطلبات في الثانية كل منها يكتب عدة رسائل، ويقيس تأخر event loop عن موعده
+--sink-latency يحاكي بطء الطرفية أو pipe الخاص بـ docker/systemd (زمن كل عملية كتابة)
+
+الاستخدام:
+    python benchmark_logging.py --rate 500 --messages-per-request 8 --duration 5 --sink-latency 0.0001
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from structured_logging import setup_logging, shutdown_logging
+
+TICK_INTERVAL = 0.001  # فترة قياس تأخر event loop بالثواني
+
+class SlowSink:
+    """ملف مخرجات كل عملية كتابة فيه تستغرق latency ثانية (مثل طرفية أو pipe ممتلئ)"""
+
+    def __init__(self, path: str, latency: float):
+        self._file = open(path, "w", encoding="utf-8")
+        self.latency = latency
+
+    def write(self, text: str) -> int:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._file.write(text)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+async def measure_loop_lag(stop: asyncio.Event) -> list:
+    """قياس تأخر استيقاظ event loop عن الموعد المطلوب (بالمللي ثانية)"""
+    lags = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_INTERVAL)
+        lags.append((time.perf_counter() - started - TICK_INTERVAL) * 1000)
+    return lags
+
+async def generate_load(emit, rate: int, messages: int, duration: float) -> int:
+    """محاكاة rate طلب في الثانية - كل طلب يكتب messages رسالة"""
+    sent = 0
+    interval = 1.0 / rate
+    deadline = time.perf_counter() + duration
+    next_request = time.perf_counter()
+    while time.perf_counter() < deadline:
+        for step in range(messages):
+            emit(step, sent)
+        sent += 1
+        next_request += interval
+        await asyncio.sleep(max(0.0, next_request - time.perf_counter()))
+    return sent
+
+async def run_mode(mode: str, output: str, rate: int, messages: int, duration: float,
+                   sink_latency: float, rate_limit: float = 20) -> dict:
+    """تشغيل وضع واحد وإرجاع إحصائيات التأخر"""
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(measure_loop_lag(stop))
+    sink = SlowSink(output, sink_latency)
+
+    if mode == "print":
+        # print يكتب النص ثم السطر الجديد مباشرة على stdout من event loop
+        with contextlib.redirect_stdout(sink):
+            def emit(step, request):
+                print(f"🔍 بدء معالجة الطلب: {request} للاعب: 5443564406 - الخطوة {step}")
+            sent = await generate_load(emit, rate, messages, duration)
+    else:
+        setup_logging(rate=rate_limit, burst=50, stream=sink)
+        logger = logging.getLogger("istation.benchmark")
+
+        def emit(step, request):
+            logger.info("🔍 بدء معالجة الطلب: %s للاعب: %s - الخطوة %s", request, "5443564406", step)
+        sent = await generate_load(emit, rate, messages, duration)
+
+    stop.set()
+    lags = await monitor
+    if mode != "print":
+        # انتظار خيط الكتابة بعد انتهاء القياس
+        shutdown_logging()
+    sink.close()
+    lags.sort()
+    return {
+        "requests": sent,
+        "messages": sent * messages,
+        "lag_p50_ms": statistics.median(lags),
+        "lag_p99_ms": lags[int(len(lags) * 0.99)],
+        "lag_max_ms": lags[-1],
+        "written_lines": sum(1 for _ in open(output, encoding="utf-8"))
+    }
+
+def print_result(title: str, result: dict):
+    """طباعة نتيجة وضع واحد"""
+    print(f"\n📊 {title}")
+    print("-" * 50)
+    print(f"📨 الطلبات: {result['requests']} - الرسائل: {result['messages']} - الأسطر المكتوبة: {result['written_lines']}")
+    print(f"⏱️ تأخر event loop: p50 {result['lag_p50_ms']:.2f}ms - p99 {result['lag_p99_ms']:.2f}ms - الأقصى {result['lag_max_ms']:.2f}ms")
+
+async def main():
+    """الدالة الرئيسية"""
+    parser = argparse.ArgumentParser(description="مقارنة تأثير print() والسجلات المنظمة على event loop")
+    parser.add_argument("--rate", type=int, default=500, help="عدد الطلبات المحاكاة في الثانية")
+    parser.add_argument("--messages-per-request", type=int, default=8, help="عدد الرسائل لكل طلب")
+    parser.add_argument("--duration", type=float, default=5.0, help="مدة كل وضع بالثواني")
+    parser.add_argument("--sink-latency", type=float, default=0.0001, help="زمن كل عملية كتابة بالثواني")
+    parser.add_argument("--output-dir", default=tempfile.gettempdir(), help="مجلد ملفات المخرجات")
+    args = parser.parse_args()
+
+    print("🚀 مقارنة تأثير السجلات على event loop")
+    print("=" * 50)
+
+    old = await run_mode("print", os.path.join(args.output_dir, "benchmark_print.log"),
+                         args.rate, args.messages_per_request, args.duration, args.sink_latency)
+    print_result("print() مباشر", old)
+
+    unlimited = await run_mode("logging", os.path.join(args.output_dir, "benchmark_logging_unlimited.log"),
+                               args.rate, args.messages_per_request, args.duration, args.sink_latency,
+                               rate_limit=0)
+    print_result("structured_logging (QueueHandler بدون حد التكرار)", unlimited)
+
+    new = await run_mode("logging", os.path.join(args.output_dir, "benchmark_logging.log"),
+                         args.rate, args.messages_per_request, args.duration, args.sink_latency)
+    print_result("structured_logging (QueueHandler + حد التكرار)", new)
+
+    print("\n📈 المقارنة")
+    print("-" * 50)
+    print(f"📨 الطلبات المنفذة: {old['requests']} -> {unlimited['requests']} / {new['requests']}")
+    for title, result in (("بدون حد التكرار", unlimited), ("مع حد التكرار", new)):
+        if result["lag_p99_ms"] > 0:
+            print(f"⏱️ نسبة تحسن p99 ({title}): {old['lag_p99_ms'] / result['lag_p99_ms']:.1f}x")
+    print(f"📉 الأسطر المكتوبة: {old['written_lines']} -> {new['written_lines']}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Circuit Breaker
+قاطع دائرة لكل مصدر خارجي حتى لا يستهلك مصدر متوقف حدود الطلبات المتزامنة للألعاب السليمة
+- closed: الطلبات تمر ونسبة الأخطاء والمهلات تُقاس في نافذة زمنية متحركة
+- open: الطلبات تُرفض فوراً بدون انتظار أي اتصال حتى انتهاء مدة الفتح
+- half_open: عدد محدود من طلبات الاختبار - نجاحها يغلق الدائرة وفشل أي منها يعيد فتحها بمدة مضاعفة
+"""
+
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Tuple
+
+logger = logging.getLogger("istation.pool")
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# نتيجة طلب واحد كما يراها القاطع
+OUTCOME_SUCCESS = "success"
+OUTCOME_ERROR = "error"
+OUTCOME_TIMEOUT = "timeout"
+
+@dataclass
+class CircuitBreakerConfig:
+    """إعدادات قاطع الدائرة"""
+    enabled: bool = True
+    window: float = 30.0  # مدة نافذة القياس بالثواني
+    min_requests: int = 10  # أقل عدد طلبات في النافذة قبل الحكم على النسب
+    error_rate_threshold: float = 0.5  # نسبة الفشل (أخطاء + مهلات) التي تفتح الدائرة
+    timeout_rate_threshold: float = 0.3  # نسبة المهلات وحدها التي تفتح الدائرة (كل مهلة تحجز خانة حتى 30 ثانية)
+    open_duration: float = 15.0  # مدة الفتح الأولى بالثواني
+    max_open_duration: float = 120.0  # أقصى مدة فتح بعد فشل طلبات الاختبار المتكرر
+    half_open_probes: int = 1  # عدد طلبات الاختبار المتزامنة في حالة half_open
+    close_after_successes: int = 3  # عدد طلبات الاختبار الناجحة لإغلاق الدائرة
+
+class CircuitBreaker:
+    """قاطع دائرة لمصدر واحد (لعبة واحدة)"""
+
+    def __init__(self, name: str, config: CircuitBreakerConfig = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.config = config or CircuitBreakerConfig()
+        self.clock = clock
+        self.state = STATE_CLOSED
+        self._window: Deque[Tuple[float, str]] = deque()
+        self._counts = {OUTCOME_SUCCESS: 0, OUTCOME_ERROR: 0, OUTCOME_TIMEOUT: 0}
+        self._open_duration = self.config.open_duration
+        self._open_until = 0.0
+        self._probes_inflight = 0
+        self._probe_successes = 0
+        self.stats = {
+            "opened": 0,
+            "rejected": 0,
+            "probes": 0
+        }
+
+    def allow(self) -> bool:
+        """هل يُسمح بإرسال طلب الآن (في حالة half_open يُحجز للطلب خانة اختبار)"""
+        if not self.config.enabled:
+            return True
+        if self.state == STATE_OPEN:
+            if self.clock() < self._open_until:
+                self.stats["rejected"] += 1
+                return False
+            self._transition(STATE_HALF_OPEN)
+        if self.state == STATE_HALF_OPEN:
+            if self._probes_inflight >= self.config.half_open_probes:
+                self.stats["rejected"] += 1
+                return False
+            self._probes_inflight += 1
+            self.stats["probes"] += 1
+        return True
+
+    def record(self, outcome: str, probe: bool = False):
+        """
+        تسجيل نتيجة طلب سمح به allow()
+
+        Args:
+            outcome: OUTCOME_SUCCESS / OUTCOME_ERROR / OUTCOME_TIMEOUT
+            probe: الطلب أُرسل كطلب اختبار في حالة half_open
+        """
+        if not self.config.enabled:
+            return
+        if probe:
+            self._probes_inflight = max(0, self._probes_inflight - 1)
+            if self.state != STATE_HALF_OPEN:
+                return
+            if outcome != OUTCOME_SUCCESS:
+                self._open(min(self._open_duration * 2, self.config.max_open_duration))
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.config.close_after_successes:
+                self._transition(STATE_CLOSED)
+            return
+
+        # نتائج طلبات أُرسلت قبل فتح الدائرة لا تؤثر على الحالة الجديدة
+        if self.state != STATE_CLOSED:
+            return
+        now = self.clock()
+        self._window.append((now, outcome))
+        self._counts[outcome] += 1
+        self._prune(now)
+
+        total = len(self._window)
+        if total < self.config.min_requests:
+            return
+        failures = self._counts[OUTCOME_ERROR] + self._counts[OUTCOME_TIMEOUT]
+        if (failures / total >= self.config.error_rate_threshold
+                or self._counts[OUTCOME_TIMEOUT] / total >= self.config.timeout_rate_threshold):
+            self._open(self.config.open_duration)
+
+    def release(self, probe: bool = False):
+        """إلغاء طلب سمح به allow() بدون نتيجة (مثل إلغاء الطلب من العميل)"""
+        if probe:
+            self._probes_inflight = max(0, self._probes_inflight - 1)
+
+    def retry_after(self) -> float:
+        """الثواني المتبقية حتى السماح بطلبات الاختبار (0 إذا لم تكن الدائرة مفتوحة)"""
+        if self.state != STATE_OPEN:
+            return 0.0
+        return max(0.0, self._open_until - self.clock())
+
+    def _prune(self, now: float):
+        """حذف النتائج الأقدم من نافذة القياس"""
+        horizon = now - self.config.window
+        while self._window and self._window[0][0] < horizon:
+            _, outcome = self._window.popleft()
+            self._counts[outcome] -= 1
+
+    def _open(self, duration: float):
+        self._open_duration = duration
+        self._open_until = self.clock() + duration
+        self.stats["opened"] += 1
+        self._transition(STATE_OPEN)
+
+    def _transition(self, state: str):
+        previous, self.state = self.state, state
+        self._probe_successes = 0
+        if state == STATE_OPEN:
+            logger.warning("🔌 فتح دائرة %s لمدة %.0f ثانية (%s)", self.name, self._open_duration,
+                           self._rates_text())
+        elif state == STATE_CLOSED:
+            self._window.clear()
+            self._counts = dict.fromkeys(self._counts, 0)
+            self._open_duration = self.config.open_duration
+            logger.info("✅ إغلاق دائرة %s بعد نجاح طلبات الاختبار", self.name)
+        else:
+            logger.info("🔄 دائرة %s في حالة %s (من %s)", self.name, state, previous)
+
+    def _rates_text(self) -> str:
+        total = len(self._window) or 1
+        return (f"أخطاء {self._counts[OUTCOME_ERROR] / total:.0%}، "
+                f"مهلات {self._counts[OUTCOME_TIMEOUT] / total:.0%} من {len(self._window)} طلب")
+
+    def get_status(self) -> Dict:
+        """حالة القاطع ونسب النافذة الحالية"""
+        self._prune(self.clock())
+        total = len(self._window)
+        return {
+            **self.stats,
+            "state": self.state,
+            "window_requests": total,
+            "error_rate": round((self._counts[OUTCOME_ERROR] + self._counts[OUTCOME_TIMEOUT]) / total, 3) if total else 0.0,
+            "timeout_rate": round(self._counts[OUTCOME_TIMEOUT] / total, 3) if total else 0.0,
+            "retry_after": round(self.retry_after(), 1),
+            "probes_inflight": self._probes_inflight
+        }
@@ -7,13 +7,21 @@ High-Performance Connection Pool Manager
 
 import asyncio
 import aiohttp
+import functools
 import time
-from typing import Dict, Optional, Any
+from typing import Awaitable, Callable, Dict, Optional, Any, Tuple
 from asyncio import Semaphore
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 
+import server_timing
+import tracing
+from circuit_breaker import (CircuitBreaker, CircuitBreakerConfig, OUTCOME_ERROR, OUTCOME_SUCCESS,
+                             OUTCOME_TIMEOUT, STATE_HALF_OPEN)
+from hedging import HedgePolicy, HedgingConfig
+
 class GameType(Enum):
+    PUBG = "pubg"  # المسار السريع بدون متصفح (جلسة MidasBuy)
     FREEFIRE = "freefire"
     JAWAKER = "jawaker"
     BIGOLIVE = "bigolive"
@@ -30,6 +38,22 @@ class ConnectionPoolConfig:
     read_timeout: int = 25
     dns_cache_ttl: int = 300
     keepalive_timeout: int = 30
+    circuit_breaker: CircuitBreakerConfig = field(default_factory=CircuitBreakerConfig)  # قاطع دائرة مستقل لكل لعبة
+    hedging: HedgingConfig = field(default_factory=HedgingConfig)  # طلبات التحوط وإعادة المحاولة (HedgingConfig.games)
+
+def breaker_outcome(result: Dict) -> str:
+    """
+    تصنيف نتيجة الطلب لقاطع الدائرة
+    استجابات 4xx (عدا 429) تعني أن المصدر يعمل فتُحسب نجاحاً
+    """
+    if result.get("success"):
+        return OUTCOME_SUCCESS
+    if result.get("timed_out"):
+        return OUTCOME_TIMEOUT
+    status = result.get("status_code")
+    if status is not None and 400 <= status < 500 and status != 429:
+        return OUTCOME_SUCCESS
+    return OUTCOME_ERROR
 
 class HighPerformanceConnectionPool:
     """Connection Pool عالي الأداء مع دعم المعالجة المتوازية"""
@@ -38,6 +62,12 @@ class HighPerformanceConnectionPool:
         self.config = config or ConnectionPoolConfig()
         self.session: Optional[aiohttp.ClientSession] = None
         self.semaphores: Dict[GameType, Semaphore] = {}
+        self.breakers: Dict[GameType, CircuitBreaker] = {
+            game: CircuitBreaker(game.value, self.config.circuit_breaker) for game in GameType
+        }
+        self.hedging: Dict[GameType, HedgePolicy] = {
+            game: HedgePolicy(self.config.hedging) for game in GameType if game.value in self.config.hedging.games
+        }
         self.stats = {
             "total_requests": 0,
             "successful_requests": 0,
@@ -92,7 +122,122 @@ class HighPerformanceConnectionPool:
     
     async def make_request(self, game_type: GameType, url: str, method: str = "POST",
                           data: Dict = None, json_data: Dict = None, headers: Dict = None, cookies: Dict = None) -> Optional[Dict]:
-        """إرسال طلب محسن مع إدارة الموارد"""
+        """
+        إرسال طلب محسن مع إدارة الموارد (span للتتبع يشمل انتظار حد اللعبة)
+        إذا كانت دائرة اللعبة مفتوحة يُرفض الطلب فوراً قبل حجز أي خانة بـ {"circuit_open": True}
+        للألعاب في HedgingConfig.games: طلب تحوط بعد p90 وإعادة محاولة لأخطاء الاتصال (انظر _send_with_policy)
+        """
+        with tracing.start_span("http.request", {"game": game_type.value, "method": method, "url": url}) as span:
+            breaker = self.breakers.get(game_type)
+            if breaker is not None and not breaker.allow():
+                span.set_attribute("circuit", breaker.state)
+                return {
+                    "success": False,
+                    "error": "Circuit open",
+                    "circuit_open": True,
+                    "retry_after": breaker.retry_after(),
+                    "response_time": 0.0
+                }
+            probe = breaker is not None and breaker.state == STATE_HALF_OPEN
+            send = functools.partial(self._send_request, game_type, url, method, data, json_data, headers, cookies)
+            policy = self.hedging.get(game_type)
+            try:
+                # طلبات الاختبار في half_open ترسل مرة واحدة فقط حتى تبقى قليلة
+                if policy is None or probe:
+                    result = await send()
+                else:
+                    result = await self._send_with_policy(game_type, policy, send)
+            except asyncio.CancelledError:
+                if breaker is not None:
+                    breaker.release(probe)
+                raise
+            if breaker is not None:
+                if result:
+                    breaker.record(breaker_outcome(result), probe)
+                else:
+                    breaker.release(probe)
+            if result:
+                if result.get("response_time") is not None:
+                    server_timing.record("upstream", result["response_time"])
+                span.set_attribute("success", result.get("success"))
+                span.set_attribute("status_code", result.get("status_code"))
+                span.set_attribute("response_time", result.get("response_time"))
+                if result.get("attempts", 1) > 1:
+                    span.set_attribute("attempts", result["attempts"])
+                if not result.get("success"):
+                    span.set_attribute("error", result.get("error"))
+            return result
+
+    async def _send_with_policy(self, game_type: GameType, policy: HedgePolicy,
+                                send: Callable[[], Awaitable[Optional[Dict]]]) -> Optional[Dict]:
+        """
+        إرسال الطلب مع التحوط وإعادة المحاولة ضمن ميزانية اللعبة
+
+        Returns:
+            نتيجة آخر محاولة مع response_time الكلي وعدد الطلبات المرسلة (attempts)
+        """
+        started = time.perf_counter()
+        policy.deposit()
+        attempts = 0
+        retries = 0
+        while True:
+            result, sent = await self._send_hedged(game_type, policy, send)
+            attempts += sent
+            if (retries >= policy.config.max_retries or not policy.should_retry(result)
+                    or not policy.try_spend()):
+                break
+            retries += 1
+            policy.stats["retries"] += 1
+            await asyncio.sleep(policy.backoff(retries))
+
+        if result is not None:
+            result = {**result, "response_time": time.perf_counter() - started, "attempts": attempts}
+        return result
+
+    async def _send_hedged(self, game_type: GameType, policy: HedgePolicy,
+                           send: Callable[[], Awaitable[Optional[Dict]]]) -> Tuple[Optional[Dict], int]:
+        """
+        إرسال الطلب وإرسال نسخة مطابقة إذا لم يصل رد خلال زمن التحوط
+        النسخة الثانية تأخذ اتصالاً آخر من الـ pool (الأول مشغول)، وأول رد نهائي يُعتمد ويُلغى الآخر
+
+        Returns:
+            (النتيجة، عدد الطلبات المرسلة)
+        """
+        async def attempt():
+            result = await send()
+            if result and result.get("success"):
+                policy.observe(result["response_time"])
+            return result
+
+        primary = asyncio.create_task(attempt())
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=policy.hedge_delay())
+            semaphore = self.semaphores.get(game_type)
+            # لا تحوط إذا كانت خانات اللعبة ممتلئة - التأخير من الانتظار وليس من المصدر
+            if not done and not (semaphore and semaphore.locked()) and policy.try_spend():
+                policy.stats["hedges"] += 1
+                tasks.append(asyncio.create_task(attempt()))
+
+            result = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result and breaker_outcome(result) == OUTCOME_SUCCESS:
+                        if task is not primary:
+                            policy.stats["hedge_wins"] += 1
+                        return result, len(tasks)
+            return result, len(tasks)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _send_request(self, game_type: GameType, url: str, method: str, data: Optional[Dict],
+                            json_data: Optional[Dict], headers: Optional[Dict], cookies: Optional[Dict]) -> Optional[Dict]:
+        """إرسال الطلب الفعلي ضمن حد الطلبات المتزامنة للعبة"""
         if not self._initialized:
             await self.initialize()
         
@@ -162,6 +307,16 @@ class HighPerformanceConnectionPool:
                 return {
                     "success": False,
                     "error": "Request timeout",
+                    "timed_out": True,
+                    "response_time": time.perf_counter() - start_time
+                }
+            except aiohttp.ClientConnectionError as e:
+                # فشل الاتصال قبل وصول أي رد (رفض الاتصال، DNS، انقطاع) - الخطأ الوحيد غير HTTP القابل لإعادة المحاولة
+                self.stats["failed_requests"] += 1
+                return {
+                    "success": False,
+                    "error": str(e),
+                    "connection_error": True,
                     "response_time": time.perf_counter() - start_time
                 }
             except Exception as e:
@@ -208,7 +363,9 @@ class HighPerformanceConnectionPool:
                     "max": self.config.concurrent_requests_per_game
                 }
                 for game, sem in self.semaphores.items()
-            }
+            },
+            "circuit_breakers": {game.value: breaker.get_status() for game, breaker in self.breakers.items()},
+            "hedging": {game.value: policy.get_status() for game, policy in self.hedging.items()}
         }
     
     async def cleanup(self):
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hedged Requests
+تقليل زمن الذيل (p99) لطلبات HTTP للألعاب بطلبات تحوط وإعادة محاولة محدودة
+- طلب تحوط مطابق إذا لم يصل رد خلال p90 المقاس للعبة - أول رد يُعتمد والآخر يُلغى
+- إعادة المحاولة مع تأخير عشوائي متزايد لأخطاء الاتصال و 502/503/504 فقط (المهلات يغطيها التحوط)
+- ميزانية لكل لعبة: كل طلب أصلي يضيف budget_ratio من طلب إضافي فلا يتجاوز الحمل الإضافي تلك النسبة
+"""
+
+import random
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+
+@dataclass
+class HedgingConfig:
+    """إعدادات التحوط وإعادة المحاولة"""
+    # الألعاب المفعلة - طلبات قراءة فقط يمكن تكرارها (PUBG مستثناة: جلسة MidasBuy واحدة محدودة المعدل)
+    games: Tuple[str, ...] = ("freefire", "jawaker", "bigolive", "poppolive")
+    quantile: float = 0.9  # نسبة زمن الاستجابة التي يُرسل بعدها طلب التحوط
+    min_samples: int = 20  # أقل عدد عينات قبل استخدام الزمن المقاس
+    samples_max: int = 200  # عدد آخر أزمنة الاستجابة المحفوظة لكل لعبة
+    default_delay: float = 1.0  # تأخير التحوط قبل جمع عينات كافية بالثواني
+    min_delay: float = 0.05  # أقل تأخير للتحوط بالثواني
+    budget_ratio: float = 0.05  # الطلبات الإضافية (تحوط + إعادة محاولة) كنسبة من الطلبات الأصلية
+    budget_burst: float = 10.0  # أقصى رصيد متراكم من الطلبات الإضافية
+    max_retries: int = 2
+    retry_backoff: float = 0.2  # أساس التأخير بين المحاولات بالثواني (يتضاعف مع كل محاولة)
+    retry_backoff_max: float = 2.0
+    retry_statuses: Tuple[int, ...] = (502, 503, 504)
+
+class HedgePolicy:
+    """زمن الاستجابة المقاس وميزانية الطلبات الإضافية للعبة واحدة"""
+
+    def __init__(self, config: HedgingConfig = None):
+        self.config = config or HedgingConfig()
+        self._samples: Deque[float] = deque(maxlen=self.config.samples_max)
+        self._delay: Optional[float] = None  # التأخير المحسوب من العينات الحالية (يُعاد حسابه بعد عينة جديدة)
+        self.tokens = float(self.config.budget_burst)
+        self.stats = {
+            "requests": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "retries": 0,
+            "budget_exhausted": 0
+        }
+
+    def observe(self, seconds: float):
+        """تسجيل زمن استجابة ناجحة"""
+        self._samples.append(seconds)
+        self._delay = None
+
+    def hedge_delay(self) -> float:
+        """زمن الانتظار قبل إرسال طلب التحوط (نسبة quantile من آخر العينات)"""
+        if len(self._samples) < self.config.min_samples:
+            return self.config.default_delay
+        if self._delay is None:
+            ordered = sorted(self._samples)
+            index = min(len(ordered) - 1, int(self.config.quantile * len(ordered)))
+            self._delay = max(self.config.min_delay, ordered[index])
+        return self._delay
+
+    def deposit(self):
+        """طلب أصلي جديد - إضافة budget_ratio للرصيد"""
+        self.stats["requests"] += 1
+        self.tokens = min(self.config.budget_burst, self.tokens + self.config.budget_ratio)
+
+    def try_spend(self) -> bool:
+        """حجز طلب إضافي من الرصيد (False إذا نفدت الميزانية)"""
+        if self.tokens < 1:
+            self.stats["budget_exhausted"] += 1
+            return False
+        self.tokens -= 1
+        return True
+
+    def should_retry(self, result: Optional[Dict]) -> bool:
+        """
+        هل الفشل قابل لإعادة المحاولة (خطأ اتصال أو 502/503/504 - ليس مهلة ولا رد نهائي)
+        أخطاء أخرى بدون status (مثل فشل قراءة JSON من صفحة HTML برد 200) لا تُعاد - نفس الطلب سيفشل مرة أخرى
+        """
+        if not result or result.get("success") or result.get("timed_out") or result.get("circuit_open"):
+            return False
+        return bool(result.get("connection_error")) or result.get("status_code") in self.config.retry_statuses
+
+    def backoff(self, retry: int) -> float:
+        """تأخير عشوائي كامل (full jitter) قبل المحاولة رقم retry (تبدأ من 1)"""
+        return random.uniform(0, min(self.config.retry_backoff_max, self.config.retry_backoff * 2 ** (retry - 1)))
+
+    def get_status(self) -> Dict:
+        extra = self.stats["hedges"] + self.stats["retries"]
+        return {
+            **self.stats,
+            "hedge_delay": round(self.hedge_delay(), 3),
+            "samples": len(self._samples),
+            "budget_tokens": round(self.tokens, 2),
+            "extra_load": round(extra / self.stats["requests"], 4) if self.stats["requests"] else 0.0
+        }
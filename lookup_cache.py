@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+In-Process Lookup Cache
+ذاكرة تخزين مؤقت داخل العملية لنتائج البحث عن اللاعبين
+- مدة صلاحية منفصلة للأسماء الموجودة ولنتائج "غير موجود"
+- حد أقصى لعدد المدخلات مع إخلاء LRU أو LFU
+- عدادات الإصابة والإخفاق لعرضها في /stats
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+# عدد المدخلات الأقدم التي تُفحص عند الإخلاء بسياسة LFU (تقريب مثل Redis)
+LFU_SAMPLE_SIZE = 8
+
+@dataclass
+class CacheEntry:
+    """مدخل واحد في الذاكرة المؤقتة"""
+    player_name: Optional[str]
+    expires_at: float
+    hits: int = 0
+
+class LookupCache:
+    """ذاكرة مؤقتة محدودة الحجم لنتائج البحث مفتاحها (اللعبة، معرف اللاعب)"""
+
+    def __init__(self, max_entries: int = 10000, found_ttl: float = 3600,
+                 not_found_ttl: float = 300, eviction_policy: str = "lru"):
+        if eviction_policy not in ("lru", "lfu"):
+            raise ValueError(f"سياسة إخلاء غير مدعومة: {eviction_policy}")
+
+        self.max_entries = max_entries
+        self.found_ttl = found_ttl
+        self.not_found_ttl = not_found_ttl
+        self.eviction_policy = eviction_policy
+        self._entries: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
+        self.stats = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "sets": 0
+        }
+
+    def get(self, game_type: str, player_id: str) -> Tuple[bool, Optional[str]]:
+        """
+        البحث عن نتيجة مخزنة
+
+        Returns:
+            (hit, player_name): hit=True إذا وُجدت نتيجة صالحة (قد يكون الاسم None لنتيجة "غير موجود")
+        """
+        key = (game_type, player_id)
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.stats["misses"] += 1
+            return False, None
+
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return False, None
+
+        entry.hits += 1
+        if self.eviction_policy == "lru":
+            self._entries.move_to_end(key)
+
+        if entry.player_name is None:
+            self.stats["negative_hits"] += 1
+        else:
+            self.stats["hits"] += 1
+        return True, entry.player_name
+
+    def set(self, game_type: str, player_id: str, player_name: Optional[str], ttl: Optional[float] = None):
+        """تخزين نتيجة بحث - None يعني أن اللاعب غير موجود. ttl يتجاوز المدة الافتراضية"""
+        if ttl is None:
+            ttl = self.found_ttl if player_name is not None else self.not_found_ttl
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+
+        key = (game_type, player_id)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        elif len(self._entries) >= self.max_entries:
+            self._evict()
+
+        self._entries[key] = CacheEntry(player_name=player_name, expires_at=time.monotonic() + ttl)
+        self.stats["sets"] += 1
+
+    def contains(self, game_type: str, player_id: str) -> bool:
+        """فحص وجود نتيجة صالحة دون تعديل العدادات أو ترتيب الإخلاء"""
+        entry = self._entries.get((game_type, player_id))
+        return entry is not None and entry.expires_at > time.monotonic()
+
+    def invalidate(self, game_type: str, player_id: str):
+        """حذف نتيجة مخزنة"""
+        self._entries.pop((game_type, player_id), None)
+
+    def clear(self):
+        """مسح جميع المدخلات"""
+        self._entries.clear()
+
+    def _evict(self):
+        """إخلاء مدخل واحد حسب السياسة المحددة"""
+        if not self._entries:
+            return
+
+        if self.eviction_policy == "lfu":
+            # فحص أقدم المدخلات فقط وإخلاء الأقل استخداماً بينها
+            candidates = []
+            for key, entry in self._entries.items():
+                candidates.append((entry.hits, key))
+                if len(candidates) >= LFU_SAMPLE_SIZE:
+                    break
+            _, victim = min(candidates, key=lambda item: item[0])
+            del self._entries[victim]
+        else:
+            self._entries.popitem(last=False)
+
+        self.stats["evictions"] += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        """الحصول على إحصائيات الذاكرة المؤقتة"""
+        lookups = self.stats["hits"] + self.stats["negative_hits"] + self.stats["misses"]
+        hit_rate = 0
+        if lookups > 0:
+            hit_rate = ((self.stats["hits"] + self.stats["negative_hits"]) / lookups) * 100
+
+        return {
+            **self.stats,
+            "hit_rate": hit_rate,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "found_ttl": self.found_ttl,
+            "not_found_ttl": self.not_found_ttl,
+            "eviction_policy": self.eviction_policy
+        }
@@ -6,43 +6,138 @@ API للبحث عن اللاعبين في الألعاب المختلفة (PUBG,
 يرجع أسماء اللاعبين فقط بدون معلومات إضافية
 """
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 import uvicorn
 import asyncio
 import atexit
-from typing import Optional
+import json
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Literal, Optional, Tuple
 from contextlib import asynccontextmanager
 import aiohttp
-from asyncio import Semaphore
 
 # استيراد وحدات البحث عن اللاعبين
-from pubg_player import get_pubg_player_name, cleanup_resources as cleanup_pubg_resources, _search_player_async, initialize_pubg_system
+from pubg_player import get_pubg_player_name, cleanup_resources as cleanup_pubg_resources, _search_player_async, _search_player_result_async, initialize_pubg_system, get_pubg_status, get_pubg_concurrency, promote_pubg_request
 from freefire_player import get_freefire_player_name, get_freefire_player_name_async
 from jawaker_player import get_jawaker_player_name, get_jawaker_player_name_async
 from bigolive_player import get_bigolive_player_name, get_bigolive_player_name_async
 from poppolive_player import get_poppolive_player_name, get_poppolive_player_name_async
-from connection_pool import cleanup_connection_pool
+from connection_pool import cleanup_connection_pool, get_connection_pool
+from admission import AdmissionController
+from lookup_cache import LookupCache
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS_REGISTRY, Counter, Gauge, Histogram
+from persistent_cache import PersistentLookupCache
+from single_flight import SingleFlight
+import server_timing
+from structured_logging import setup_logging, shutdown_logging
+import tracing
+
+logger = logging.getLogger("istation.api")
 
 # إعدادات الأداء العالي
 MAX_CONCURRENT_REQUESTS = 50  # الحد الأقصى للطلبات المتزامنة
 HTTP_POOL_SIZE = 100  # حجم Connection Pool
 REQUEST_TIMEOUT = 30  # مهلة الطلب بالثواني
+DISCONNECT_POLL_INTERVAL = 0.5  # الفترة بين فحوص انقطاع اتصال العميل بالثواني
+
+# إعدادات التحكم في القبول (رفض الطلبات التي لا يمكن خدمتها في الوقت المطلوب بـ 429)
+ADMISSION_ENABLED = True
+ADMISSION_SLO = 20.0  # أقصى زمن متوقع مقبول لاكتمال الطلب بالثواني (أو مهلة العميل إن كانت أقل)
+ADMISSION_DEFAULT_SERVICE_TIME = 3.0  # زمن الخدمة المفترض قبل أول قياس بالثواني
+ADMISSION_ETA_HEADERS = True  # إضافة ترتيب الطلب والزمن المتوقع لاستجابات الطلبات المقبولة
+
+# إعدادات السجلات (JSON lines من خيط منفصل - لا تُوقف event loop)
+LOG_LEVEL = "INFO"  # المستوى الافتراضي لجميع مسجلات istation
+LOG_MODULE_LEVELS = {  # مستويات خاصة لكل وحدة (DEBUG يعرض تفاصيل كل طلب)
+    "istation.api": "INFO",
+    "istation.pubg": "INFO",
+    "playwright": "WARNING"
+}
+LOG_PATH = "-"  # ملف السجلات أو "-" لـ stdout
+LOG_RATE_LIMIT = 20  # الحد الأقصى لتكرار نفس رسالة INFO/DEBUG في الثانية (الزائد يُحذف ويُحسب في suppressed)
+LOG_RATE_BURST = 50  # عدد الرسائل المتكررة المسموح بها دفعة واحدة قبل تطبيق الحد
+LOG_SUPPRESSED_FLUSH_INTERVAL = 60  # كل كم ثانية يُكتب عدد المحذوف إذا توقف التكرار
+
+# إعدادات التتبع (spans لكل مرحلة بصيغة OpenTelemetry - JSON lines)
+TRACING_ENABLED = True
+TRACING_SAMPLE_RATIO = 0.05  # نسبة الطلبات المتتبعة (1.0 = كل الطلبات)
+TRACING_EXPORT_PATH = "temp/traces.jsonl"  # ملف التصدير أو "-" لـ stdout
+
+# إعدادات الذاكرة المؤقتة لنتائج البحث
+CACHE_MAX_ENTRIES = 50000  # الحد الأقصى لعدد النتائج المخزنة
+CACHE_FOUND_TTL = 6 * 3600  # مدة صلاحية الأسماء الموجودة بالثواني
+CACHE_NOT_FOUND_TTL = 10 * 60  # مدة صلاحية نتائج "غير موجود" بالثواني
+CACHE_EVICTION_POLICY = "lru"  # سياسة الإخلاء (lru, lfu)
+
+# إعدادات الذاكرة الدائمة (SQLite) - تبقى بعد إعادة تشغيل العامل
+PERSISTENT_CACHE_ENABLED = True
+PERSISTENT_CACHE_PATH = "temp/lookup_cache.db"
+PERSISTENT_CACHE_FLUSH_INTERVAL = 1.0  # الفترة بين دفعات الكتابة بالثواني
+PERSISTENT_CACHE_COMPACT_INTERVAL = 3600  # الفترة بين عمليات حذف المنتهي بالثواني
+PERSISTENT_CACHE_WARM_ENTRIES = 20000  # عدد النتائج المحملة للذاكرة عند بدء التشغيل
+
+# إعدادات البحث الجماعي
+BATCH_MAX_ITEMS = 1000  # الحد الأقصى لعدد المعرفات في طلب واحد
+BATCH_PRIORITY = "bulk"  # أولوية عمليات البحث الجماعي والبث في قائمة متصفحات PUBG
+STREAM_MAX_ITEMS = 50000  # الحد الأقصى لعدد المعرفات في طلب البث
+STREAM_BUFFER_SIZE = 100  # عدد النتائج المنتظرة للإرسال قبل إيقاف العمال مؤقتاً
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream"
+}
 
 # متغيرات عامة للموارد المشتركة
 _http_session: Optional[aiohttp.ClientSession] = None
-_request_semaphore: Optional[Semaphore] = None
+_lookup_cache = LookupCache(
+    max_entries=CACHE_MAX_ENTRIES,
+    found_ttl=CACHE_FOUND_TTL,
+    not_found_ttl=CACHE_NOT_FOUND_TTL,
+    eviction_policy=CACHE_EVICTION_POLICY
+)
+_persistent_cache: Optional[PersistentLookupCache] = None
+if PERSISTENT_CACHE_ENABLED:
+    _persistent_cache = PersistentLookupCache(
+        PERSISTENT_CACHE_PATH,
+        found_ttl=CACHE_FOUND_TTL,
+        not_found_ttl=CACHE_NOT_FOUND_TTL,
+        flush_interval=PERSISTENT_CACHE_FLUSH_INTERVAL,
+        compact_interval=PERSISTENT_CACHE_COMPACT_INTERVAL
+    )
+_single_flight = SingleFlight()  # دمج طلبات البحث المتطابقة الجارية
+_admission = AdmissionController(slo=ADMISSION_SLO, default_service_time=ADMISSION_DEFAULT_SERVICE_TIME)
+
+# مقاييس Prometheus (/metrics)
+LOOKUP_DURATION = Histogram("istation_lookup_duration_seconds",
+                            "زمن البحث للطلبات التي لم تُخدم من الذاكرة المؤقتة", ["game", "outcome"])
+CACHE_REQUESTS = Counter("istation_cache_requests_total", "طلبات الذاكرة المؤقتة حسب اللعبة والنتيجة", ["game", "result"])
+CACHE_HIT_RATIO = Gauge("istation_cache_hit_ratio", "نسبة الإصابة في الذاكرة المؤقتة منذ بدء التشغيل", ["cache"])
+
+def _collect_cache_hit_ratios() -> Dict[tuple, float]:
+    stats = _lookup_cache.stats
+    hits = stats["hits"] + stats["negative_hits"]
+    ratios = {("memory",): hits / max(1, hits + stats["misses"])}
+    if _persistent_cache:
+        ratios[("persistent",)] = _persistent_cache.stats["hits"] / max(1, _persistent_cache.stats["reads"])
+    return ratios
+
+CACHE_HIT_RATIO.set_function(_collect_cache_hit_ratios)
 
 # إدارة دورة حياة التطبيق
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """إدارة دورة حياة التطبيق - تهيئة وتنظيف الموارد"""
-    global _http_session, _request_semaphore
+    global _http_session
 
-    print("🚀 بدء تشغيل iStation API...")
+    setup_logging(LOG_LEVEL, LOG_MODULE_LEVELS, LOG_PATH, LOG_RATE_LIMIT, LOG_RATE_BURST,
+                  flush_interval=LOG_SUPPRESSED_FLUSH_INTERVAL)
+    logger.info("🚀 بدء تشغيل iStation API...")
 
     # إعداد Connection Pool للطلبات HTTP
-    print("🌐 إعداد Connection Pool...")
+    logger.info("🌐 إعداد Connection Pool...")
     connector = aiohttp.TCPConnector(
         limit=HTTP_POOL_SIZE,  # إجمالي الاتصالات
         limit_per_host=50,     # اتصالات لكل host
@@ -61,37 +156,62 @@ async def lifespan(app: FastAPI):
         }
     )
 
-    # إعداد Semaphore للتحكم في عدد الطلبات المتزامنة
-    _request_semaphore = Semaphore(MAX_CONCURRENT_REQUESTS)
-    print(f"⚡ تم إعداد Connection Pool - الحد الأقصى: {MAX_CONCURRENT_REQUESTS} طلب متزامن")
+    logger.info("⚡ تم إعداد Connection Pool - الحد الأقصى: %s طلب متزامن", MAX_CONCURRENT_REQUESTS)
+
+    # تدفئة الذاكرة المؤقتة من الذاكرة الدائمة لخدمة المعرفات المعروفة فوراً
+    if _persistent_cache:
+        try:
+            await _persistent_cache.start()
+            warmed = await _persistent_cache.load_recent(PERSISTENT_CACHE_WARM_ENTRIES)
+            for game_type, player_id, player_name, remaining_ttl in reversed(warmed):
+                _lookup_cache.set(game_type, player_id, player_name, ttl=remaining_ttl)
+            logger.info("💾 تم تحميل %s نتيجة من الذاكرة الدائمة", len(warmed))
+        except Exception as e:
+            logger.error("❌ خطأ في تحميل الذاكرة الدائمة: %s", e)
+
+    if TRACING_ENABLED:
+        os.makedirs(os.path.dirname(TRACING_EXPORT_PATH) or ".", exist_ok=True)
+        tracing.configure(TRACING_SAMPLE_RATIO, TRACING_EXPORT_PATH)
+        logger.info("🧭 التتبع مفعل - نسبة العينات: %.0f%% - الملف: %s", TRACING_SAMPLE_RATIO * 100, TRACING_EXPORT_PATH)
 
     # تهيئة نظام PUBG مع 3 متصفحات مستقلة
-    print("🎮 تهيئة نظام البحث عن لاعبي PUBG...")
+    logger.info("🎮 تهيئة نظام البحث عن لاعبي PUBG...")
     try:
         success = await initialize_pubg_system()
         if success:
-            print("✅ تم تهيئة نظام PUBG بنجاح!")
+            logger.info("✅ تم تهيئة نظام PUBG بنجاح!")
         else:
-            print("⚠️ فشل في تهيئة نظام PUBG - سيعمل النظام بدون المتصفحات الثلاثة")
+            logger.warning("⚠️ فشل في تهيئة نظام PUBG - سيعمل النظام بدون المتصفحات الثلاثة")
     except Exception as e:
-        print(f"❌ خطأ في تهيئة نظام PUBG: {e}")
+        logger.error("❌ خطأ في تهيئة نظام PUBG: %s", e)
 
     yield
 
-    print("🧹 تنظيف موارد التطبيق...")
+    logger.info("🧹 تنظيف موارد التطبيق...")
 
     # تنظيف HTTP Session
     if _http_session:
         await _http_session.close()
-        print("✅ تم إغلاق HTTP Session")
+        logger.info("✅ تم إغلاق HTTP Session")
+
+    # كتابة النتائج المعلقة وإغلاق الذاكرة الدائمة
+    if _persistent_cache:
+        try:
+            await _persistent_cache.close()
+            logger.info("✅ تم إغلاق الذاكرة الدائمة")
+        except Exception as e:
+            logger.error("❌ خطأ في إغلاق الذاكرة الدائمة: %s", e)
 
     # تنظيف موارد PUBG
     try:
         await cleanup_pubg_resources()
     except Exception as e:
-        print(f"❌ خطأ في تنظيف موارد PUBG: {e}")
+        logger.error("❌ خطأ في تنظيف موارد PUBG: %s", e)
+
+    tracing.shutdown()
 
-    print("✅ تم تنظيف جميع الموارد")
+    logger.info("✅ تم تنظيف جميع الموارد")
+    shutdown_logging()
 
 # إنشاء تطبيق FastAPI
 app = FastAPI(
@@ -105,38 +225,90 @@ app = FastAPI(
 class PlayerRequest(BaseModel):
     player_id: str
     game_type: str = "pubg"  # افتراضي: pubg (pubg, freefire, jawaker, bigolive, poppolive)
+    timeout: Optional[float] = Field(default=None, gt=0)  # مهلة البحث بالثواني (افتراضياً من إعدادات كل لعبة)
+    priority: Literal["high", "normal", "bulk"] = "normal"  # أولوية الطلب في قائمة متصفحات PUBG
 
 # نموذج البيانات للاستجابة
 class PlayerResponse(BaseModel):
     player_name: Optional[str] = None
 
-async def get_player_name_async(player_id: str, game_type: str = "pubg") -> Optional[str]:
+# نماذج البيانات للبحث الجماعي
+class BatchPlayerRequest(BaseModel):
+    items: List[PlayerRequest]
+
+class BatchPlayerResult(BaseModel):
+    player_id: str
+    game_type: str
+    player_name: Optional[str] = None
+    error: Optional[str] = None  # خطأ خاص بهذا العنصر فقط (لا يفشل الدفعة كاملة)
+    server_timing: Optional[str] = None  # أزمنة مراحل هذا العنصر بصيغة header الـ Server-Timing
+
+class BatchPlayerResponse(BaseModel):
+    results: List[BatchPlayerResult]
+
+# توحيد أسماء الألعاب المختصرة (ff = freefire ...) لتشارك نفس مدخلات الذاكرة المؤقتة
+GAME_ALIASES = {
+    "pubg": "pubg",
+    "freefire": "freefire", "ff": "freefire",
+    "jawaker": "jawaker", "jw": "jawaker",
+    "bigolive": "bigolive", "bigo": "bigolive",
+    "poppolive": "poppolive", "poppo": "poppolive"
+}
+
+# نتائج البحث الممكنة
+OUTCOME_FOUND = "found"
+OUTCOME_NOT_FOUND = "not_found"
+OUTCOME_ERROR = "error"
+OUTCOME_TIMEOUT = "timeout"  # انتهت مهلة البحث (لا يُخزن مثل الخطأ)
+
+# إشارات "غير موجود" الصريحة من كل مصدر - أي استجابة أخرى (حد المعدل، صيانة، رسالة خطأ) خطأ لا يُخزن
+FREEFIRE_NOT_FOUND_MSGS = ("id_not_found",)
+FREEFIRE_NOT_FOUND_STATUS = 404
+
+def _livesbuy_not_found(info: Dict) -> bool:
+    """BigOLive / Poppo Live: الحساب غير موجود فقط إذا ذكر المصدر exists أو matched بقيمة false صراحة"""
+    return info.get('exists') is False or info.get('matched') is False
+
+def normalize_game_type(game_type: str) -> Optional[str]:
+    """إرجاع الاسم الموحد للعبة أو None إذا لم تكن مدعومة"""
+    return GAME_ALIASES.get(str(game_type).lower())
+
+async def _fetch_player_name(player_id: str, game_type: str, deadline: Optional[float] = None,
+                             priority: Optional[str] = None) -> Tuple[Optional[str], str]:
     """
-    جلب اسم اللاعب حسب نوع اللعبة (نسخة غير متزامنة عالية الأداء)
-    يحصل على الاستجابة الخام من ملفات الألعاب ويعالجها لاستخراج اسم اللاعب
+    جلب اسم اللاعب من المصدر مباشرة مع تحديد نوع النتيجة
 
     Args:
         player_id (str): معرف اللاعب
-        game_type (str): نوع اللعبة (pubg, freefire, jawaker, bigolive, poppolive)
+        game_type (str): الاسم الموحد للعبة (انظر normalize_game_type)
+        deadline (float): وقت انتهاء المهلة (time.time) - يُمرر لقائمة متصفحات PUBG
+        priority (str): أولوية الطلب في قائمة متصفحات PUBG (high / normal / bulk)
 
     Returns:
-        str or None: اسم اللاعب أو None إذا لم يوجد
+        (player_name, outcome): outcome أحد OUTCOME_FOUND / OUTCOME_NOT_FOUND / OUTCOME_ERROR / OUTCOME_TIMEOUT
     """
-    game_type = game_type.lower()
-
+    parse_started = None  # وقت وصول الاستجابة الخام - ما بعده زمن المعالجة (parse في Server-Timing)
     try:
         # الحصول على الاستجابة الخام من ملفات الألعاب
         raw_response = None
 
         if game_type == "pubg":
-            raw_response = await _search_player_async(player_id)
-            # PUBG يرجع اسم اللاعب مباشرة (لم يتم تعديله بعد)
-            print(f"🎮 PUBG Response for {player_id}: {raw_response}")
-            return raw_response
-
-        elif game_type in ["freefire", "ff"]:
+            raw_response = await _search_player_result_async(player_id, deadline, priority)
+            parse_started = time.perf_counter()
+            logger.debug("🎮 PUBG Response for %s: %s", player_id, raw_response)
+
+            if raw_response.get('success') and raw_response.get('player_name'):
+                return raw_response['player_name'], OUTCOME_FOUND
+            if raw_response.get('not_found'):
+                return None, OUTCOME_NOT_FOUND
+            if raw_response.get('timed_out'):
+                return None, OUTCOME_TIMEOUT
+            return None, OUTCOME_ERROR
+
+        elif game_type == "freefire":
             raw_response = await get_freefire_player_name_async(player_id)
-            print(f"🔥 Free Fire Response for {player_id}: {raw_response}")
+            parse_started = time.perf_counter()
+            logger.debug("🔥 Free Fire Response for %s: %s", player_id, raw_response)
 
             # معالجة استجابة Free Fire - تحديث المعالجة
             if raw_response and isinstance(raw_response, dict):
@@ -147,19 +319,22 @@ async def get_player_name_async(player_id: str, game_type: str = "pubg") -> Opti
                     if data.get('status') == 200 and data.get('msg') == 'id_found':
                         player_data = data.get('data', {})
                         player_name = player_data.get('nickname')
-                        print(f"✅ Free Fire Player Found: {player_name}")
-                        return player_name
-                    else:
-                        print(f"❌ Free Fire Player Not Found - Status: {data.get('status')}, Msg: {data.get('msg')}")
+                        logger.info("✅ Free Fire Player Found: %s", player_name)
+                        return player_name, OUTCOME_FOUND
+                    if data.get('status') == FREEFIRE_NOT_FOUND_STATUS or data.get('msg') in FREEFIRE_NOT_FOUND_MSGS:
+                        logger.info("❌ Free Fire Player Not Found - Status: %s, Msg: %s", data.get('status'), data.get('msg'))
+                        return None, OUTCOME_NOT_FOUND
+                    logger.error("❌ Free Fire Unexpected Response - Status: %s, Msg: %s", data.get('status'), data.get('msg'))
                 else:
-                    print(f"❌ Free Fire Request Failed: {raw_response}")
+                    logger.error("❌ Free Fire Request Failed: %s", raw_response)
             else:
-                print(f"❌ Free Fire Invalid Response: {raw_response}")
-            return None
+                logger.error("❌ Free Fire Invalid Response: %s", raw_response)
+            return None, OUTCOME_ERROR
 
-        elif game_type in ["jawaker", "jw"]:
+        elif game_type == "jawaker":
             raw_response = await get_jawaker_player_name_async(player_id)
-            print(f"🎯 Jawaker Response for {player_id}: {raw_response}")
+            parse_started = time.perf_counter()
+            logger.debug("🎯 Jawaker Response for %s: %s", player_id, raw_response)
 
             # معالجة استجابة Jawaker - إصلاح بنية الاستجابة
             if raw_response and isinstance(raw_response, dict):
@@ -167,21 +342,25 @@ async def get_player_name_async(player_id: str, game_type: str = "pubg") -> Opti
                     data = raw_response.get('data', {})
                     # بنية Jawaker مختلفة - البيانات في user.login
                     user_data = data.get('user', {})
-                    if user_data:
+                    if user_data and user_data.get('login'):
                         player_name = user_data.get('login')  # اسم اللاعب في login
-                        print(f"✅ Jawaker Player Found: {player_name}")
-                        return player_name
-                    else:
-                        print(f"❌ Jawaker No User Data: {data}")
+                        logger.info("✅ Jawaker Player Found: %s", player_name)
+                        return player_name, OUTCOME_FOUND
+                    # غير موجود فقط إذا أرجع المصدر المفتاح user فارغاً - غيره (رسالة خطأ، صيانة) خطأ
+                    if 'user' in data and not user_data:
+                        logger.info("❌ Jawaker No User Data: %s", data)
+                        return None, OUTCOME_NOT_FOUND
+                    logger.error("❌ Jawaker Unexpected Response: %s", data)
                 else:
-                    print(f"❌ Jawaker Request Failed: {raw_response}")
+                    logger.error("❌ Jawaker Request Failed: %s", raw_response)
             else:
-                print(f"❌ Jawaker Invalid Response: {raw_response}")
-            return None
+                logger.error("❌ Jawaker Invalid Response: %s", raw_response)
+            return None, OUTCOME_ERROR
 
-        elif game_type in ["bigolive", "bigo"]:
+        elif game_type == "bigolive":
             raw_response = await get_bigolive_player_name_async(player_id)
-            print(f"🎪 BigOLive Response for {player_id}: {raw_response}")
+            parse_started = time.perf_counter()
+            logger.debug("🎪 BigOLive Response for %s: %s", player_id, raw_response)
 
             # معالجة استجابة BigOLive - إصلاح بنية الاستجابة
             if raw_response and isinstance(raw_response, dict):
@@ -191,21 +370,24 @@ async def get_player_name_async(player_id: str, game_type: str = "pubg") -> Opti
                         inner_data = outer_data.get('data', {})
                         if inner_data.get('matched') and inner_data.get('exists'):
                             player_name = inner_data.get('nickname')
-                            print(f"✅ BigOLive Player Found: {player_name}")
-                            return player_name
-                        else:
-                            print(f"❌ BigOLive Player Not Found - Matched: {inner_data.get('matched')}, Exists: {inner_data.get('exists')}")
+                            logger.info("✅ BigOLive Player Found: %s", player_name)
+                            return player_name, OUTCOME_FOUND
+                        if _livesbuy_not_found(inner_data):
+                            logger.info("❌ BigOLive Player Not Found - Matched: %s, Exists: %s", inner_data.get('matched'), inner_data.get('exists'))
+                            return None, OUTCOME_NOT_FOUND
+                        logger.error("❌ BigOLive Unexpected Response: %s", outer_data)
                     else:
-                        print(f"❌ BigOLive Inner Request Failed: {outer_data}")
+                        logger.error("❌ BigOLive Inner Request Failed: %s", outer_data)
                 else:
-                    print(f"❌ BigOLive Request Failed: {raw_response}")
+                    logger.error("❌ BigOLive Request Failed: %s", raw_response)
             else:
-                print(f"❌ BigOLive Invalid Response: {raw_response}")
-            return None
+                logger.error("❌ BigOLive Invalid Response: %s", raw_response)
+            return None, OUTCOME_ERROR
 
-        elif game_type in ["poppolive", "poppo"]:
+        elif game_type == "poppolive":
             raw_response = await get_poppolive_player_name_async(player_id)
-            print(f"🎭 Poppo Live Response for {player_id}: {raw_response}")
+            parse_started = time.perf_counter()
+            logger.debug("🎭 Poppo Live Response for %s: %s", player_id, raw_response)
 
             # معالجة استجابة Poppo Live - إصلاح بنية الاستجابة
             if raw_response and isinstance(raw_response, dict):
@@ -215,27 +397,270 @@ async def get_player_name_async(player_id: str, game_type: str = "pubg") -> Opti
                         inner_data = outer_data.get('data', {})
                         if inner_data.get('matched') and inner_data.get('exists'):
                             player_name = inner_data.get('nickname')
-                            print(f"✅ Poppo Live Player Found: {player_name}")
-                            return player_name
-                        else:
-                            print(f"❌ Poppo Live Player Not Found - Matched: {inner_data.get('matched')}, Exists: {inner_data.get('exists')}")
+                            logger.info("✅ Poppo Live Player Found: %s", player_name)
+                            return player_name, OUTCOME_FOUND
+                        if _livesbuy_not_found(inner_data):
+                            logger.info("❌ Poppo Live Player Not Found - Matched: %s, Exists: %s", inner_data.get('matched'), inner_data.get('exists'))
+                            return None, OUTCOME_NOT_FOUND
+                        logger.error("❌ Poppo Live Unexpected Response: %s", outer_data)
                     else:
-                        print(f"❌ Poppo Live Inner Request Failed: {outer_data}")
+                        logger.error("❌ Poppo Live Inner Request Failed: %s", outer_data)
                 else:
-                    print(f"❌ Poppo Live Request Failed: {raw_response}")
+                    logger.error("❌ Poppo Live Request Failed: %s", raw_response)
             else:
-                print(f"❌ Poppo Live Invalid Response: {raw_response}")
-            return None
+                logger.error("❌ Poppo Live Invalid Response: %s", raw_response)
+            return None, OUTCOME_ERROR
 
         else:
-            return None
+            return None, OUTCOME_ERROR
 
     except Exception as e:
-        print(f"❌ خطأ في معالجة استجابة {game_type}: {e}")
-        print(f"📋 Raw response: {raw_response}")
-        print(f"🔍 Exception details: {type(e).__name__}: {str(e)}")
+        logger.error("❌ خطأ في معالجة استجابة %s: %s", game_type, e)
+        logger.debug("📋 Raw response: %s", raw_response)
+        logger.debug("🔍 Exception details: %s: %s", type(e).__name__, str(e))
+        return None, OUTCOME_ERROR
+    finally:
+        if parse_started is not None:
+            server_timing.record("parse", time.perf_counter() - parse_started)
+
+async def get_player_name_async(player_id: str, game_type: str = "pubg", timeout: Optional[float] = None,
+                                priority: Optional[str] = None) -> Optional[str]:
+    """
+    جلب اسم اللاعب حسب نوع اللعبة (نسخة غير متزامنة عالية الأداء)
+    يتحقق من الذاكرة المؤقتة أولاً ثم يحصل على الاستجابة الخام من ملفات الألعاب ويعالجها
+    الطلبات المتطابقة الجارية (نفس اللعبة ونفس المعرف) تُدمج في طلب واحد للمصدر
+    أخطاء المصدر لا تُخزن - فقط الأسماء الموجودة ونتائج "غير موجود"
+
+    Args:
+        player_id (str): معرف اللاعب
+        game_type (str): نوع اللعبة (pubg, freefire, jawaker, bigolive, poppolive)
+        timeout (float): مهلة البحث بالثواني - بعدها يُرجع None (عملية الجلب المشتركة تُقطع عند نفس المهلة في PUBG)
+        priority (str): أولوية الطلب في قائمة متصفحات PUBG (high / normal / bulk)
+
+    Returns:
+        str or None: اسم اللاعب أو None إذا لم يوجد
+    """
+    game = normalize_game_type(game_type)
+    if game is None:
         return None
 
+    cache_started = time.perf_counter()
+    hit, cached_name = _lookup_cache.get(game, player_id)
+    server_timing.record("cache", time.perf_counter() - cache_started)
+    if hit:
+        CACHE_REQUESTS.labels(game, "hit").inc()
+        return cached_name
+    CACHE_REQUESTS.labels(game, "miss").inc()
+
+    started = time.perf_counter()
+    deadline = time.time() + timeout if timeout else None
+
+    # الطلبات المتطابقة المتزامنة تشترك في عملية جلب واحدة
+    # المنضم بأولوية أعلى أو مهلة أبعد يرفع أولوية بحث PUBG المشترك أو يمدد مهلته
+    lookup = _single_flight.do(
+        (game, player_id),
+        lambda: _fetch_and_cache(player_id, game, deadline, priority),
+        on_join=(lambda: promote_pubg_request(player_id, deadline, priority)) if game == "pubg" else None
+    )
+    try:
+        player_name, outcome, phases = await (lookup if deadline is None else asyncio.wait_for(lookup, timeout))
+    except asyncio.TimeoutError:
+        LOOKUP_DURATION.labels(game, OUTCOME_TIMEOUT).observe(time.perf_counter() - started)
+        logger.warning("⏰ انتهت مهلة البحث (%sث) - Player ID: %s, Game: %s", timeout, player_id, game)
+        return None
+    # مراحل العملية المشتركة (queue / browser / upstream ...) تُضاف لقياس كل منتظر وليس لأول طلب فقط
+    timing = server_timing.current()
+    if timing is not None:
+        timing.merge(phases)
+    LOOKUP_DURATION.labels(game, outcome).observe(time.perf_counter() - started)
+    return player_name
+
+async def _fetch_and_cache(player_id: str, game_type: str, deadline: Optional[float] = None,
+                           priority: Optional[str] = None) -> Tuple[Optional[str], str, Dict[str, float]]:
+    """
+    جلب اسم اللاعب من الذاكرة الدائمة أو من المصدر وتخزين النتيجة إذا لم تكن خطأ
+    تعمل في مهمة مشتركة بين الطلبات المدمجة - تقيس مراحلها في ServerTiming خاص بها وترجعها مع النتيجة
+
+    Returns:
+        (player_name, outcome, phases)
+    """
+    timing = server_timing.start()
+    player_name, outcome = await _fetch_from_source(player_id, game_type, deadline, priority)
+    return player_name, outcome, timing.phases
+
+async def _fetch_from_source(player_id: str, game_type: str, deadline: Optional[float] = None,
+                             priority: Optional[str] = None) -> Tuple[Optional[str], str]:
+    """الذاكرة الدائمة ثم المصدر - انظر _fetch_and_cache"""
+    if _persistent_cache:
+        with tracing.start_span("persistent_cache") as span:
+            cache_started = time.perf_counter()
+            hit, player_name, remaining_ttl = await _persistent_cache.get(game_type, player_id)
+            server_timing.record("cache", time.perf_counter() - cache_started)
+            span.set_attribute("hit", hit)
+        if hit:
+            _lookup_cache.set(game_type, player_id, player_name, ttl=remaining_ttl)
+            return player_name, OUTCOME_FOUND if player_name is not None else OUTCOME_NOT_FOUND
+
+    with tracing.start_span("upstream", {"game": game_type}) as span:
+        async with _admission.track(game_type, await _game_concurrency(game_type)):
+            player_name, outcome = await _fetch_player_name(player_id, game_type, deadline, priority)
+        span.set_attribute("outcome", outcome)
+    if outcome in (OUTCOME_FOUND, OUTCOME_NOT_FOUND):
+        _lookup_cache.set(game_type, player_id, player_name)
+        if _persistent_cache:
+            _persistent_cache.put(game_type, player_id, player_name)
+    return player_name, outcome
+
+async def _game_concurrency(game_type: str) -> int:
+    """عدد الطلبات المتوازية المسموح بها للعبة (نفس حدود Connection Pool ومتصفحات PUBG)"""
+    if game_type == "pubg":
+        return get_pubg_concurrency()
+    pool = await get_connection_pool()
+    return pool.config.concurrent_requests_per_game
+
+async def _lookup_game_batch(game_type: str, entries: List[Tuple[Any, str]],
+                             on_result: Callable[[Any, Dict], Awaitable[None]]):
+    """
+    البحث عن مجموعة معرفات للعبة واحدة بعدد محدود من العمال
+
+    Args:
+        game_type (str): الاسم الموحد للعبة
+        entries: قائمة (وسم، معرف اللاعب) - الوسم يُمرر كما هو إلى on_result
+        on_result: دالة تُستدعى لكل نتيجة فور اكتمالها
+    """
+    pending = iter(entries)
+
+    async def worker():
+        # المكرر مشترك بين العمال - كل عامل يأخذ المعرف التالي حتى النهاية
+        for tag, player_id in pending:
+            timing = server_timing.start()
+            try:
+                # الدفعات تأتي بعد الطلبات الفردية في قائمة متصفحات PUBG
+                player_name = await get_player_name_async(player_id, game_type, priority=BATCH_PRIORITY)
+                item = {"player_name": player_name, "error": None}
+            except Exception as e:
+                item = {"player_name": None, "error": str(e)}
+            item["server_timing"] = timing.header()
+            await on_result(tag, item)
+
+    worker_count = min(await _game_concurrency(game_type), len(entries))
+    await asyncio.gather(*[worker() for _ in range(worker_count)])
+
+def _validate_batch_item(player_id: str, game_type: str) -> Tuple[str, Optional[str], Optional[Dict]]:
+    """تنظيف عنصر دفعة - يرجع (المعرف، اللعبة الموحدة، نتيجة خطأ جاهزة أو None)"""
+    game = normalize_game_type(game_type)
+    player_id = str(player_id).strip()
+    if game is None:
+        return player_id, None, {"player_name": None, "error": "unsupported_game"}
+    if not player_id:
+        return player_id, game, {"player_name": None, "error": "invalid_player_id"}
+    return player_id, game, None
+
+async def get_player_names_async(items: List[Tuple[str, str]]) -> List[Dict]:
+    """
+    البحث عن أسماء مجموعة من اللاعبين دفعة واحدة
+
+    Args:
+        items: قائمة (معرف اللاعب، نوع اللعبة)
+
+    Returns:
+        list: نتيجة لكل عنصر بنفس الترتيب الأصلي - {player_id, game_type, player_name, error}
+    """
+    # إزالة التكرار وتجميع المعرفات حسب اللعبة
+    per_game: Dict[str, List[Tuple[str, str]]] = {}
+    seen = set()
+    for player_id, game_type in items:
+        player_id, game, error = _validate_batch_item(player_id, game_type)
+        if error or (game, player_id) in seen:
+            continue
+        seen.add((game, player_id))
+        per_game.setdefault(game, []).append((player_id, player_id))
+
+    results: Dict[Tuple[str, str], Dict] = {}
+
+    def collector(game: str):
+        async def on_result(player_id: str, item: Dict):
+            results[(game, player_id)] = item
+        return on_result
+
+    await asyncio.gather(*[
+        _lookup_game_batch(game, entries, collector(game))
+        for game, entries in per_game.items()
+    ])
+
+    ordered = []
+    for player_id, game_type in items:
+        player_id, game, error = _validate_batch_item(player_id, game_type)
+        item = error or results.get((game, player_id), {"player_name": None, "error": "not_processed"})
+        ordered.append({"player_id": player_id, "game_type": game_type, **item})
+    return ordered
+
+def _format_stream_event(result: Dict, stream_format: str) -> str:
+    """تحويل نتيجة واحدة إلى سطر NDJSON أو حدث SSE"""
+    payload = json.dumps(result, ensure_ascii=False)
+    if stream_format == "sse":
+        return f"event: result\ndata: {payload}\n\n"
+    return payload + "\n"
+
+async def stream_player_names(items: List[Tuple[str, str]], stream_format: str = "ndjson") -> AsyncIterator[str]:
+    """
+    البحث عن أسماء مجموعة من اللاعبين وإرسال كل نتيجة فور اكتمالها (مثل asyncio.as_completed)
+    كل نتيجة تحمل index العنصر في الطلب الأصلي. المخزن المؤقت محدود (STREAM_BUFFER_SIZE)
+    فالعمال يتوقفون إذا كان العميل بطيئاً، وإغلاق المولد (انقطاع العميل) يلغي كل العمل المتبقي
+
+    Args:
+        items: قائمة (معرف اللاعب، نوع اللعبة)
+        stream_format (str): ndjson أو sse
+
+    Yields:
+        str: سطر NDJSON أو حدث SSE لكل عنصر
+    """
+    results: asyncio.Queue = asyncio.Queue(maxsize=STREAM_BUFFER_SIZE)
+    per_game: Dict[str, List[Tuple[int, str]]] = {}
+    ready = []
+
+    for index, (player_id, game_type) in enumerate(items):
+        player_id, game, error = _validate_batch_item(player_id, game_type)
+        if error:
+            ready.append({"index": index, "player_id": player_id, "game_type": game_type, **error})
+        else:
+            per_game.setdefault(game, []).append((index, player_id))
+
+    async def publish(index: int, item: Dict):
+        player_id, game_type = items[index]
+        await results.put({"index": index, "player_id": str(player_id).strip(), "game_type": game_type, **item})
+
+    async def produce():
+        try:
+            await asyncio.gather(*[
+                _lookup_game_batch(game, entries, publish)
+                for game, entries in per_game.items()
+            ])
+        finally:
+            await results.put(None)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        for result in ready:
+            yield _format_stream_event(result, stream_format)
+
+        while True:
+            result = await results.get()
+            if result is None:
+                break
+            yield _format_stream_event(result, stream_format)
+
+        if stream_format == "sse":
+            yield "event: done\ndata: {}\n\n"
+    finally:
+        # العميل انقطع أو انتهى البث - إلغاء العمال والطلبات التي لم تبدأ بعد
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except (asyncio.CancelledError, Exception):
+                pass
+
 def get_player_name(player_id: str, game_type: str = "pubg") -> Optional[str]:
     """
     جلب اسم اللاعب حسب نوع اللعبة (نسخة متزامنة للاختبار)
@@ -311,7 +736,7 @@ def get_player_name(player_id: str, game_type: str = "pubg") -> Optional[str]:
             return None
 
     except Exception as e:
-        print(f"خطأ في معالجة استجابة {game_type}: {e}")
+        logger.error("خطأ في معالجة استجابة %s: %s", game_type, e)
         return None
 
 @app.get("/")
@@ -322,11 +747,55 @@ async def root():
         "version": "2.0.0",
         "description": "API للبحث عن أسماء اللاعبين",
         "supported_games": ["PUBG", "Free Fire", "Jawaker", "BigOLive", "Poppo Live"],
-        "endpoint": "/get_player_name"
+        "endpoint": "/get_player_name",
+        "batch_endpoint": "/get_player_names",
+        "stream_endpoint": "/get_player_names/stream"
     }
 
+async def _cancel_on_disconnect(http_request: Request, coro: Awaitable[Any]) -> Optional[Any]:
+    """
+    تنفيذ عملية البحث مع إلغائها إذا أغلق العميل الاتصال قبل اكتمالها
+    (الإلغاء يصل لقائمة انتظار متصفحات PUBG فلا يحجز الطلب متصفحاً بلا فائدة)
+
+    Returns:
+        نتيجة العملية أو None إذا انقطع الاتصال
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                logger.warning("🔌 العميل أغلق الاتصال - إلغاء البحث")
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                return None
+    finally:
+        if not task.done():
+            task.cancel()
+
+async def _check_admission(player_id: str, game_type: str, timeout: Optional[float]):
+    """
+    فحص قبول طلب فردي قبل بدء البحث
+    نتائج الذاكرة المؤقتة والطلبات المنضمة لعملية جارية لا تضيف حملاً على المصدر فتُقبل دائماً
+
+    Returns:
+        AdmissionDecision أو None إذا لم يكن الطلب بحاجة للفحص
+    """
+    game = normalize_game_type(game_type)
+    if not ADMISSION_ENABLED or game is None:
+        return None
+    if _lookup_cache.contains(game, player_id) or _single_flight.is_inflight((game, player_id)):
+        return None
+    slo = min(_admission.slo, timeout) if timeout else None
+    return _admission.evaluate(game, await _game_concurrency(game), slo)
+
 @app.post("/get_player_name", response_model=PlayerResponse)
-async def get_player_name_endpoint(request: PlayerRequest):
+async def get_player_name_endpoint(request: PlayerRequest, http_request: Request, response: Response):
     """
     جلب اسم اللاعب باستخدام معرف اللاعب ونوع اللعبة
 
@@ -338,7 +807,9 @@ async def get_player_name_endpoint(request: PlayerRequest):
 
     Returns:
         {"player_name": "اسم_اللاعب"} أو {"player_name": null}
+        429 مع Retry-After إذا كان الزمن المتوقع للطلب أكبر من ADMISSION_SLO
     """
+    timing = server_timing.start()
     try:
         # التحقق من صحة معرف اللاعب
         if not str(request.player_id).strip():
@@ -349,16 +820,94 @@ async def get_player_name_endpoint(request: PlayerRequest):
         if request.game_type.lower() not in supported_games:
             return PlayerResponse(player_name=None)
         
-        # جلب اسم اللاعب
-        print(f"🔍 Processing request - Player ID: {request.player_id.strip()}, Game: {request.game_type}")
-        player_name = await get_player_name_async(request.player_id.strip(), request.game_type)
-        print(f"📤 Returning response - Player Name: {player_name}")
-
-        return PlayerResponse(player_name=player_name)
+        # trace واحد لكل طلب (حسب نسبة العينات) - المراحل التالية تُسجل تحته تلقائياً
+        attributes = {"game": request.game_type, "player_id": request.player_id.strip(), "priority": request.priority}
+        with tracing.start_span("get_player_name", attributes, root=True) as span:
+            admission_started = time.perf_counter()
+            decision = await _check_admission(request.player_id.strip(), request.game_type, request.timeout)
+            timing.record("admission", time.perf_counter() - admission_started)
+            if decision is not None:
+                if not decision.admitted:
+                    span.set_attribute("rejected", True)
+                    logger.warning("🚦 رفض الطلب - الزمن المتوقع %.1fث - إعادة المحاولة بعد %sث", decision.eta, decision.retry_after)
+                    return JSONResponse(
+                        status_code=429,
+                        content={"player_name": None, "error": "overloaded", "retry_after": decision.retry_after},
+                        headers={"Retry-After": str(decision.retry_after), "Server-Timing": timing.header()}
+                    )
+                span.set_attribute("queue_position", decision.position)
+                span.set_attribute("eta", decision.eta)
+                if ADMISSION_ETA_HEADERS:
+                    response.headers["X-Queue-Position"] = str(decision.position)
+                    response.headers["X-Queue-ETA"] = f"{decision.eta:.2f}"
+
+            # جلب اسم اللاعب
+            logger.debug("🔍 Processing request - Player ID: %s, Game: %s", request.player_id.strip(), request.game_type)
+            player_name = await _cancel_on_disconnect(
+                http_request,
+                get_player_name_async(request.player_id.strip(), request.game_type, request.timeout, request.priority))
+            logger.debug("📤 Returning response - Player Name: %s", player_name)
+            span.set_attribute("found", player_name is not None)
+            return PlayerResponse(player_name=player_name)
     
     except Exception as e:
-        print(f"❌ Error in endpoint: {e}")
+        logger.error("❌ Error in endpoint: %s", e)
         return PlayerResponse(player_name=None)
+    finally:
+        # كل مسارات الرجوع (التحقق والخطأ والنجاح) تحمل الـ header - استجابة 429 تحمله بنفسها
+        response.headers["Server-Timing"] = timing.header()
+
+@app.post("/get_player_names", response_model=BatchPlayerResponse)
+async def get_player_names_endpoint(request: BatchPlayerRequest):
+    """
+    جلب أسماء مجموعة من اللاعبين في طلب واحد
+
+    Body:
+        {
+            "items": [
+                {"player_id": "معرف_اللاعب", "game_type": "نوع_اللعبة"},
+                ...
+            ]
+        }
+
+    Returns:
+        {"results": [{"player_id", "game_type", "player_name", "error"}, ...]} بنفس ترتيب الطلب
+    """
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"الحد الأقصى {BATCH_MAX_ITEMS} عنصر في الطلب الواحد")
+
+    logger.info("📦 Processing batch request - Items: %s", len(request.items))
+    results = await get_player_names_async([(item.player_id, item.game_type) for item in request.items])
+    return BatchPlayerResponse(results=[BatchPlayerResult(**result) for result in results])
+
+@app.post("/get_player_names/stream")
+async def stream_player_names_endpoint(request: BatchPlayerRequest, format: str = "ndjson"):
+    """
+    جلب أسماء مجموعة كبيرة من اللاعبين مع إرسال كل نتيجة فور اكتمالها
+
+    Query:
+        format: ndjson (افتراضي) أو sse
+
+    Body:
+        نفس /get_player_names
+
+    Returns:
+        NDJSON: سطر لكل عنصر {"index", "player_id", "game_type", "player_name", "error"}
+        SSE: حدث result لكل عنصر ثم حدث done في النهاية
+    """
+    stream_format = format.lower()
+    if stream_format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format يجب أن يكون ndjson أو sse")
+    if len(request.items) > STREAM_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"الحد الأقصى {STREAM_MAX_ITEMS} عنصر في الطلب الواحد")
+
+    logger.info("📡 Streaming batch request - Items: %s, Format: %s", len(request.items), stream_format)
+    items = [(item.player_id, item.game_type) for item in request.items]
+    return StreamingResponse(
+        stream_player_names(items, stream_format),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+        headers={"Cache-Control": "no-cache"}
+    )
 
 @app.get("/health")
 async def health_check():
@@ -369,6 +918,11 @@ async def health_check():
         "supported_games": ["PUBG", "Free Fire", "Jawaker", "BigOLive", "Poppo Live"]
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """مقاييس الأداء بصيغة Prometheus (زمن البحث لكل لعبة، انتظار ومدة خدمة متصفحات PUBG، حالة المتصفحات، نسب الذاكرة المؤقتة)"""
+    return PlainTextResponse(METRICS_REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/stats")
 async def get_performance_stats():
     """الحصول على إحصائيات الأداء"""
@@ -380,8 +934,14 @@ async def get_performance_stats():
         return {
             "status": "success",
             "connection_pool_stats": stats,
+            "lookup_cache_stats": _lookup_cache.get_stats(),
+            "persistent_cache_stats": _persistent_cache.get_stats() if _persistent_cache else None,
+            "single_flight_stats": _single_flight.get_stats(),
+            "admission_stats": _admission.get_stats(),
+            "tracing_stats": tracing.get_tracer().get_stats(),
+            "pubg": await get_pubg_status(),
             "max_concurrent_requests": MAX_CONCURRENT_REQUESTS,
-            "pubg_browsers": 3,
+            "pubg_browsers": get_pubg_concurrency(),
             "other_games_concurrent_limit": 10
         }
     except Exception as e:
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prometheus Metrics
+مقاييس بصيغة Prometheus النصية بدون مكتبات خارجية
+- Counter و Gauge و Histogram مع labels (نفس واجهة prometheus_client: metric.labels(...).observe())
+- التحديث على المسار الساخن عملية جمع وبحث ثنائي فقط - التجميع التراكمي يتم عند القراءة
+- Gauge يمكن ربطه بدالة تُستدعى عند القراءة فقط (حالة المتصفحات ونسب الذاكرة المؤقتة)
+"""
+
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# حدود الـ buckets الافتراضية بالثواني (من استجابات HTTP السريعة حتى بحث متصفح بطيء)
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class MetricsRegistry:
+    """مجموعة المقاييس التي تُعرض في /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, "_Metric"] = {}
+
+    def register(self, metric: "_Metric"):
+        if metric.name in self._metrics:
+            raise ValueError(f"المقياس {metric.name} مسجل مسبقاً")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """تحويل جميع المقاييس لصيغة Prometheus النصية"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+class _Metric:
+    """أساس المقاييس - قيمة مستقلة لكل مجموعة labels"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional[MetricsRegistry] = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values: str):
+        """القيمة الخاصة بمجموعة labels (تُنشأ عند أول استخدام ثم تُعاد من القاموس)"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} يتطلب labels: {self.labelnames}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+class Counter(_Metric):
+    """عداد متزايد فقط"""
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+                for key, child in self._children.items()]
+
+class Gauge(Counter):
+    """قيمة لحظية - تُضبط مباشرة أو تُحسب عند القراءة من دالة"""
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._collector: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def set_function(self, collector: Callable[[], Dict[Tuple[str, ...], float]]):
+        """
+        ربط المقياس بدالة تُستدعى عند كل قراءة فقط (لا تكلفة على المسار الساخن)
+
+        Args:
+            collector: دالة ترجع {(قيم labels...): القيمة}
+        """
+        self._collector = collector
+
+    def samples(self) -> List[str]:
+        if self._collector is not None:
+            try:
+                values = self._collector()
+            except Exception:
+                values = {}
+            self._children = {}
+            for key, value in values.items():
+                self.labels(*key).set(value)
+        return super().samples()
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # غير تراكمي - آخر خانة لـ +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+class Histogram(_Metric):
+    """توزيع القيم على buckets ثابتة (لحساب p50/p95/p99 في Prometheus)"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional[MetricsRegistry] = REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent Lookup Cache (SQLite)
+ذاكرة تخزين دائمة لنتائج البحث تبقى بعد إعادة تشغيل العملية
+- SQLite بوضع WAL في ملف محلي
+- جميع عمليات القاعدة تعمل في خيط منفصل خارج حلقة الأحداث
+- الكتابة غير متزامنة على دفعات داخل معاملة واحدة
+- حذف المدخلات المنتهية دورياً (compaction)
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("istation.cache")
+
+class PersistentLookupCache:
+    """طبقة تخزين دائمة خلف LookupCache - مفتاحها (اللعبة، معرف اللاعب)"""
+
+    def __init__(self, path: str, found_ttl: float = 3600, not_found_ttl: float = 300,
+                 flush_interval: float = 1.0, flush_batch_size: int = 200,
+                 compact_interval: float = 3600):
+        self.path = path
+        self.found_ttl = found_ttl
+        self.not_found_ttl = not_found_ttl
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self.compact_interval = compact_interval
+
+        self._conn: Optional[sqlite3.Connection] = None
+        # خيط واحد فقط - اتصال SQLite لا يُشارك بين الخيوط
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lookup-cache-db")
+        # (اللعبة، المعرف) -> (الاسم، وقت الانتهاء، وقت الكتابة) بانتظار الكتابة للقاعدة
+        self._pending: Dict[Tuple[str, str], Tuple[Optional[str], float, float]] = {}
+        # الدفعة التي تُكتب حالياً - تبقى مقروءة حتى تنتهي المعاملة
+        self._flushing: Dict[Tuple[str, str], Tuple[Optional[str], float, float]] = {}
+        self._flush_event: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_compact = 0.0
+        self._closed = False
+        self.stats = {
+            "reads": 0,
+            "hits": 0,
+            "writes": 0,
+            "flushes": 0,
+            "compacted": 0,
+            "errors": 0
+        }
+
+    # ===== عمليات القاعدة (تعمل داخل خيط القاعدة فقط) =====
+
+    def _connect(self) -> sqlite3.Connection:
+        """فتح القاعدة عند أول استخدام"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lookups (
+                    game_type TEXT NOT NULL,
+                    player_id TEXT NOT NULL,
+                    player_name TEXT,
+                    expires_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (game_type, player_id)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS lookups_updated_at ON lookups (updated_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _db_get(self, game_type: str, player_id: str) -> Optional[Tuple[Optional[str], float]]:
+        row = self._connect().execute(
+            "SELECT player_name, expires_at FROM lookups WHERE game_type = ? AND player_id = ?",
+            (game_type, player_id)
+        ).fetchone()
+        return row
+
+    def _db_write(self, rows: List[Tuple[str, str, Optional[str], float, float]]):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO lookups (game_type, player_id, player_name, expires_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def _db_compact(self, now: float) -> int:
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute("DELETE FROM lookups WHERE expires_at <= ?", (now,))
+        return cursor.rowcount
+
+    def _db_load_recent(self, limit: int, now: float) -> List[Tuple[str, str, Optional[str], float]]:
+        return self._connect().execute(
+            "SELECT game_type, player_id, player_name, expires_at FROM lookups "
+            "WHERE expires_at > ? ORDER BY updated_at DESC LIMIT ?",
+            (now, limit)
+        ).fetchall()
+
+    def _db_close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _run(self, func, *args):
+        """تشغيل عملية قاعدة في خيط القاعدة"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    # ===== الواجهة غير المتزامنة =====
+
+    async def start(self):
+        """بدء مهمة الكتابة الدورية وحذف المدخلات المنتهية"""
+        if self._flush_task is not None:
+            return
+        self._flush_event = asyncio.Event()
+        await self.compact()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def get(self, game_type: str, player_id: str) -> Tuple[bool, Optional[str], float]:
+        """
+        البحث عن نتيجة مخزنة
+
+        Returns:
+            (hit, player_name, remaining_ttl)
+        """
+        self.stats["reads"] += 1
+        now = time.time()
+
+        key = (game_type, player_id)
+        pending = self._pending.get(key) or self._flushing.get(key)
+        if pending is not None:
+            row = pending[:2]
+        else:
+            try:
+                row = await self._run(self._db_get, game_type, player_id)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error("❌ خطأ في قراءة الذاكرة الدائمة: %s", e)
+                return False, None, 0
+
+        if row is None or row[1] <= now:
+            return False, None, 0
+
+        self.stats["hits"] += 1
+        return True, row[0], row[1] - now
+
+    def put(self, game_type: str, player_id: str, player_name: Optional[str]):
+        """إضافة نتيجة لقائمة الكتابة - تُكتب للقاعدة في الدفعة التالية"""
+        ttl = self.found_ttl if player_name is not None else self.not_found_ttl
+        if ttl <= 0 or self._closed:
+            return
+
+        now = time.time()
+        self._pending[(game_type, player_id)] = (player_name, now + ttl, now)
+        if len(self._pending) >= self.flush_batch_size and self._flush_event is not None:
+            self._flush_event.set()
+
+    async def flush(self):
+        """كتابة جميع النتائج المعلقة في معاملة واحدة"""
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        self._flushing = batch
+        rows = [
+            (game_type, player_id, player_name, expires_at, updated_at)
+            for (game_type, player_id), (player_name, expires_at, updated_at) in batch.items()
+        ]
+        try:
+            await self._run(self._db_write, rows)
+            self.stats["writes"] += len(rows)
+            self.stats["flushes"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error("❌ خطأ في الكتابة للذاكرة الدائمة: %s", e)
+        finally:
+            self._flushing = {}
+
+    async def compact(self):
+        """حذف المدخلات المنتهية من القاعدة"""
+        self._last_compact = time.monotonic()
+        try:
+            self.stats["compacted"] += await self._run(self._db_compact, time.time())
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error("❌ خطأ في ضغط الذاكرة الدائمة: %s", e)
+
+    async def load_recent(self, limit: int) -> List[Tuple[str, str, Optional[str], float]]:
+        """
+        تحميل أحدث النتائج الصالحة لتدفئة الذاكرة المؤقتة عند بدء التشغيل
+
+        Returns:
+            list: (اللعبة، المعرف، الاسم، المدة المتبقية)
+        """
+        now = time.time()
+        try:
+            rows = await self._run(self._db_load_recent, limit, now)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error("❌ خطأ في تحميل الذاكرة الدائمة: %s", e)
+            return []
+        return [(game_type, player_id, player_name, expires_at - now)
+                for game_type, player_id, player_name, expires_at in rows]
+
+    async def _flush_loop(self):
+        """مهمة الخلفية - كتابة دورية أو عند امتلاء الدفعة"""
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+
+            await self.flush()
+            if time.monotonic() - self._last_compact >= self.compact_interval:
+                await self.compact()
+
+    async def close(self):
+        """إيقاف مهمة الخلفية وكتابة ما تبقى وإغلاق القاعدة"""
+        if self._closed:
+            return
+        self._closed = True
+
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+
+        await self.flush()
+        await self._run(self._db_close)
+        self._executor.shutdown(wait=True)
+
+    def get_stats(self) -> Dict:
+        """الحصول على إحصائيات الذاكرة الدائمة"""
+        return {
+            **self.stats,
+            "pending_writes": len(self._pending),
+            "path": self.path
+        }
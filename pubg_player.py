@@ -15,14 +15,22 @@ import time
 import logging
 import re
 import uuid
-from typing import Dict, Optional, List
+from collections import deque
+from typing import Deque, Dict, Optional, List, Set
 from enum import Enum
 from dataclasses import dataclass
 from flask import Flask, jsonify
 from flask_cors import CORS
+from single_flight import SingleFlight
+from asset_cache import StaticAssetCache
+from connection_pool import get_connection_pool, GameType
+from metrics import Gauge, Histogram
+import server_timing
+import tracing
+from structured_logging import setup_logging
 
-# تعطيل السجلات للحصول على أقصى أداء
-logging.disable(logging.CRITICAL)
+# السجلات تُكتب من خيط منفصل عند تفعيل setup_logging - مستوى الوحدة من LOG_MODULE_LEVELS في main
+logger = logging.getLogger("istation.pubg")
 
 # التحقق من المكتبات المطلوبة
 try:
@@ -33,6 +41,94 @@ except ImportError:
     print("❌ Playwright not installed. Install with: pip install playwright")
     print("   Then run: playwright install chromium")
 
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# ===== إعدادات نظام PUBG =====
+
+PUBG_BROWSER_COUNT = 3  # عدد خانات البحث المتوازية
+PUBG_CONTEXTS_PER_BROWSER = 1  # عدد الخانات داخل كل عملية Chromium (1 = متصفح كامل لكل خانة)
+PUBG_HEADLESS = True
+
+# التوسع التلقائي لعدد الخانات بين الحد الأدنى والأقصى حسب الحمل
+PUBG_AUTOSCALE_ENABLED = True
+PUBG_MIN_BROWSERS = 2
+PUBG_MAX_BROWSERS = 8
+
+WAIT_SAMPLES_MAX = 500  # عدد عينات انتظار المتصفح المحفوظة
+WAIT_SAMPLES_WINDOW = 60.0  # نافذة حساب p95 بالثواني
+AUTOSCALE_EVENTS_MAX = 50  # عدد قرارات التوسع المحفوظة للعرض
+
+# إعادة تدوير المتصفحات حسب الذاكرة (RSS) أو عدد عمليات البحث أو العمر
+PUBG_RECYCLE_ENABLED = True
+PUBG_RECYCLE_MAX_RSS_MB = 700  # لا يُطبق على الخانات المشتركة (PUBG_CONTEXTS_PER_BROWSER > 1) - انظر BrowserRecycler
+PUBG_RECYCLE_MAX_LOOKUPS = 500
+PUBG_RECYCLE_MAX_AGE = 3600
+PROCESS_MARKER_SWITCH = "--istation-slot="  # معامل تشغيل لتمييز عملية Chromium الخاصة بكل خانة في psutil
+
+# مهلة البحث الكاملة (انتظار المتصفح + البحث) ومراقبة الخانات العالقة
+PUBG_LOOKUP_TIMEOUT = 30.0
+PUBG_STUCK_BUSY_LIMIT = 180  # خانة مشغولة أطول من هذا تُعتبر عالقة (تشمل إعادة التحميل بعد البحث)
+PUBG_STUCK_INITIALIZING_LIMIT = 300
+SLOT_TASK_CANCEL_TIMEOUT = 5.0  # أقصى انتظار لإلغاء العملية الجارية على خانة قبل إعادة بنائها قسرياً
+
+# أولويات الطلبات - الأقل رقماً يُخدم أولاً، وداخل نفس الأولوية الأقرب مهلة أولاً
+PUBG_PRIORITIES = {'high': 0, 'normal': 1, 'bulk': 2}
+PUBG_DEFAULT_PRIORITY = 'normal'
+PUBG_MIN_LOOKUP_TIME = 1.0  # تقدير مدة البحث قبل توفر قياسات - الطلب الذي لا يكفي وقته يُسقط
+LOOKUP_SAMPLES_MAX = 100
+
+# استخراج الاسم من استجابة التحقق (XHR) في MidasBuy بدلاً من قراءة الصفحة
+MIDASBUY_VERIFY_URL_KEYWORDS = ('getcharac', 'getrole', 'checkrole', 'queryrole', 'roleinfo', 'role_info')
+MIDASBUY_NAME_KEYS = ('charac_name', 'role_name', 'rolename', 'nick_name', 'nickname', 'player_name')
+# رموز "الحساب غير موجود" فقط - أي رمز آخر غير صفري (توكن منتهٍ، حد المعدل، خطأ توقيع) غير حاسم
+MIDASBUY_NOT_FOUND_CODES = ('1001',)
+NAME_EXTRACTION_TIMEOUT = 3.0  # أقصى مدة انتظار الاسم بعد الضغط على زر التحقق
+# نتيجة _extract_player_name_smart عند انتهاء المهلة بدون نتيجة حاسمة - تختلف عن None (غير موجود صراحة)
+# حتى لا تُخزن صفحة بطيئة أو استجابة تحقق لم تُلتقط كنتيجة "غير موجود"
+NAME_EXTRACTION_TIMED_OUT = object()
+
+# إعادة تجهيز الصفحة بعد كل بحث: soft (تفريغ الحقل والنتيجة في مكانها) أو full (إعادة تحميل كاملة)
+PUBG_RESET_MODE = "soft"
+PUBG_FULL_RESET_EVERY = 25  # إعادة تحميل كاملة كل N عملية بحث حتى في وضع soft
+# context احتياطي جاهز لكل خانة يحل محل المستخدم فوراً بدلاً من انتظار إعادة التحميل الكاملة
+PUBG_STANDBY_CONTEXTS = True
+
+# عناصر صفحة MidasBuy
+PLAYER_ID_INPUT_SELECTORS = [
+    ".SelectServerBox_input_wrap_box__qq\\+Iq input",
+    "[class*='SelectServerBox_input_wrap_box'] input",
+    "input[type='text']"
+]
+PLAYER_NAME_XPATH = "/html/body/div[2]/div/div[2]/div[2]/div/div[2]/div[2]/div/div/div[1]/div/span[1]"
+# نفس عنصر الاسم بعد امتلائه بنص حقيقي (إعادة التجهيز السريعة تفرغ النص ولا تحذف العنصر)
+PLAYER_NAME_READY_SELECTOR = f"xpath=({PLAYER_NAME_XPATH})[string-length(normalize-space(.)) > 1]"
+
+# حجب الطلبات داخل Chromium عبر CDP (Network.setBlockedURLs) بدلاً من تمرير كل طلب عبر Python
+PUBG_CDP_BLOCKING = True
+
+# ذاكرة مشتركة لملفات JS/CSS الثابتة بين المتصفحات (تبقى بعد إعادة التشغيل حتى انتهاء max-age في Cache-Control)
+PUBG_ASSET_CACHE_ENABLED = True
+PUBG_ASSET_CACHE_DIR = "temp/asset_cache"
+PUBG_ASSET_CACHE_MAX_MB = 200
+PUBG_ASSET_CACHE_MEMORY_MB = 50
+STATIC_ASSET_URL = re.compile(r"^https://[^/]*midasbuy\.com/[^?#]+\.(js|css)(\?.*)?$", re.IGNORECASE)
+# Headers لا تُحفظ مع الملف (المحتوى يُخزن بعد فك الضغط)
+ASSET_SKIPPED_HEADERS = {'content-length', 'content-encoding', 'transfer-encoding', 'connection', 'set-cookie', 'date'}
+
+# المسار السريع بدون متصفح: إعادة إرسال طلب التحقق بجلسة MidasBuy مأخوذة من متصفح
+PUBG_HTTP_FAST_PATH_ENABLED = True
+PUBG_SESSION_MAX_AGE = 600  # عمر الجلسة المأخوذة قبل تجديدها (ثواني)
+PUBG_SESSION_CHECK_INTERVAL = 30  # فترة فحص صلاحية الجلسة (ثواني)
+PUBG_FAST_PATH_MAX_FAILURES = 3  # عدد الإخفاقات المتتالية قبل إلغاء الجلسة
+PUBG_HARVEST_PLAYER_ID = "5443564406"  # معرف معروف يُستخدم لتجديد الجلسة عند عدم وجود طلبات
+PUBG_HARVEST_MAX_BACKOFF = 1800  # أقصى فترة بين محاولات التجديد بعد إخفاقات متتالية (ثواني)
+# Headers لا تُنسخ من طلب المتصفح (يحددها aiohttp أو تُرسل ككوكيز)
+SESSION_SKIPPED_HEADERS = {'host', 'content-length', 'cookie', 'accept-encoding', 'connection'}
+
 # ===== فئات البيانات =====
 
 class BrowserState(Enum):
@@ -54,6 +150,20 @@ class BrowserInstance:
     current_request_id: Optional[str] = None
     error_count: int = 0
     last_used: float = 0
+    lookups_since_reload: int = 0  # عدد عمليات البحث منذ آخر إعادة تحميل كاملة
+    standby_context: Optional[BrowserContext] = None  # context احتياطي مجهز (المنطقة مختارة والحقل ظاهر)
+    standby_page: Optional[Page] = None
+    standby_building: bool = False
+    process_marker: str = ""  # قيمة PROCESS_MARKER_SWITCH لعملية Chromium التي تستضيف الخانة
+    created_at: float = 0  # وقت تشغيل المتصفح الحالي للخانة
+    lookups_total: int = 0  # عدد عمليات البحث منذ آخر إعادة تدوير
+    rss_mb: float = 0  # آخر قياس لذاكرة عملية Chromium (مقسومة على الخانات المشتركة)
+    recycle_count: int = 0
+    last_recycle_reason: Optional[str] = None
+    state_since: float = 0  # وقت دخول الحالة الحالية (BUSY أو INITIALIZING) لكشف الخانات العالقة
+    owns_browser: bool = True  # False إذا كانت عملية Chromium مشتركة مع خانات أخرى
+    active_task: Optional[asyncio.Task] = None  # العملية الجارية على الخانة (بحث أو إعادة تجهيز) - تُلغى قبل إعادة البناء القسري
+    generation: int = 0  # يزيد مع كل إعادة بناء (قسرية أو تدوير) - المهام الأقدم منه لا تغير حالة الخانة
 
 def get_midasbuy_cookies():
     """إرجاع الكوكيز المطلوبة لموقع MidasBuy"""
@@ -74,6 +184,69 @@ def get_midasbuy_cookies():
         {"name": "UUID", "value": "0970548902092409175226337639577889", "domain": "www.midasbuy.com", "path": "/"}
     ]
 
+def _find_player_name(data, depth: int = 0) -> Optional[str]:
+    """البحث عن اسم اللاعب داخل JSON متداخل"""
+    if depth > 4:
+        return None
+    if isinstance(data, dict):
+        for key in MIDASBUY_NAME_KEYS:
+            value = data.get(key)
+            if isinstance(value, str) and value.strip():
+                return value.strip()
+        children = data.values()
+    elif isinstance(data, list):
+        children = data
+    else:
+        return None
+
+    for child in children:
+        name = _find_player_name(child, depth + 1)
+        if name:
+            return name
+    return None
+
+def parse_midasbuy_verify_response(data) -> Optional[dict]:
+    """
+    تحليل JSON استجابة التحقق من معرف اللاعب في MidasBuy
+
+    Returns:
+        {'found': True, 'player_name': ...} أو {'found': False} لرموز MIDASBUY_NOT_FOUND_CODES فقط
+        أو None إذا كانت الاستجابة غير حاسمة (بما فيها أخطاء الجلسة مثل التوكن المنتهي)
+    """
+    if not isinstance(data, dict):
+        return None
+
+    name = _find_player_name(data)
+    if name:
+        return {'found': True, 'player_name': name}
+
+    for key in ('ret', 'retcode', 'code'):
+        if key in data:
+            if str(data[key]) in MIDASBUY_NOT_FOUND_CODES:
+                return {'found': False}
+            break
+    return None
+
+@dataclass
+class MidasBuySession:
+    """جلسة MidasBuy مأخوذة من طلب تحقق ناجح في المتصفح"""
+    url: str
+    method: str
+    headers: Dict[str, str]
+    cookies: Dict[str, str]
+    post_data: Optional[str]
+    player_id: str  # المعرف الموجود في الطلب الأصلي - يُستبدل عند إعادة الإرسال
+    harvested_at: float
+    browser_id: str = ""
+
+    def build_request(self, player_id: str) -> Optional[dict]:
+        """بناء طلب التحقق لمعرف لاعب آخر (None إذا لم يكن المعرف جزءاً من الطلب)"""
+        url = self.url.replace(self.player_id, player_id)
+        data = self.post_data.replace(self.player_id, player_id) if self.post_data else self.post_data
+        if url == self.url and data == self.post_data and player_id != self.player_id:
+            return None
+        return {'url': url, 'method': self.method, 'data': data, 'headers': dict(self.headers), 'cookies': dict(self.cookies)}
+
 @dataclass
 class PlayerRequest:
     """طلب البحث عن لاعب"""
@@ -82,6 +255,11 @@ class PlayerRequest:
     timestamp: float
     future: Optional[asyncio.Future] = None
     callback: Optional[callable] = None
+    deadline: Optional[float] = None  # وقت انتهاء المهلة (time.time) - بعده يُعاد خطأ timeout
+    priority: int = PUBG_PRIORITIES[PUBG_DEFAULT_PRIORITY]
+    task: Optional[asyncio.Task] = None  # مهمة البحث الجارية على متصفح (تُلغى إذا ألغى العميل)
+    trace_parent: Optional[object] = None  # الـ span النشط عند إضافة الطلب (للتتبع عبر موزع قائمة الانتظار)
+    timing: Optional[server_timing.ServerTiming] = None  # أزمنة مراحل طلب HTTP الأصلي (Server-Timing)
 
 # ===== فلتر المحتوى =====
 
@@ -118,6 +296,36 @@ class SuperFastFilter:
         
         self.stats = {'blocked': 0, 'allowed': 0, 'blocked_media': 0, 'blocked_tracking': 0}
 
+    def blocked_url_patterns(self) -> List[str]:
+        """
+        تحويل قوائم الحجب إلى أنماط Network.setBlockedURLs (wildcard *) تُطبق داخل Chromium
+        - الأنماط العامة (analytics/tracking/ads) تطابق أي جزء من الرابط مثل التعابير الحالية
+        - الامتدادات تحجب الملفات المعروفة، وأنواع الموارد بدون امتداد تُحجب عبر blocked_resource_patterns
+        """
+        patterns = [f"*{domain}*" for domain in sorted(self.blocked_domains)]
+        patterns += [f"*{pattern.pattern.strip('.*')}*" for pattern in self.patterns]
+        for extension in sorted(self.blocked_media_extensions):
+            patterns += [f"*{extension}", f"*{extension}?*"]
+        return patterns
+
+    def blocked_resource_patterns(self) -> List[dict]:
+        """أنماط Fetch.enable لأنواع الموارد المحجوبة (image / media / font / other) بأسماء CDP"""
+        return [{"urlPattern": "*", "resourceType": resource_type.capitalize(), "requestStage": "Request"}
+                for resource_type in sorted(self.blocked_resource_types)]
+
+    def record_cdp_request(self):
+        """تسجيل طلب أرسله Chromium (يُحسب مسموحاً حتى يصل حدث الحجب)"""
+        self.stats['allowed'] += 1
+
+    def record_cdp_blocked(self, resource_type: Optional[str]):
+        """تسجيل طلب حجبه Chromium (حدث Network.loadingFailed مع blockedReason)"""
+        self.stats['allowed'] -= 1
+        self.stats['blocked'] += 1
+        if resource_type in ('Image', 'Media', 'Font', 'Other'):
+            self.stats['blocked_media'] += 1
+        else:
+            self.stats['blocked_tracking'] += 1
+
     def should_block(self, url: str, resource_type: str = None) -> bool:
         """تحديد ما إذا كان يجب حجب الطلب"""
         url_lower = url.lower()
@@ -154,19 +362,44 @@ class SuperFastFilter:
 class BrowserManager:
     """مدير المتصفحات المتوازية - 3 متصفحات مستقلة"""
     
-    def __init__(self, browser_count: int = 3, headless: bool = False):
+    def __init__(self, browser_count: int = 3, headless: bool = False, contexts_per_browser: int = 1,
+                 reset_mode: str = PUBG_RESET_MODE, full_reset_every: int = PUBG_FULL_RESET_EVERY,
+                 standby_contexts: bool = PUBG_STANDBY_CONTEXTS):
         self.browser_count = browser_count
+        # soft: تفريغ الحقل والنتيجة بدون إعادة تحميل، مع إعادة تحميل كاملة كل full_reset_every بحث أو عند خلل
+        self.reset_mode = reset_mode
+        self.full_reset_every = max(1, full_reset_every)
+        self.standby_contexts = standby_contexts
+        self.asset_cache: Optional[StaticAssetCache] = None
+        self.reset_stats = {'soft': 0, 'full': 0, 'soft_failed': 0, 'standby_swaps': 0}
+        self.deadline_stats = {'deadline_exceeded': 0, 'expired_before_start': 0, 'cancelled_mid_lookup': 0}
         self.headless = headless
+        # عدد الخانات (BrowserContext + صفحة) داخل كل عملية Chromium - 1 يعني متصفح كامل لكل خانة
+        self.contexts_per_browser = max(1, contexts_per_browser)
         self.browsers: List[BrowserInstance] = []
+        self._shared_browsers: Dict[int, Browser] = {}
+        self._slot_groups: Dict[str, int] = {}  # معرف الخانة -> رقم عملية Chromium المشتركة
+        self._next_browser_number = 0
         self.playwright = None
         self.filter = SuperFastFilter()
         self._closed = False
         self._setup_lock = asyncio.Lock()
+        # المتصفحات الجاهزة بترتيب جاهزيتها وتُسلم LIFO (آخر متصفح عاد أولاً) فتبقى الخانات الزائدة
+        # في أول القائمة بدون استخدام حتى يزيلها remove_idle_browser عند تقليص العدد
+        # المنتظرون بترتيب وصولهم (FIFO) - المتصفح الذي يصبح جاهزاً يُسلم مباشرة لأقدم منتظر بدون polling
+        self._idle_browsers: Deque[BrowserInstance] = deque()
+        self._idle_ids = set()
+        self._browser_waiters: Deque[asyncio.Future] = deque()
+        # مصدر الاسم المستخرج: استجابة التحقق أو XPath الاحتياطي
+        self.extraction_stats = {'response': 0, 'response_not_found': 0, 'xpath': 0, 'timeout': 0}
+        # آخر جلسة MidasBuy صالحة (للمسار السريع بدون متصفح)
+        self.session: Optional[MidasBuySession] = None
+        self.sessions_harvested = 0
         
         if headless:
-            print("🔧 تشغيل المتصفحات في الوضع الخفي (headless)")
+            logger.info("🔧 تشغيل المتصفحات في الوضع الخفي (headless)")
         else:
-            print("👁️ تشغيل المتصفحات مع الواجهة المرئية")
+            logger.info("👁️ تشغيل المتصفحات مع الواجهة المرئية")
         
     async def initialize(self):
         """تهيئة جميع المتصفحات"""
@@ -174,162 +407,562 @@ class BrowserManager:
             return False
             
         try:
+            if PUBG_ASSET_CACHE_ENABLED and self.asset_cache is None:
+                self.asset_cache = StaticAssetCache(
+                    PUBG_ASSET_CACHE_DIR,
+                    max_bytes=PUBG_ASSET_CACHE_MAX_MB * 1024 * 1024,
+                    memory_max_bytes=PUBG_ASSET_CACHE_MEMORY_MB * 1024 * 1024
+                )
+                await self.asset_cache.load()
+
             self.playwright = await async_playwright().start()
             
-            for i in range(self.browser_count):
-                browser_id = f"browser_{i+1}"
-                browser_instance = BrowserInstance(id=browser_id)
-                self.browsers.append(browser_instance)
-                await self._setup_browser(browser_instance)
-                
+            for _ in range(self.browser_count):
+                await self.add_browser()
+
             return True
             
         except Exception as e:
-            print(f"❌ فشل في تهيئة المتصفحات: {e}")
+            logger.error("❌ فشل في تهيئة المتصفحات: %s", e)
             await self.cleanup()
             return False
 
-    async def _setup_browser(self, browser_instance: BrowserInstance):
-        """تهيئة متصفح واحد"""
-        try:
-            browser_instance.state = BrowserState.INITIALIZING
+    def _launch_args(self, marker: str = "") -> List[str]:
+        """معاملات تشغيل Chromium - marker يميز العملية عند قياس الذاكرة"""
+        # Browser args optimized for both headless and non-headless modes
+        # كل متصفح له معرف فريد لضمان الاستقلالية التامة
+        browser_args = [
+            '--no-sandbox',
+            '--disable-dev-shm-usage',
+            '--disable-web-security',
+            '--disable-features=VizDisplayCompositor',
+            '--disable-background-timer-throttling',
+            '--disable-backgrounding-occluded-windows',
+            '--disable-renderer-backgrounding',
+            '--disable-extensions',
+            '--disable-plugins',
+            '--aggressive-cache-discard',
+            '--memory-pressure-off',
+            '--max_old_space_size=4096',
+            '--disable-shared-workers',                             # تعطيل العمال المشتركين
+            '--disable-session-crashed-bubble',                     # تعطيل رسائل الأعطال المشتركة
+            '--disable-background-mode'                             # تعطيل الوضع الخلفي المشترك
+        ]
 
-            # Browser args optimized for both headless and non-headless modes
-            # كل متصفح له معرف فريد لضمان الاستقلالية التامة
-            browser_args = [
-                '--no-sandbox',
-                '--disable-dev-shm-usage',
-                '--disable-web-security',
-                '--disable-features=VizDisplayCompositor',
+        # Add headless-specific optimizations only in headless mode
+        if self.headless:
+            browser_args.extend([
+                '--disable-gpu',
+                '--disable-images',
+                '--disable-javascript-harmony-shipping',
                 '--disable-background-timer-throttling',
                 '--disable-backgrounding-occluded-windows',
                 '--disable-renderer-backgrounding',
+                '--disable-features=TranslateUI',
+                '--disable-ipc-flooding-protection',
+                '--disable-default-apps',
                 '--disable-extensions',
                 '--disable-plugins',
-                '--aggressive-cache-discard',
-                '--memory-pressure-off',
-                '--max_old_space_size=4096',
-                '--disable-shared-workers',                             # تعطيل العمال المشتركين
-                '--disable-session-crashed-bubble',                     # تعطيل رسائل الأعطال المشتركة
-                '--disable-background-mode'                             # تعطيل الوضع الخلفي المشترك
-            ]
-
-            # Add headless-specific optimizations only in headless mode
-            if self.headless:
-                browser_args.extend([
-                    '--disable-gpu',
-                    '--disable-images',
-                    '--disable-javascript-harmony-shipping',
-                    '--disable-background-timer-throttling',
-                    '--disable-backgrounding-occluded-windows',
-                    '--disable-renderer-backgrounding',
-                    '--disable-features=TranslateUI',
-                    '--disable-ipc-flooding-protection',
-                    '--disable-default-apps',
-                    '--disable-extensions',
-                    '--disable-plugins',
-                    '--disable-sync',
-                    '--no-first-run',
-                    '--no-default-browser-check',
-                    '--disable-background-networking'
-                ])
-
-            # إنشاء متصفح مستقل تماماً مع معرف فريد
-            browser_instance.browser = await self.playwright.chromium.launch(
-                headless=self.headless,
-                args=browser_args
-            )
+                '--disable-sync',
+                '--no-first-run',
+                '--no-default-browser-check',
+                '--disable-background-networking'
+            ])
+
+        if marker:
+            browser_args.append(f"{PROCESS_MARKER_SWITCH}{marker}")
+        return browser_args
+
+    def _browser_group(self, browser_instance: BrowserInstance) -> int:
+        """رقم عملية Chromium المشتركة التي تستضيف هذه الخانة - أول عملية فيها مكان فارغ"""
+        group = self._slot_groups.get(browser_instance.id)
+        if group is None:
+            used = {}
+            for assigned in self._slot_groups.values():
+                used[assigned] = used.get(assigned, 0) + 1
+            group = 0
+            while used.get(group, 0) >= self.contexts_per_browser:
+                group += 1
+            self._slot_groups[browser_instance.id] = group
+        return group
+
+    async def add_browser(self) -> BrowserInstance:
+        """إضافة خانة جديدة للمجموعة وتجهيزها"""
+        self._next_browser_number += 1
+        browser_instance = BrowserInstance(id=f"browser_{self._next_browser_number}")
+        self.browsers.append(browser_instance)
+        await self._setup_slot(browser_instance)
+        return browser_instance
+
+    async def remove_idle_browser(self, idle_for: float = 0) -> Optional[BrowserInstance]:
+        """
+        إزالة خانة متاحة لم تُستخدم منذ idle_for ثانية على الأقل (الأقدم خمولاً أولاً)
+
+        Returns:
+            الخانة المزالة أو None إذا لم توجد خانة مناسبة
+        """
+        now = time.time()
+        for browser in list(self._idle_browsers):
+            if browser.state != BrowserState.READY or now - browser.last_used < idle_for:
+                continue
 
-            # إنشاء context مستقل لكل متصفح مع إعدادات منفصلة
-            browser_instance.context = await browser_instance.browser.new_context(
-                viewport={'width': 1280, 'height': 720},
-                user_agent=f'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Browser-{browser_instance.id}',
-                ignore_https_errors=True,
-                java_script_enabled=True,
-                bypass_csp=True,
-                # إعدادات إضافية لضمان الاستقلالية
-                accept_downloads=False,
-                has_touch=False,
-                is_mobile=False,
-                locale='en-US',
-                timezone_id='UTC'
-            )
+            self._idle_browsers.remove(browser)
+            self._idle_ids.discard(browser.id)
+            browser.state = BrowserState.CLOSED
+            self.browsers.remove(browser)
+            await self._close_slot(browser)
+
+            # إغلاق عملية Chromium المشتركة إذا لم تعد تستضيف أي خانة
+            group = self._slot_groups.pop(browser.id, None)
+            if group is not None and group not in self._slot_groups.values():
+                shared_browser = self._shared_browsers.pop(group, None)
+                if shared_browser:
+                    try:
+                        await shared_browser.close()
+                    except Exception:
+                        pass
+            return browser
+        return None
 
-            # إضافة الكوكيز المطلوبة لموقع MidasBuy
-            cookies = get_midasbuy_cookies()
-            await browser_instance.context.add_cookies(cookies)
-
-            browser_instance.page = await browser_instance.context.new_page()
-            await browser_instance.page.route("**/*", lambda route: self._handle_request(route))
-
-            await browser_instance.page.add_init_script("""
-                window.addEventListener('DOMContentLoaded', function() {
-                    const style = document.createElement('style');
-                    style.textContent = `
-                        *, *::before, *::after {
-                            animation-duration: 0.01ms !important;
-                            transition-duration: 0.01ms !important;
-                        }
-                        .PopGetPoints_pop_bg__w92N9,
-                        .PopGetPoints_getPoints_pop__LVJvS.PopGetPoints_active__xuX7w {
-                            display: none !important;
-                        }
-                    `;
-                    document.head.appendChild(style);
-                });
-            """)
+    def _claim_idle(self, browser_instance: BrowserInstance) -> bool:
+        """سحب خانة محددة من قائمة المتاحة حتى لا تُسلم لطلب جديد"""
+        if browser_instance.id not in self._idle_ids:
+            return False
+        self._idle_browsers.remove(browser_instance)
+        self._idle_ids.discard(browser_instance.id)
+        browser_instance.state = BrowserState.INITIALIZING
+        browser_instance.state_since = time.time()
+        return True
 
-            await self._prepare_browser(browser_instance)
-            print(f"✅ تم إنشاء المتصفح {browser_instance.id} بنجاح (headless={self.headless})")
+    async def recycle_browser(self, browser_instance: BrowserInstance, reason: str) -> bool:
+        """
+        إعادة بناء خانة متاحة بمتصفح جديد (الخانات المشغولة تُترك حتى تنتهي)
+
+        Returns:
+            False إذا لم تكن الخانة متاحة حالياً
+        """
+        if not self._claim_idle(browser_instance):
+            return False
+        browser_instance.generation += 1
+        await self._rebuild_browser(browser_instance, reason)
+        return True
+
+    async def force_recycle_browser(self, browser_instance: BrowserInstance, reason: str):
+        """
+        إعادة بناء خانة فوراً بغض النظر عن حالتها (خانة عالقة أو تجاوزت المهلة)
+        العملية الجارية على الخانة تُلغى ويُنتظر انتهاؤها قبل إغلاق الصفحة حتى لا تعيد تجهيز الخانة بالتوازي
+        """
+        if browser_instance.state == BrowserState.CLOSED or self._closed:
+            return
+        browser_instance.generation += 1
+        if browser_instance.id in self._idle_ids:
+            self._claim_idle(browser_instance)
+        browser_instance.state = BrowserState.INITIALIZING
+        browser_instance.state_since = time.time()
+
+        task, browser_instance.active_task = browser_instance.active_task, asyncio.current_task()
+        if task is not None and task is not asyncio.current_task() and not task.done():
+            task.cancel()
+            # المهمة قد تكون عالقة في استدعاء لا يستجيب للإلغاء - إغلاق الصفحة بعدها يوقفه
+            await asyncio.wait({task}, timeout=SLOT_TASK_CANCEL_TIMEOUT)
+
+        try:
+            await self._close_slot(browser_instance)
+            await self._rebuild_browser(browser_instance, reason)
+        finally:
+            if browser_instance.active_task is asyncio.current_task():
+                browser_instance.active_task = None
+
+    def _run_slot_task(self, browser_instance: BrowserInstance, coro) -> asyncio.Task:
+        """تشغيل عملية على الخانة في الخلفية وتسجيلها كعمليتها الجارية"""
+        task = asyncio.create_task(coro)
+        browser_instance.active_task = task
+
+        def clear(finished: asyncio.Task):
+            if browser_instance.active_task is finished:
+                browser_instance.active_task = None
+
+        task.add_done_callback(clear)
+        return task
+
+    async def _rebuild_browser(self, browser_instance: BrowserInstance, reason: str):
+        browser_instance.recycle_count += 1
+        browser_instance.last_recycle_reason = reason
+        browser_instance.rss_mb = 0  # القياس القديم يخص العملية المغلقة
+        await self._setup_slot(browser_instance)
+
+    async def _setup_slot(self, browser_instance: BrowserInstance):
+        """تهيئة الخانة كعملية مسجلة عليها - إلغاؤها عند إعادة البناء القسري لا ينتقل للمستدعي"""
+        await asyncio.wait({self._run_slot_task(browser_instance, self._setup_browser(browser_instance))})
+
+    def _sample_process_memory(self) -> Dict[str, float]:
+        """قياس RSS (MB) لكل عملية Chromium مع عملياتها الفرعية حسب معامل التمييز"""
+        memory: Dict[str, float] = {}
+        for process in psutil.Process().children(recursive=True):
+            try:
+                marker = next((arg[len(PROCESS_MARKER_SWITCH):] for arg in process.cmdline()
+                               if arg.startswith(PROCESS_MARKER_SWITCH)), None)
+                if marker is None or marker in memory:
+                    continue
+                rss = process.memory_info().rss
+                for child in process.children(recursive=True):
+                    try:
+                        rss += child.memory_info().rss
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        continue
+                memory[marker] = rss / 1024 / 1024
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return memory
+
+    async def update_memory_usage(self):
+        """تحديث rss_mb لكل خانة - العملية المشتركة تُقسم على عدد خاناتها"""
+        if not PSUTIL_AVAILABLE:
+            return
+        loop = asyncio.get_running_loop()
+        memory = await loop.run_in_executor(None, self._sample_process_memory)
+        slots_per_marker: Dict[str, int] = {}
+        for browser in self.browsers:
+            slots_per_marker[browser.process_marker] = slots_per_marker.get(browser.process_marker, 0) + 1
+        for browser in self.browsers:
+            if browser.process_marker in memory:
+                browser.rss_mb = memory[browser.process_marker] / slots_per_marker[browser.process_marker]
+
+    async def _get_shared_browser(self, group: int) -> Browser:
+        """الحصول على عملية Chromium مشتركة (أو تشغيلها إذا لم تكن تعمل)"""
+        async with self._setup_lock:
+            browser = self._shared_browsers.get(group)
+            if browser is None or not browser.is_connected():
+                browser = await self.playwright.chromium.launch(headless=self.headless, args=self._launch_args(f"shared-{group}"))
+                self._shared_browsers[group] = browser
+                logger.info("🧩 تم تشغيل عملية Chromium مشتركة #%s (%s خانة)", group + 1, self.contexts_per_browser)
+            return browser
+
+    async def _close_slot(self, browser_instance: BrowserInstance):
+        """إغلاق صفحة وcontext الخانة (والاحتياطي) - والمتصفح فقط إذا لم يكن مشتركاً"""
+        await self._close_standby(browser_instance)
+        try:
+            if browser_instance.page and not browser_instance.page.is_closed():
+                await browser_instance.page.close()
+            if browser_instance.context:
+                await browser_instance.context.close()
+            if browser_instance.browser and browser_instance.owns_browser:
+                await browser_instance.browser.close()
+        except Exception:
+            pass
+        browser_instance.page = None
+        browser_instance.context = None
+        browser_instance.browser = None
+
+    async def _setup_browser(self, browser_instance: BrowserInstance):
+        """تهيئة متصفح واحد (أو خانة context داخل عملية Chromium مشتركة)"""
+        generation = browser_instance.generation
+        try:
+            browser_instance.state = BrowserState.INITIALIZING
+            browser_instance.state_since = time.time()
+
+            # إغلاق بقايا التهيئة السابقة عند إعادة البناء بعد خطأ
+            if browser_instance.context or browser_instance.browser:
+                await self._close_slot(browser_instance)
+
+            if self.contexts_per_browser > 1:
+                # خانة خفيفة: context معزول داخل عملية Chromium مشتركة
+                group = self._browser_group(browser_instance)
+                browser_instance.browser = await self._get_shared_browser(group)
+                browser_instance.owns_browser = False
+                browser_instance.process_marker = f"shared-{group}"
+            else:
+                # إنشاء متصفح مستقل تماماً مع معرف فريد
+                browser_instance.browser = await self.playwright.chromium.launch(
+                    headless=self.headless,
+                    args=self._launch_args(browser_instance.id)
+                )
+                browser_instance.owns_browser = True
+                browser_instance.process_marker = browser_instance.id
+            browser_instance.created_at = time.time()
+            browser_instance.lookups_total = 0
+
+            browser_instance.context, browser_instance.page = await self._open_page(browser_instance)
+
+            await self._prepare_browser(browser_instance, generation)
+            if browser_instance.generation != generation:
+                return
+            logger.info("✅ تم إنشاء المتصفح %s بنجاح (headless=%s)", browser_instance.id, self.headless)
+            if browser_instance.state == BrowserState.READY:
+                self._schedule_standby(browser_instance)
 
         except Exception as e:
-            print(f"❌ فشل في تهيئة المتصفح {browser_instance.id}: {e}")
+            if browser_instance.generation != generation:
+                # أُعيد بناء الخانة قسرياً أثناء التهيئة - الإعادة الأحدث هي المسؤولة عنها
+                return
+            logger.error("❌ فشل في تهيئة المتصفح %s: %s", browser_instance.id, e)
             browser_instance.state = BrowserState.ERROR
             browser_instance.error_count += 1
 
-    async def _prepare_browser(self, browser_instance: BrowserInstance):
-        """تجهيز المتصفح للاستخدام"""
-        try:
-            # التأكد من وجود الكوكيز المطلوبة
-            current_cookies = await browser_instance.context.cookies()
-            cookie_names = [cookie['name'] for cookie in current_cookies]
-
-            # إضافة الكوكيز إذا لم تكن موجودة
-            if 'select_country' not in cookie_names or 'midasbuyDeviceId' not in cookie_names:
-                cookies = get_midasbuy_cookies()
-                await browser_instance.context.add_cookies(cookies)
-                print(f"🍪 تم إضافة الكوكيز للمتصفح {browser_instance.id}")
-
-            await browser_instance.page.goto(
-                "https://www.midasbuy.com/midasbuy/us/redeem/pubgm",
-                wait_until="domcontentloaded", timeout=100000
-            )
+    async def _load_page(self, context: BrowserContext, page: Page):
+        """فتح صفحة MidasBuy واختيار المنطقة حتى يظهر حقل المعرف"""
+        # التأكد من وجود الكوكيز المطلوبة
+        current_cookies = await context.cookies()
+        cookie_names = [cookie['name'] for cookie in current_cookies]
+
+        # إضافة الكوكيز إذا لم تكن موجودة
+        if 'select_country' not in cookie_names or 'midasbuyDeviceId' not in cookie_names:
+            await context.add_cookies(get_midasbuy_cookies())
+
+        await page.goto(
+            "https://www.midasbuy.com/midasbuy/us/redeem/pubgm",
+            wait_until="domcontentloaded", timeout=100000
+        )
+
+        selectors = [
+            ".UserTabBox_use_tab_box__otkPd.UserTabBox_not_logined_box__m0w1t",
+            ".UserTabBox_use_tab_box__otkPd",
+            "[class*='UserTabBox_use_tab_box']"
+        ]
 
-            selectors = [
-                ".UserTabBox_use_tab_box__otkPd.UserTabBox_not_logined_box__m0w1t",
-                ".UserTabBox_use_tab_box__otkPd",
-                "[class*='UserTabBox_use_tab_box']"
-            ]
+        for selector in selectors:
+            try:
+                await page.wait_for_selector(selector, timeout=15000)
+                await page.click(selector)
+                break
+            except Exception:
+                continue
+        else:
+            raise Exception("فشل في اختيار المنطقة")
 
-            for selector in selectors:
-                try:
-                    await browser_instance.page.wait_for_selector(selector, timeout=15000)
-                    await browser_instance.page.click(selector)
-                    break
-                except:
-                    continue
-            else:
-                raise Exception("فشل في اختيار المنطقة")
+    async def _prepare_browser(self, browser_instance: BrowserInstance, generation: Optional[int] = None):
+        """تجهيز المتصفح للاستخدام (generation: لا يُعلن جاهزاً إذا أُعيد بناؤه قسرياً أثناء التحميل)"""
+        if generation is None:
+            generation = browser_instance.generation
+        try:
+            await self._load_page(browser_instance.context, browser_instance.page)
+            if browser_instance.generation != generation:
+                return
 
             browser_instance.state = BrowserState.READY
             browser_instance.last_used = time.time()
-            print(f"✅ المتصفح {browser_instance.id} جاهز للاستخدام")
+            browser_instance.lookups_since_reload = 0
+            self._release_browser(browser_instance)
+            logger.info("✅ المتصفح %s جاهز للاستخدام", browser_instance.id)
 
         except Exception as e:
-            print(f"❌ فشل في تجهيز المتصفح {browser_instance.id}: {e}")
+            if browser_instance.generation != generation:
+                return
+            logger.error("❌ فشل في تجهيز المتصفح %s: %s", browser_instance.id, e)
             browser_instance.state = BrowserState.ERROR
             browser_instance.error_count += 1
 
+    def _schedule_standby(self, browser_instance: BrowserInstance):
+        """بدء تجهيز context احتياطي للخانة في الخلفية (إذا لم يكن موجوداً)"""
+        if (not self.standby_contexts or self._closed or browser_instance.standby_building
+                or browser_instance.standby_page is not None):
+            return
+        browser_instance.standby_building = True
+        asyncio.create_task(self._build_standby(browser_instance))
+
+    async def _build_standby(self, browser_instance: BrowserInstance):
+        """
+        تجهيز context احتياطي معزول داخل نفس متصفح الخانة
+        إذا أُعيد بناء الخانة أثناء التجهيز (generation تغير) يُغلق الـ context لأنه يخص المتصفح القديم
+        """
+        generation = browser_instance.generation
+        context = None
+        stale = False
+        try:
+            context, page = await self._open_page(browser_instance)
+            await self._load_page(context, page)
+            stale = browser_instance.generation != generation
+            if self._closed or browser_instance.state == BrowserState.CLOSED or stale:
+                await context.close()
+                return
+            browser_instance.standby_context, browser_instance.standby_page = context, page
+        except Exception as e:
+            logger.warning("⚠️ فشل في تجهيز context احتياطي للمتصفح %s: %s", browser_instance.id, e)
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+        finally:
+            browser_instance.standby_building = False
+            # الخانة الجديدة طلبت احتياطياً أثناء التجهيز القديم فلم يبدأ - يبدأ الآن
+            if stale and browser_instance.state in (BrowserState.READY, BrowserState.BUSY):
+                self._schedule_standby(browser_instance)
+
+    async def _close_standby(self, browser_instance: BrowserInstance):
+        """إغلاق context الاحتياطي للخانة"""
+        context = browser_instance.standby_context
+        browser_instance.standby_context = None
+        browser_instance.standby_page = None
+        if context is not None:
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+    async def _swap_to_standby(self, browser_instance: BrowserInstance) -> bool:
+        """
+        استبدال context المستخدم بالاحتياطي فوراً - القديم يُغلق ويُجهز بديله في الخلفية
+
+        Returns:
+            False إذا لم يكن هناك context احتياطي جاهز
+        """
+        if browser_instance.standby_page is None or browser_instance.standby_page.is_closed():
+            return False
+
+        used_context = browser_instance.context
+        browser_instance.context, browser_instance.page = browser_instance.standby_context, browser_instance.standby_page
+        browser_instance.standby_context = browser_instance.standby_page = None
+        browser_instance.state = BrowserState.READY
+        browser_instance.last_used = time.time()
+        browser_instance.lookups_since_reload = 0
+        self.reset_stats['standby_swaps'] += 1
+        self._release_browser(browser_instance)
+
+        if used_context is not None:
+            try:
+                await used_context.close()
+            except Exception:
+                pass
+        self._schedule_standby(browser_instance)
+        return True
+
+    async def _open_page(self, browser_instance: BrowserInstance):
+        """إنشاء context معزول وصفحة مع فلترة المحتوى داخل متصفح الخانة"""
+        # إنشاء context مستقل لكل متصفح مع إعدادات منفصلة
+        context = await browser_instance.browser.new_context(
+            viewport={'width': 1280, 'height': 720},
+            user_agent=f'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Browser-{browser_instance.id}',
+            ignore_https_errors=True,
+            java_script_enabled=True,
+            bypass_csp=True,
+            # إعدادات إضافية لضمان الاستقلالية
+            accept_downloads=False,
+            has_touch=False,
+            is_mobile=False,
+            locale='en-US',
+            timezone_id='UTC'
+        )
+
+        # إضافة الكوكيز المطلوبة لموقع MidasBuy
+        cookies = get_midasbuy_cookies()
+        await context.add_cookies(cookies)
+
+        page = await context.new_page()
+        cdp_blocking = PUBG_CDP_BLOCKING and await self._enable_cdp_blocking(context, page)
+        if not cdp_blocking:
+            await page.route("**/*", lambda route: self._handle_request(route))
+        if self.asset_cache is not None:
+            # يُسجل بعد الفلتر ليُطابق أولاً - فقط ملفات JS/CSS تمر عبر Python
+            await page.route(STATIC_ASSET_URL, lambda route: self._serve_static_asset(route, cdp_blocking))
+
+        await page.add_init_script("""
+            window.addEventListener('DOMContentLoaded', function() {
+                const style = document.createElement('style');
+                style.textContent = `
+                    *, *::before, *::after {
+                        animation-duration: 0.01ms !important;
+                        transition-duration: 0.01ms !important;
+                    }
+                    .PopGetPoints_pop_bg__w92N9,
+                    .PopGetPoints_getPoints_pop__LVJvS.PopGetPoints_active__xuX7w {
+                        display: none !important;
+                    }
+                `;
+                document.head.appendChild(style);
+            });
+        """)
+        return context, page
+
+    async def _enable_cdp_blocking(self, context: BrowserContext, page: Page) -> bool:
+        """
+        تفعيل الحجب داخل Chromium للصفحة - الطلبات المسموحة لا تمر عبر Python إطلاقاً
+        - الروابط المحجوبة (نطاقات التتبع والامتدادات) عبر Network.setBlockedURLs
+        - أنواع الموارد المحجوبة (صور، وسائط، خطوط، أخرى) عبر Fetch.enable لهذه الأنواع فقط
+          كما في الفلتر الأصلي - الطلب يتوقف ويُرفض بدون تحميل
+        الإحصائيات تُقدر من أحداث CDP (لا تنتظر Chromium ردنا)
+
+        Returns:
+            False إذا لم يكن CDP متاحاً (يتم الرجوع إلى page.route)
+        """
+        try:
+            cdp = await context.new_cdp_session(page)
+            await cdp.send("Network.enable")
+            await cdp.send("Network.setBlockedURLs", {"urls": self.filter.blocked_url_patterns()})
+        except Exception as e:
+            logger.warning("⚠️ تعذر تفعيل الحجب عبر CDP - استخدام page.route: %s", e)
+            return False
+
+        cdp.on("Network.requestWillBeSent", lambda params: self.filter.record_cdp_request())
+
+        # طلبات رفضها Fetch - حُسبت عند التوقف فلا تُحسب مرة أخرى في loadingFailed
+        failed_by_fetch = set()
+
+        async def fail_request(request_id: str):
+            try:
+                await cdp.send("Fetch.failRequest", {"requestId": request_id, "errorReason": "BlockedByClient"})
+            except Exception:
+                pass
+
+        def on_request_paused(params):
+            if params.get('networkId'):
+                failed_by_fetch.add(params['networkId'])
+            self.filter.record_cdp_blocked(params.get('resourceType'))
+            asyncio.ensure_future(fail_request(params['requestId']))
+
+        def on_loading_failed(params):
+            if params.get('requestId') in failed_by_fetch:
+                failed_by_fetch.discard(params['requestId'])
+                return
+            if params.get('blockedReason'):
+                self.filter.record_cdp_blocked(params.get('type'))
+
+        cdp.on("Network.loadingFailed", on_loading_failed)
+        try:
+            cdp.on("Fetch.requestPaused", on_request_paused)
+            await cdp.send("Fetch.enable", {"patterns": self.filter.blocked_resource_patterns()})
+        except Exception as e:
+            # الحجب حسب الامتداد ما زال يعمل - فقط الموارد بدون امتداد معروف لن تُحجب
+            logger.warning("⚠️ تعذر تفعيل الحجب حسب نوع المورد عبر CDP: %s", e)
+        return True
+
+    async def _serve_static_asset(self, route: Route, cdp_blocking: bool = False):
+        """
+        خدمة ملفات JS/CSS من الذاكرة المشتركة، أو تحميلها مرة واحدة وتخزينها
+        مع الحجب عبر CDP الفلترة والإحصائيات تمت في Chromium - الفلتر هنا فقط بدون CDP (لا يُحسب الطلب مرتين)
+        """
+        if self._closed:
+            return
+
+        try:
+            request = route.request
+            if not cdp_blocking and self.filter.should_block(request.url, request.resource_type):
+                await route.abort()
+                return
+            if request.method != "GET":
+                await route.continue_()
+                return
+
+            cached = await self.asset_cache.get(request.url)
+            if cached is not None:
+                body, headers = cached
+                await route.fulfill(status=200, headers=headers, body=body)
+                return
+
+            response = await route.fetch()
+            body = await response.body()
+            await route.fulfill(response=response, body=body)
+            if response.status == 200:
+                headers = {name: value for name, value in response.headers.items()
+                           if name.lower() not in ASSET_SKIPPED_HEADERS}
+                await self.asset_cache.put(request.url, body, headers)
+        except:
+            try:
+                if not self._closed:
+                    await route.continue_()
+            except:
+                pass
+
     async def _handle_request(self, route: Route):
         """معالج الطلبات مع فلترة المحتوى"""
         if self._closed:
@@ -348,95 +981,179 @@ class BrowserManager:
             except:
                 pass
 
+    def _release_browser(self, browser: BrowserInstance):
+        """إعادة متصفح جاهز - يُسلم فوراً لأقدم منتظر أو يُضاف لقائمة المتصفحات المتاحة"""
+        if self._closed or browser.id in self._idle_ids or browser.state != BrowserState.READY:
+            return
+
+        while self._browser_waiters:
+            waiter = self._browser_waiters.popleft()
+            if not waiter.done():
+                browser.state = BrowserState.BUSY
+                browser.state_since = time.time()
+                waiter.set_result(browser)
+                return
+
+        self._idle_ids.add(browser.id)
+        self._idle_browsers.append(browser)
+
     async def get_available_browser(self) -> Optional[BrowserInstance]:
-        """الحصول على متصفح متاح"""
-        for browser in self.browsers:
+        """الحصول على متصفح متاح بدون انتظار (آخر متصفح عاد - الأقدم خمولاً يبقى ليُزال)"""
+        while self._idle_browsers:
+            browser = self._idle_browsers.pop()
+            self._idle_ids.discard(browser.id)
+            # تجاهل المتصفحات التي تغيرت حالتها بعد إضافتها للقائمة
             if browser.state == BrowserState.READY:
+                browser.state = BrowserState.BUSY
+                browser.state_since = time.time()
                 return browser
         return None
 
+    def release_unused_browser(self, browser: BrowserInstance):
+        """إعادة متصفح محجوز لم يُستخدم (الطلب انتهت مهلته أو أُلغي)"""
+        browser.state = BrowserState.READY
+        self._release_browser(browser)
+
     async def wait_for_available_browser(self) -> Optional[BrowserInstance]:
-        """انتظار متصفح متاح مع إعادة المحاولة"""
-        wait_start = time.time()
-        last_status_time = 0
+        """انتظار متصفح متاح - يستيقظ فور جاهزية متصفح بدون polling وبترتيب FIFO"""
+        if self._closed:
+            return None
 
-        while not self._closed:
+        if not self._browser_waiters:
             browser = await self.get_available_browser()
             if browser:
-                wait_time = time.time() - wait_start
-                if wait_time > 1:
-                    print(f"✅ تم العثور على متصفح متاح: {browser.id} (انتظار: {wait_time:.1f}ث)")
                 return browser
 
-            current_time = time.time()
-            if current_time - last_status_time > 5:
-                wait_time = current_time - wait_start
-                status = await self.get_status()
-                print(f"⏳ انتظار متصفح متاح... ({wait_time:.0f}ث) - جاهز: {status['ready']}, مشغول: {status['busy']}")
-                last_status_time = current_time
-
-            await asyncio.sleep(0.1)
-
-        return None
+        wait_start = time.time()
+        waiter = asyncio.get_running_loop().create_future()
+        self._browser_waiters.append(waiter)
 
-    async def process_request(self, player_id: str, request_id: str = None, callback=None) -> dict:
-        """معالجة طلب البحث عن لاعب"""
+        try:
+            while not waiter.done():
+                done, _ = await asyncio.wait({waiter}, timeout=5)
+                if not done:
+                    status = await self.get_status()
+                    logger.debug("⏳ انتظار متصفح متاح... (%.0fث) - جاهز: %s, مشغول: %s", time.time() - wait_start, status['ready'], status['busy'])
+        except asyncio.CancelledError:
+            if waiter.done() and waiter.result() is not None:
+                # المتصفح سُلم لحظة الإلغاء - إعادته للمنتظر التالي
+                self.release_unused_browser(waiter.result())
+            else:
+                waiter.cancel()
+            raise
+
+        browser = waiter.result()
+        wait_time = time.time() - wait_start
+        if browser and wait_time > 1:
+            logger.debug("✅ تم العثور على متصفح متاح: %s (انتظار: %.1fث)", browser.id, wait_time)
+        return browser
+
+    async def process_request(self, player_id: str, request_id: str = None, callback=None,
+                              browser: Optional[BrowserInstance] = None, deadline: Optional[float] = None) -> dict:
+        """
+        معالجة طلب البحث عن لاعب - browser متصفح محجوز مسبقاً (وإلا يتم انتظار متصفح متاح)
+        deadline وقت انتهاء المهلة (time.time) - البحث يُقطع عنده والخانة يعاد بناؤها
+        """
         if request_id is None:
             request_id = str(uuid.uuid4())
 
-        browser = await self.wait_for_available_browser()
+        if browser is None:
+            with tracing.start_span("pubg.browser_checkout"):
+                browser = await self.wait_for_available_browser()
         if not browser:
             return {'success': False, 'error': 'تم إيقاف النظام', 'request_id': request_id, 'player_id': player_id}
 
+        timeout = None if deadline is None else deadline - time.time()
+        if timeout is not None and timeout <= 0:
+            self.deadline_stats['expired_before_start'] += 1
+            self.release_unused_browser(browser)
+            return {'success': False, 'timed_out': True, 'error': 'انتهت مهلة البحث قبل البدء', 'request_id': request_id, 'player_id': player_id}
+
         browser.state = BrowserState.BUSY
+        browser.state_since = time.time()
         browser.current_request_id = request_id
         browser.last_used = time.time()
+        generation = browser.generation
+        # البحث مهمة مستقلة مسجلة على الخانة حتى تلغيها المراقبة إذا علقت
+        lookup = asyncio.ensure_future(self._perform_lookup(browser, player_id, request_id, callback))
+        browser.active_task = lookup
 
         try:
-            result = await self._perform_lookup(browser, player_id, request_id, callback)
-            asyncio.create_task(self._reset_browser_immediate(browser))
+            with tracing.start_span("pubg.lookup", {"browser_id": browser.id, "player_id": player_id}) as span:
+                result = await asyncio.wait_for(lookup, timeout)
+                span.set_attribute("outcome", result_outcome(result))
+            browser.lookups_since_reload += 1
+            browser.lookups_total += 1
+            self._run_slot_task(browser, self._reset_browser_immediate(browser, result))
             return result
 
+        except asyncio.TimeoutError:
+            # حالة الصفحة غير معروفة بعد قطع البحث - إعادة بناء الخانة في الخلفية
+            self.deadline_stats['deadline_exceeded'] += 1
+            logger.warning("⏰ تجاوز الطلب %s مهلته (%.1fث) على %s - إعادة بناء الخانة", request_id, timeout, browser.id)
+            asyncio.create_task(self.force_recycle_browser(browser, 'deadline'))
+            return {'success': False, 'timed_out': True, 'error': 'انتهت مهلة البحث', 'request_id': request_id, 'player_id': player_id, 'browser_id': browser.id}
+
+        except asyncio.CancelledError:
+            if browser.generation != generation:
+                # المراقبة ألغت البحث العالق وأعادت بناء الخانة - الطلب نفسه لم يُلغَ
+                return {'success': False, 'error': 'أُعيد بناء المتصفح أثناء البحث', 'request_id': request_id, 'player_id': player_id, 'browser_id': browser.id}
+            # العميل ألغى الطلب أثناء البحث - الصفحة في حالة غير معروفة فتُجهز بالكامل (أو context احتياطي فوراً)
+            self.deadline_stats['cancelled_mid_lookup'] += 1
+            logger.warning("🛑 إلغاء الطلب %s أثناء البحث على %s", request_id, browser.id)
+            self._run_slot_task(browser, self._reset_browser_immediate(browser, {'success': False, 'error': 'cancelled'}))
+            raise
+
         except Exception as e:
-            print(f"❌ خطأ في معالجة الطلب {request_id}: {e}")
-            browser.state = BrowserState.ERROR
-            browser.error_count += 1
-            await self._setup_browser(browser)
+            logger.error("❌ خطأ في معالجة الطلب %s: %s", request_id, e)
+            if browser.generation == generation:
+                browser.state = BrowserState.ERROR
+                browser.error_count += 1
+                self._run_slot_task(browser, self._setup_browser(browser))
             return {'success': False, 'error': str(e), 'request_id': request_id, 'player_id': player_id, 'browser_id': browser.id}
 
     async def _perform_lookup(self, browser: BrowserInstance, player_id: str, request_id: str, callback=None) -> dict:
         """تنفيذ البحث الفعلي"""
         try:
             # إدخال معرف اللاعب
-            input_selectors = [
-                ".SelectServerBox_input_wrap_box__qq\\+Iq input",
-                "[class*='SelectServerBox_input_wrap_box'] input",
-                "input[type='text']"
-            ]
-
-            for selector in input_selectors:
-                try:
-                    await browser.page.wait_for_selector(selector, timeout=15000)
-                    await browser.page.fill(selector, player_id)
-                    break
-                except:
-                    continue
-            else:
-                return {'success': False, 'error': 'لم يتم العثور على حقل الإدخال', 'request_id': request_id, 'player_id': player_id, 'browser_id': browser.id}
-
-            # الضغط على زر التحقق
+            with tracing.start_span("pubg.fill_input") as span:
+                for attempt, selector in enumerate(PLAYER_ID_INPUT_SELECTORS):
+                    try:
+                        await browser.page.wait_for_selector(selector, timeout=15000)
+                        await browser.page.fill(selector, player_id)
+                        span.set_attribute("selector_attempts", attempt + 1)
+                        break
+                    except Exception:
+                        continue
+                else:
+                    return {'success': False, 'error': 'لم يتم العثور على حقل الإدخال', 'request_id': request_id, 'player_id': player_id, 'browser_id': browser.id}
+
+            # الضغط على زر التحقق مع الاستماع لاستجابة التحقق قبل إرسالها
             verify_selector = "xpath=/html/body/div[2]/div/div[5]/div[2]/div[1]/div[3]"
-            await browser.page.wait_for_selector(verify_selector, timeout=15000, state="visible")
-            await browser.page.click(verify_selector)
+            with tracing.start_span("pubg.wait_verify_button"):
+                await browser.page.wait_for_selector(verify_selector, timeout=15000, state="visible")
+            verify_response, on_response = self._watch_verify_response(browser, player_id)
+            try:
+                with tracing.start_span("pubg.click_verify"):
+                    await browser.page.click(verify_selector)
 
-            # استخراج اسم اللاعب
-            def instant_callback(data):
-                print(f"🚀 إشعار فوري: تم العثور على {data['player_name']} في {data['execution_time']:.2f}ث!")
-                if callback:
-                    callback(data)
+                # استخراج اسم اللاعب
+                def instant_callback(data):
+                    logger.debug("🚀 إشعار فوري: تم العثور على %s في %.2fث!", data['player_name'], data['execution_time'])
+                    if callback:
+                        callback(data)
 
-            player_name = await self._extract_player_name_smart(browser, player_id, request_id, instant_callback)
+                with tracing.start_span("pubg.extract_name") as span:
+                    player_name = await self._extract_player_name_smart(browser, player_id, request_id, instant_callback, verify_response)
+                    span.set_attribute("found", isinstance(player_name, str))
+            finally:
+                browser.page.remove_listener("response", on_response)
+                if not verify_response.done():
+                    verify_response.cancel()
 
+            if player_name is NAME_EXTRACTION_TIMED_OUT:
+                # لا استجابة تحقق حاسمة ولا اسم في الصفحة - نتيجة غير معروفة وليست "غير موجود"
+                return {'success': False, 'timed_out': True, 'player_id': player_id, 'error': 'انتهت مهلة استخراج الاسم بدون نتيجة حاسمة', 'request_id': request_id, 'browser_id': browser.id}
             if player_name:
                 return {
                     'success': True, 'player_id': player_id, 'player_name': player_name,
@@ -445,52 +1162,184 @@ class BrowserManager:
                     'note': 'النتيجة مرسلة فوراً - إعادة تجهيز المتصفح في الخلفية'
                 }
             else:
-                return {'success': False, 'player_id': player_id, 'error': 'معرف اللاعب غير صحيح - لم يتم العثور على اللاعب', 'request_id': request_id, 'browser_id': browser.id}
+                return {'success': False, 'not_found': True, 'player_id': player_id, 'error': 'معرف اللاعب غير صحيح - لم يتم العثور على اللاعب', 'request_id': request_id, 'browser_id': browser.id}
 
         except Exception as e:
             return {'success': False, 'player_id': player_id, 'error': f'فشل في استخراج الاسم: {e}', 'request_id': request_id, 'browser_id': browser.id}
 
-    async def _extract_player_name_smart(self, browser: BrowserInstance, player_id: str, request_id: str, callback=None) -> Optional[str]:
-        """استخراج اسم اللاعب بطريقة ذكية"""
+    def _watch_verify_response(self, browser: BrowserInstance, player_id: str):
+        """
+        الاستماع لاستجابة XHR الخاصة بالتحقق من معرف اللاعب
+        الطلب الحاسم يُحفظ كجلسة MidasBuy لاستخدامها في المسار السريع
 
-        # XPath المحدد أولاً
-        specific_xpath = "/html/body/div[2]/div/div[2]/div[2]/div/div[2]/div[2]/div/div/div[1]/div/span[1]"
+        Returns:
+            (future, listener) - future تكتمل بنتيجة parse_midasbuy_verify_response عند وصول استجابة حاسمة
+        """
+        verify_response = asyncio.get_running_loop().create_future()
 
+        async def read_response(response):
+            try:
+                result = parse_midasbuy_verify_response(await response.json())
+            except Exception:
+                return
+            if result is not None and not verify_response.done():
+                verify_response.set_result(result)
+            if result is not None:
+                await self._harvest_session(browser, response, player_id)
+
+        def on_response(response):
+            if verify_response.done():
+                return
+            url = response.url.lower()
+            if 'midasbuy' in url and any(keyword in url for keyword in MIDASBUY_VERIFY_URL_KEYWORDS):
+                asyncio.ensure_future(read_response(response))
+
+        browser.page.on("response", on_response)
+        return verify_response, on_response
+
+    async def _harvest_session(self, browser: BrowserInstance, response, player_id: str):
+        """حفظ طلب التحقق مع كوكيز السياق كجلسة قابلة لإعادة الإرسال"""
         try:
-            # محاولة فورية
-            element = await browser.page.query_selector(f"xpath={specific_xpath}")
-            if element:
-                text = await element.text_content()
-                if text and len(text.strip()) > 1:
-                    execution_time = time.time() - browser.last_used
-                    print(f"✅ تم العثور على الاسم: {text.strip()} (XPath مباشر) - وقت التنفيذ: {execution_time:.2f}ث")
-                    if callback:
-                        callback({'type': 'player_found', 'player_name': text.strip(), 'player_id': player_id, 'request_id': request_id, 'browser_id': browser.id, 'method': 'xpath_direct', 'execution_time': execution_time})
-                    return text.strip()
+            request = response.request
+            headers = {
+                name: value for name, value in (await request.all_headers()).items()
+                if not name.startswith(':') and name.lower() not in SESSION_SKIPPED_HEADERS
+            }
+            cookies = {
+                cookie['name']: cookie['value']
+                for cookie in await browser.context.cookies()
+                if 'midasbuy' in cookie.get('domain', '')
+            }
+            self.session = MidasBuySession(
+                url=request.url, method=request.method, headers=headers, cookies=cookies,
+                post_data=request.post_data, player_id=player_id,
+                harvested_at=time.time(), browser_id=browser.id
+            )
+            self.sessions_harvested += 1
+        except Exception as e:
+            logger.warning("⚠️ فشل في حفظ جلسة MidasBuy من %s: %s", browser.id, e)
+
+    async def _read_name_xpath(self, browser: BrowserInstance) -> Optional[str]:
+        """قراءة الاسم من الصفحة عبر XPath (طريقة احتياطية)"""
+        element = await browser.page.query_selector(f"xpath={PLAYER_NAME_XPATH}")
+        if element:
+            text = await element.text_content()
+            if text and len(text.strip()) > 1:
+                return text.strip()
+        return None
 
-            # polling سريع
-            for _ in range(30):
-                await asyncio.sleep(0.1)
-                element = await browser.page.query_selector(f"xpath={specific_xpath}")
-                if element:
-                    text = await element.text_content()
-                    if text and len(text.strip()) > 1:
-                        execution_time = time.time() - browser.last_used
-                        print(f"✅ تم العثور على الاسم: {text.strip()} (XPath polling) - وقت التنفيذ: {execution_time:.2f}ث")
-                        if callback:
-                            callback({'type': 'player_found', 'player_name': text.strip(), 'player_id': player_id, 'request_id': request_id, 'browser_id': browser.id, 'method': 'xpath_polling', 'execution_time': execution_time})
-                        return text.strip()
+    async def _extract_player_name_smart(self, browser: BrowserInstance, player_id: str, request_id: str, callback=None,
+                                         verify_response: Optional[asyncio.Future] = None):
+        """
+        استخراج اسم اللاعب بطريقة ذكية
+        - النتيجة تؤخذ من استجابة التحقق فور وصولها (اسم أو معرف غير موجود)
+        - XPath احتياطي إذا ظهر الاسم في الصفحة بدون استجابة حاسمة (wait_for_selector واحد وليس فحصاً دورياً)
+
+        Returns:
+            الاسم، أو None إذا أكدت استجابة التحقق أن المعرف غير موجود،
+            أو NAME_EXTRACTION_TIMED_OUT إذا انتهت المهلة بدون نتيجة حاسمة (أخطاء الصفحة تُرفع للمستدعي)
+        """
+
+        def found(name: str, method: str) -> str:
+            execution_time = time.time() - browser.last_used
+            logger.info("✅ تم العثور على الاسم: %s (%s) - وقت التنفيذ: %.2fث", name, method, execution_time)
+            if callback:
+                callback({'type': 'player_found', 'player_name': name, 'player_id': player_id, 'request_id': request_id, 'browser_id': browser.id, 'method': method, 'execution_time': execution_time})
+            return name
+
+        # انتظار واحد لظهور نص الاسم في الصفحة (بدون فحص دوري) بالتوازي مع استجابة التحقق
+        name_visible = asyncio.ensure_future(browser.page.wait_for_selector(
+            PLAYER_NAME_READY_SELECTOR, timeout=NAME_EXTRACTION_TIMEOUT * 1000))
+        waiting = {name_visible} if verify_response is None else {verify_response, name_visible}
+        deadline = time.monotonic() + NAME_EXTRACTION_TIMEOUT
+        try:
+            while waiting:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, waiting = await asyncio.wait(waiting, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
 
-            return None
+                # استجابة التحقق هي المصدر المفضل - حاسمة حتى لـ "غير موجود"
+                if verify_response is not None and verify_response.done() and not verify_response.cancelled():
+                    result = verify_response.result()
+                    if result['found']:
+                        self.extraction_stats['response'] += 1
+                        return found(result['player_name'], 'verify_response')
+                    self.extraction_stats['response_not_found'] += 1
+                    return None
+
+                # XPath الاحتياطي: الاسم ظهر في الصفحة قبل (أو بدون) استجابة التحقق
+                if name_visible in done and not name_visible.cancelled() and name_visible.exception() is None:
+                    name = await self._read_name_xpath(browser)
+                    if name:
+                        self.extraction_stats['xpath'] += 1
+                        return found(name, 'xpath_fallback')
+
+            self.extraction_stats['timeout'] += 1
+            return NAME_EXTRACTION_TIMED_OUT
 
-        except Exception:
-            return None
+        finally:
+            name_visible.cancel()
+
+    def _needs_full_reset(self, browser: BrowserInstance, result: Optional[dict]) -> bool:
+        """تحديد نوع إعادة التجهيز - كاملة في وضع full أو كل N بحث أو بعد نتيجة غير متوقعة"""
+        if self.reset_mode != "soft" or browser.lookups_since_reload >= self.full_reset_every:
+            return True
+        # النتيجة الطبيعية: اسم أو "غير موجود" - أي خطأ آخر يعني أن الصفحة قد تكون في حالة غير سليمة
+        return result is not None and not result.get('success') and not result.get('not_found')
+
+    async def _soft_reset(self, browser: BrowserInstance) -> bool:
+        """تفريغ حقل المعرف ونتيجة البحث السابقة في نفس الصفحة بدون إعادة تحميل"""
+        for selector in PLAYER_ID_INPUT_SELECTORS:
+            element = await browser.page.query_selector(selector)
+            if element:
+                await element.fill("")
+                break
+        else:
+            return False
 
-    async def _reset_browser_immediate(self, browser: BrowserInstance):
-        """إعادة تجهيز المتصفح فوراً"""
+        # إزالة نص الاسم السابق حتى لا يُقرأ كنتيجة للبحث التالي
+        await browser.page.evaluate("""
+            (xpath) => {
+                const node = document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+                if (node) node.textContent = '';
+            }
+        """, PLAYER_NAME_XPATH)
+        return await self._read_name_xpath(browser) is None
+
+    async def _reset_browser_immediate(self, browser: BrowserInstance, result: Optional[dict] = None):
+        """
+        إعادة تجهيز المتصفح فوراً (soft في نفس الصفحة أو full بإعادة التحميل)
+        إذا أُعيد بناء الخانة قسرياً أثناء التجهيز تتوقف المهمة دون تغيير حالتها
+        """
+        generation = browser.generation
         try:
-            print(f"🔄 إعادة تجهيز المتصفح {browser.id} في الخلفية...")
             browser.current_request_id = None
+
+            if not self._needs_full_reset(browser, result):
+                try:
+                    soft_reset = await self._soft_reset(browser)
+                    if browser.generation != generation:
+                        return
+                    if soft_reset:
+                        self.reset_stats['soft'] += 1
+                        browser.state = BrowserState.READY
+                        browser.last_used = time.time()
+                        self._release_browser(browser)
+                        return
+                except Exception as e:
+                    logger.warning("⚠️ فشل التفريغ السريع للمتصفح %s: %s", browser.id, e)
+                self.reset_stats['soft_failed'] += 1
+
+            if browser.generation != generation:
+                return
+            # context احتياطي جاهز يغني عن إعادة التحميل الكاملة
+            if await self._swap_to_standby(browser):
+                return
+
+            logger.debug("🔄 إعادة تجهيز المتصفح %s في الخلفية...", browser.id)
             await browser.context.clear_cookies()
 
             # إعادة إضافة الكوكيز المطلوبة لموقع MidasBuy
@@ -509,24 +1358,44 @@ class BrowserManager:
             """)
 
             await browser.page.reload(wait_until="domcontentloaded", timeout=100000)
-            await self._prepare_browser(browser)
-            print(f"✅ تم إعادة تجهيز المتصفح {browser.id} وهو جاهز للطلب التالي")
+            self.reset_stats['full'] += 1
+            await self._prepare_browser(browser, generation)
+            if browser.generation != generation:
+                return
+            self._schedule_standby(browser)
+            logger.debug("✅ تم إعادة تجهيز المتصفح %s وهو جاهز للطلب التالي", browser.id)
 
         except Exception as e:
-            print(f"❌ فشل في إعادة تجهيز المتصفح {browser.id}: {e}")
+            if browser.generation != generation:
+                return
+            logger.error("❌ فشل في إعادة تجهيز المتصفح %s: %s", browser.id, e)
             browser.state = BrowserState.ERROR
             browser.error_count += 1
             await self._setup_browser(browser)
 
     async def get_status(self) -> dict:
         """الحصول على حالة جميع المتصفحات"""
-        status = {'total_browsers': len(self.browsers), 'ready': 0, 'busy': 0, 'error': 0, 'initializing': 0, 'browsers': []}
+        status = {
+            'total_browsers': len(self.browsers), 'ready': 0, 'busy': 0, 'error': 0, 'initializing': 0,
+            'contexts_per_browser': self.contexts_per_browser,
+            'chromium_processes': len(self._shared_browsers) if self.contexts_per_browser > 1 else len(self.browsers),
+            'name_extraction': dict(self.extraction_stats),
+            'reset_mode': self.reset_mode, 'full_reset_every': self.full_reset_every,
+            'resets': dict(self.reset_stats),
+            'deadlines': dict(self.deadline_stats),
+            'standby_ready': sum(1 for browser in self.browsers if browser.standby_page is not None),
+            'asset_cache': self.asset_cache.get_stats() if self.asset_cache else None,
+            'browsers': []
+        }
 
         for browser in self.browsers:
             status['browsers'].append({
                 'id': browser.id, 'state': browser.state.value,
                 'current_request': browser.current_request_id,
-                'error_count': browser.error_count, 'last_used': browser.last_used
+                'error_count': browser.error_count, 'last_used': browser.last_used,
+                'rss_mb': round(browser.rss_mb, 1), 'lookups': browser.lookups_total,
+                'age': time.time() - browser.created_at if browser.created_at else 0,
+                'recycle_count': browser.recycle_count, 'last_recycle_reason': browser.last_recycle_reason
             })
 
             if browser.state == BrowserState.READY:
@@ -546,19 +1415,35 @@ class BrowserManager:
             return
 
         self._closed = True
+        # إيقاظ جميع المنتظرين
+        while self._browser_waiters:
+            waiter = self._browser_waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
 
         for browser in self.browsers:
+            await self._close_standby(browser)
             try:
                 if browser.page and not browser.page.is_closed():
                     await browser.page.unroute("**/*")
                     await browser.page.close()
                 if browser.context:
                     await browser.context.close()
-                if browser.browser:
+                if browser.browser and browser.owns_browser:
                     await browser.browser.close()
             except:
                 pass
 
+        for shared_browser in self._shared_browsers.values():
+            try:
+                await shared_browser.close()
+            except:
+                pass
+        self._shared_browsers.clear()
+
+        if self.asset_cache is not None:
+            await self.asset_cache.save()
+
         try:
             if self.playwright:
                 await self.playwright.stop()
@@ -567,6 +1452,37 @@ class BrowserManager:
 
         self.browsers.clear()
 
+# ===== مقاييس Prometheus =====
+
+PRIORITY_NAMES = {level: name for name, level in PUBG_PRIORITIES.items()}
+
+PUBG_QUEUE_WAIT = Histogram("istation_pubg_queue_wait_seconds",
+                            "مدة انتظار طلب PUBG في قائمة الانتظار حتى حصوله على متصفح", ["priority"])
+PUBG_SERVICE_TIME = Histogram("istation_pubg_browser_service_seconds",
+                              "مدة البحث على المتصفح بعد الحصول عليه", ["outcome"])
+PUBG_BROWSERS = Gauge("istation_pubg_browsers", "عدد خانات متصفحات PUBG حسب الحالة", ["state"])
+PUBG_QUEUE_DEPTH = Gauge("istation_pubg_queue_depth", "عدد طلبات PUBG المنتظرة لمتصفح")
+
+def result_outcome(result: dict) -> str:
+    """تصنيف نتيجة البحث للمقاييس (found / not_found / timeout / error)"""
+    if result.get('success'):
+        return "found"
+    if result.get('not_found'):
+        return "not_found"
+    if result.get('timed_out'):
+        return "timeout"
+    return "error"
+
+def _collect_browser_states() -> Dict[tuple, float]:
+    counts = {(state.value,): 0 for state in BrowserState}
+    if _browser_manager is not None:
+        for browser in _browser_manager.browsers:
+            counts[(browser.state.value,)] += 1
+    return counts
+
+PUBG_BROWSERS.set_function(_collect_browser_states)
+PUBG_QUEUE_DEPTH.set_function(lambda: {(): _request_queue.pending_count if _request_queue else 0})
+
 # ===== قائمة الطلبات =====
 
 class RequestQueue:
@@ -574,10 +1490,20 @@ class RequestQueue:
 
     def __init__(self, browser_manager: BrowserManager):
         self.browser_manager = browser_manager
-        self.pending_requests: asyncio.Queue = asyncio.Queue()
+        # (الأولوية، المهلة، الترتيب، الطلب) - أعلى أولوية ثم أقرب مهلة ثم الأقدم
+        self.pending_requests: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = 0
+        # معرفات الطلبات المنتظرة فعلاً - pending_requests قد تحتوي مدخلات قديمة (إعادة إدخال promote
+        # أو طلبات ألغيت أو انتهت مهلتها) حتى يسحبها الموزع، فالعمق يُقرأ من هنا وليس من qsize
+        self._waiting: Set[str] = set()
         self.active_requests: Dict[str, PlayerRequest] = {}
         self._processor_task: Optional[asyncio.Task] = None
         self._running = False
+        self._single_flight = SingleFlight()  # دمج طلبات نفس اللاعب الجارية على متصفح واحد
+        # (وقت الحجز، مدة انتظار المتصفح) لآخر الطلبات - تُستخدم لحساب p95
+        self._wait_samples: Deque[tuple] = deque(maxlen=WAIT_SAMPLES_MAX)
+        self._lookup_samples: Deque[float] = deque(maxlen=LOOKUP_SAMPLES_MAX)  # مدة آخر عمليات البحث
+        self.stats = {'expired_in_queue': 0, 'dropped_unreachable': 0, 'cancelled': 0, 'promoted': 0}
 
     async def start(self):
         """بدء معالج الطلبات"""
@@ -586,7 +1512,7 @@ class RequestQueue:
 
         self._running = True
         self._processor_task = asyncio.create_task(self._process_requests())
-        print("✅ معالج الطلبات بدأ العمل")
+        logger.info("✅ معالج الطلبات بدأ العمل")
 
     async def stop(self):
         """إيقاف معالج الطلبات"""
@@ -601,7 +1527,7 @@ class RequestQueue:
 
         while not self.pending_requests.empty():
             try:
-                request = self.pending_requests.get_nowait()
+                request = self.pending_requests.get_nowait()[-1]
                 if request.future and not request.future.done():
                     request.future.set_exception(Exception("تم إيقاف الخدمة"))
             except asyncio.QueueEmpty:
@@ -612,120 +1538,738 @@ class RequestQueue:
                 request.future.set_exception(Exception("تم إيقاف الخدمة"))
 
         self.active_requests.clear()
-        print("✅ تم إيقاف معالج الطلبات")
-
-    async def submit_request(self, player_id: str) -> dict:
-        """إرسال طلب جديد للبحث عن لاعب مع بدء فوري"""
+        self._waiting.clear()
+        logger.info("✅ تم إيقاف معالج الطلبات")
+
+    async def submit_request(self, player_id: str, deadline: Optional[float] = None,
+                             priority: Optional[str] = None) -> dict:
+        """
+        إرسال طلب جديد للبحث عن لاعب مع بدء فوري - الطلبات المتطابقة الجارية تشترك في نفس النتيجة
+        deadline وقت انتهاء المهلة (time.time) - افتراضياً PUBG_LOOKUP_TIMEOUT من الآن
+        priority أحد مفاتيح PUBG_PRIORITIES (high / normal / bulk)
+        """
         if not self._running:
             return {'success': False, 'error': 'الخدمة غير متاحة', 'player_id': player_id}
 
+        if deadline is None:
+            deadline = time.time() + PUBG_LOOKUP_TIMEOUT
+        level = PUBG_PRIORITIES.get(priority or PUBG_DEFAULT_PRIORITY, PUBG_PRIORITIES[PUBG_DEFAULT_PRIORITY])
+        return await self._single_flight.do(player_id, lambda: self._enqueue_request(player_id, deadline, level),
+                                            on_join=lambda: self.promote(player_id, deadline, priority))
+
+    def promote(self, player_id: str, deadline: Optional[float] = None, priority: Optional[str] = None) -> bool:
+        """
+        رفع أولوية الطلب الجاري لنفس اللاعب أو تمديد مهلته عند انضمام منتظر أهم إليه
+        (طلب high ينضم لبحث bulk جارٍ يجب ألا ينتظر بأولوية bulk ومهلتها)
+        الطلب المنتظر يُعاد إدخاله بالترتيب الجديد - المدخل القديم يُتجاهل عند سحبه
+
+        Returns:
+            True إذا تغيرت أولوية الطلب أو مهلته
+        """
+        if deadline is None:
+            deadline = time.time() + PUBG_LOOKUP_TIMEOUT
+        level = PUBG_PRIORITIES.get(priority or PUBG_DEFAULT_PRIORITY, PUBG_PRIORITIES[PUBG_DEFAULT_PRIORITY])
+        request = next((request for request in self.active_requests.values()
+                        if request.player_id == player_id and not request.future.done()), None)
+        if request is None:
+            return False
+
+        changed = False
+        if level < request.priority:
+            request.priority = level
+            changed = True
+        if request.deadline is not None and deadline > request.deadline:
+            request.deadline = deadline
+            changed = True
+        if not changed:
+            return False
+        self.stats['promoted'] += 1
+        # الطلب الذي بدأ بحثه يحتفظ بمهلة البحث الحالية - المهلة الجديدة تخص انتظار نتيجته فقط
+        if request.task is None:
+            self._push(request)
+        return True
+
+    @property
+    def pending_count(self) -> int:
+        """عدد الطلبات التي تنتظر متصفحاً فعلاً (بدون المدخلات القديمة في قائمة الأولوية)"""
+        return len(self._waiting)
+
+    def _push(self, request: PlayerRequest):
+        """إضافة طلب لقائمة الانتظار حسب أولويته ومهلته"""
+        self._sequence += 1
+        deadline = request.deadline if request.deadline is not None else float('inf')
+        self.pending_requests.put_nowait((request.priority, deadline, self._sequence, request))
+        self._waiting.add(request.id)
+
+    async def _enqueue_request(self, player_id: str, deadline: Optional[float] = None,
+                               priority: int = PUBG_PRIORITIES[PUBG_DEFAULT_PRIORITY]) -> dict:
+        """إضافة طلب جديد لقائمة الانتظار وانتظار نتيجته حتى انتهاء المهلة"""
         request_id = str(uuid.uuid4())
         future = asyncio.Future()
 
         def instant_notification(data):
-            print(f"⚡ إشعار فوري: تم العثور على {data['player_name']} في {data['execution_time']:.2f}ث!")
+            logger.debug("⚡ إشعار فوري: تم العثور على %s في %.2fث!", data['player_name'], data['execution_time'])
 
-        request = PlayerRequest(id=request_id, player_id=player_id, timestamp=time.time(), future=future, callback=instant_notification)
+        request = PlayerRequest(id=request_id, player_id=player_id, timestamp=time.time(), future=future,
+                                callback=instant_notification, deadline=deadline, priority=priority,
+                                trace_parent=tracing.current_span(), timing=server_timing.current())
 
-        print(f"📝 طلب جديد: {request_id} للاعب: {player_id}")
-        print(f"🚀 بدء المعالجة فوراً...")
+        logger.debug("📝 طلب جديد: %s للاعب: %s", request_id, player_id)
+        logger.debug("🚀 بدء المعالجة فوراً...")
 
-        await self.pending_requests.put(request)
+        self._push(request)
         self.active_requests[request_id] = request
 
-        queue_size = self.pending_requests.qsize()
+        queue_size = self.pending_count
         if queue_size > 1:
-            print(f"⏳ الطلب في قائمة الانتظار - الموضع: {queue_size}")
+            logger.debug("⏳ الطلب في قائمة الانتظار - الموضع: %s", queue_size)
 
         try:
-            result = await future
-            return result
+            while True:
+                # المهلة قد تُمدد أثناء الانتظار إذا انضم للطلب منتظر بمهلة أبعد (promote)
+                timeout = None if request.deadline is None else max(0, request.deadline - time.time())
+                try:
+                    return await asyncio.wait_for(asyncio.shield(future), timeout)
+                except asyncio.TimeoutError:
+                    if request.deadline is None or request.deadline <= time.time():
+                        raise
+        except asyncio.TimeoutError:
+            # الطلب ما زال في قائمة الانتظار - إلغاؤه حتى لا يحجز متصفحاً
+            future.cancel()
+            self.stats['expired_in_queue'] += 1
+            return {'success': False, 'timed_out': True, 'error': 'انتهت مهلة البحث في قائمة الانتظار', 'player_id': player_id, 'request_id': request_id}
+        except asyncio.CancelledError:
+            # لا أحد ينتظر النتيجة - الطلب يُتجاهل في قائمة الانتظار أو يُقطع بحثه الجاري
+            future.cancel()
+            if request.task is not None and not request.task.done():
+                request.task.cancel()
+            self.stats['cancelled'] += 1
+            raise
         except Exception as e:
             return {'success': False, 'error': str(e), 'player_id': player_id, 'request_id': request_id}
         finally:
+            # انتهاء الانتظار بأي طريقة (نتيجة، مهلة، إلغاء) يخرج الطلب من العمق إذا لم يُسحب بعد
+            self._waiting.discard(request_id)
             self.active_requests.pop(request_id, None)
 
     async def _process_requests(self):
         """معالج الطلبات الرئيسي"""
-        print("🔄 بدء معالجة الطلبات...")
+        logger.info("🔄 بدء معالجة الطلبات...")
 
         while self._running:
             try:
-                request = await asyncio.wait_for(self.pending_requests.get(), timeout=1.0)
-                asyncio.create_task(self._handle_request(request))
-            except asyncio.TimeoutError:
-                continue
+                # انتظار وجود طلب ثم متصفح له - عدد المهام الجارية لا يتجاوز عدد المتصفحات
+                self.pending_requests.put_nowait(await self.pending_requests.get())
+                checkout_started = time.time()
+                browser = await self.browser_manager.wait_for_available_browser()
+
+                # الاختيار بعد توفر المتصفح - طلب أعلى أولوية قد يكون وصل أثناء الانتظار
+                request = self._pop_dispatchable()
+                if browser is None:
+                    if request and request.future and not request.future.done():
+                        request.future.set_result({'success': False, 'error': 'تم إيقاف النظام', 'player_id': request.player_id, 'request_id': request.id})
+                    continue
+                if request is None:
+                    self.browser_manager.release_unused_browser(browser)
+                    continue
+                now = time.time()
+                waited = now - request.timestamp
+                self._wait_samples.append((now, waited))
+                PUBG_QUEUE_WAIT.labels(PRIORITY_NAMES.get(request.priority, "normal")).observe(waited)
+                checkout = now - max(checkout_started, request.timestamp)
+                server_timing.record("queue", waited - checkout, request.timing)
+                server_timing.record("checkout", checkout, request.timing)
+                tracing.record_span("pubg.queue_wait", request.trace_parent, request.timestamp, now,
+                                    {"priority": PRIORITY_NAMES.get(request.priority, "normal")})
+                tracing.record_span("pubg.browser_checkout", request.trace_parent,
+                                    max(checkout_started, request.timestamp), now, {"browser_id": browser.id})
+                request.task = asyncio.create_task(self._handle_request(request, browser))
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                print(f"❌ خطأ في معالج الطلبات: {e}")
+                logger.error("❌ خطأ في معالج الطلبات: %s", e)
                 await asyncio.sleep(0.1)
 
-    async def _handle_request(self, request: PlayerRequest):
+    def estimate_lookup_time(self) -> float:
+        """تقدير مدة البحث (الوسيط لآخر عمليات البحث)"""
+        if not self._lookup_samples:
+            return PUBG_MIN_LOOKUP_TIME
+        samples = sorted(self._lookup_samples)
+        return samples[len(samples) // 2]
+
+    def _pop_dispatchable(self) -> Optional[PlayerRequest]:
+        """
+        أخذ أعلى طلب أولوية يمكن إكماله قبل مهلته
+        الطلبات التي انتهى انتظار أصحابها تُتجاهل، والتي لا يكفي وقتها تُسقط بخطأ مميز
+        """
+        needed = self.estimate_lookup_time()
+        while not self.pending_requests.empty():
+            request = self.pending_requests.get_nowait()[-1]
+            # الطلب انتهى انتظاره، أو مدخل قديم لطلب أُعيد إدخاله بأولوية أعلى وبدأ بحثه
+            if (request.future and request.future.done()) or request.task is not None:
+                continue
+            self._waiting.discard(request.id)
+            remaining = None if request.deadline is None else request.deadline - time.time()
+            if remaining is not None and remaining < needed:
+                self.stats['dropped_unreachable'] += 1
+                logger.warning("⌛ إسقاط الطلب %s - المتبقي %.1fث أقل من مدة البحث المقدرة %.1fث", request.id, remaining, needed)
+                if request.future:
+                    request.future.set_result({
+                        'success': False, 'timed_out': True, 'expired': True,
+                        'error': 'لا يمكن إكمال البحث قبل انتهاء المهلة', 'player_id': request.player_id, 'request_id': request.id
+                    })
+                continue
+            return request
+        return None
+
+    async def _handle_request(self, request: PlayerRequest, browser: Optional[BrowserInstance] = None):
         """معالجة طلب واحد مع إشعارات فورية"""
         try:
-            print(f"🔍 بدء معالجة الطلب: {request.id} للاعب: {request.player_id}")
-
-            result = await self.browser_manager.process_request(request.player_id, request.id, request.callback)
+            logger.debug("🔍 بدء معالجة الطلب: %s للاعب: %s", request.id, request.player_id)
+
+            started = time.time()
+            with tracing.use_span(request.trace_parent):
+                result = await self.browser_manager.process_request(request.player_id, request.id, request.callback,
+                                                                    browser=browser, deadline=request.deadline)
+            elapsed = time.time() - started
+            server_timing.record("browser", elapsed, request.timing)
+            if result.get('success') or result.get('not_found'):
+                self._lookup_samples.append(elapsed)
+            PUBG_SERVICE_TIME.labels(result_outcome(result)).observe(elapsed)
 
             if request.future and not request.future.done():
                 request.future.set_result(result)
 
             if result.get('success'):
-                print(f"✅ تم العثور على اللاعب: {result.get('player_name')} (ID: {request.player_id})")
-                print(f"🚀 النتيجة مرسلة فوراً - المتصفح {result.get('browser_id')} يعاد تجهيزه في الخلفية")
+                logger.info("✅ تم العثور على اللاعب: %s (ID: %s)", result.get('player_name'), request.player_id,
+                            extra={"request_id": request.id, "browser_id": result.get('browser_id')})
+                logger.debug("🚀 النتيجة مرسلة فوراً - المتصفح %s يعاد تجهيزه في الخلفية", result.get('browser_id'))
             else:
-                print(f"❌ فشل البحث عن اللاعب: {request.player_id} - {result.get('error')}")
-                print(f"🔄 المتصفح {result.get('browser_id')} يعاد تجهيزه في الخلفية")
+                logger.info("❌ فشل البحث عن اللاعب: %s - %s", request.player_id, result.get('error'),
+                            extra={"request_id": request.id, "browser_id": result.get('browser_id')})
+                logger.debug("🔄 المتصفح %s يعاد تجهيزه في الخلفية", result.get('browser_id'))
 
         except Exception as e:
-            print(f"❌ خطأ في معالجة الطلب {request.id}: {e}")
+            logger.error("❌ خطأ في معالجة الطلب %s: %s", request.id, e)
             if request.future and not request.future.done():
                 request.future.set_exception(e)
 
+    def get_wait_percentile(self, percentile: float = 95, window: float = WAIT_SAMPLES_WINDOW) -> float:
+        """النسبة المئوية لمدة انتظار المتصفح خلال آخر window ثانية (0 إذا لا توجد عينات)"""
+        since = time.time() - window
+        waits = sorted(wait for at, wait in self._wait_samples if at >= since)
+        if not waits:
+            return 0.0
+        index = min(len(waits) - 1, int(len(waits) * percentile / 100))
+        return waits[index]
+
     def get_queue_status(self) -> dict:
         """الحصول على حالة قائمة الانتظار"""
         return {
             'running': self._running,
-            'pending_requests': self.pending_requests.qsize(),
+            'pending_requests': self.pending_count,
             'active_requests': len(self.active_requests),
-            'active_request_ids': list(self.active_requests.keys())
+            'active_request_ids': list(self.active_requests.keys()),
+            'coalesced_requests': self._single_flight.stats['coalesced'],
+            'expired_in_queue': self.stats['expired_in_queue'],
+            'dropped_unreachable': self.stats['dropped_unreachable'],
+            'cancelled': self.stats['cancelled'],
+            'promoted': self.stats['promoted'],
+            'estimated_lookup_time': self.estimate_lookup_time(),
+            'wait_p95': self.get_wait_percentile(95)
+        }
+
+# ===== التوسع التلقائي لمجموعة المتصفحات =====
+
+@dataclass
+class AutoscaleConfig:
+    """إعدادات التوسع التلقائي"""
+    min_browsers: int = 1
+    max_browsers: int = 8
+    scale_up_queue_depth: int = 3  # التوسع عند وصول عدد الطلبات المنتظرة لهذا الحد
+    scale_up_wait_p95: float = 5.0  # أو عند تجاوز p95 لانتظار المتصفح هذه المدة (ثانية)
+    scale_up_cooldown: float = 10.0  # أقل فترة بين إضافتين (وقت تجهيز المتصفح الجديد)
+    scale_down_idle_time: float = 300.0  # إزالة الخانة المتاحة غير المستخدمة منذ هذه المدة
+    scale_down_cooldown: float = 60.0  # أقل فترة بعد أي تغيير قبل التقليص
+    check_interval: float = 2.0
+
+class BrowserAutoscaler:
+    """توسيع وتقليص مجموعة المتصفحات حسب عمق قائمة الانتظار ومدة الانتظار"""
+
+    def __init__(self, browser_manager: BrowserManager, request_queue: RequestQueue, config: AutoscaleConfig = None):
+        self.browser_manager = browser_manager
+        self.request_queue = request_queue
+        self.config = config or AutoscaleConfig()
+        self.events: Deque[dict] = deque(maxlen=AUTOSCALE_EVENTS_MAX)
+        self.stats = {'scale_ups': 0, 'scale_downs': 0}
+        self._last_scale_up = 0.0
+        self._last_change = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """بدء مراقبة التوسع في الخلفية"""
+        if self._task is None:
+            self._last_change = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """إيقاف المراقبة"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.config.check_interval)
+            try:
+                await self.evaluate()
+            except Exception as e:
+                logger.error("❌ خطأ في التوسع التلقائي: %s", e)
+
+    async def evaluate(self) -> Optional[str]:
+        """
+        تقييم الحمل الحالي وتنفيذ قرار توسع أو تقليص واحد
+
+        Returns:
+            'scale_up' أو 'scale_down' أو None
+        """
+        now = time.monotonic()
+        size = len(self.browser_manager.browsers)
+        depth = self.request_queue.pending_count
+        wait_p95 = self.request_queue.get_wait_percentile(95)
+
+        reason = None
+        if size < self.config.min_browsers:
+            reason = f"الحجم {size} أقل من الحد الأدنى {self.config.min_browsers}"
+        elif size < self.config.max_browsers and now - self._last_scale_up >= self.config.scale_up_cooldown:
+            if depth >= self.config.scale_up_queue_depth:
+                reason = f"عمق قائمة الانتظار {depth} >= {self.config.scale_up_queue_depth}"
+            elif wait_p95 >= self.config.scale_up_wait_p95:
+                reason = f"p95 للانتظار {wait_p95:.1f}ث >= {self.config.scale_up_wait_p95:.1f}ث"
+
+        if reason:
+            await self.browser_manager.add_browser()
+            self._last_scale_up = self._last_change = time.monotonic()
+            self.stats['scale_ups'] += 1
+            self._record('scale_up', reason, size, len(self.browser_manager.browsers), depth, wait_p95)
+            return 'scale_up'
+
+        if (size > self.config.min_browsers and depth == 0
+                and now - self._last_change >= self.config.scale_down_cooldown):
+            removed = await self.browser_manager.remove_idle_browser(self.config.scale_down_idle_time)
+            if removed:
+                self._last_change = time.monotonic()
+                self.stats['scale_downs'] += 1
+                reason = f"الخانة {removed.id} غير مستخدمة منذ {self.config.scale_down_idle_time:.0f}ث"
+                self._record('scale_down', reason, size, len(self.browser_manager.browsers), depth, wait_p95)
+                return 'scale_down'
+
+        return None
+
+    def _record(self, action: str, reason: str, size_before: int, size_after: int, depth: int, wait_p95: float):
+        """تسجيل قرار التوسع"""
+        event = {
+            'time': time.time(), 'action': action, 'reason': reason,
+            'from': size_before, 'to': size_after,
+            'queue_depth': depth, 'wait_p95': wait_p95
+        }
+        self.events.append(event)
+        icon = "📈" if action == 'scale_up' else "📉"
+        logger.info("%s توسع تلقائي (%s): %s -> %s متصفح - %s", icon, action, size_before, size_after, reason)
+
+    def get_status(self) -> dict:
+        """الحصول على حالة التوسع التلقائي"""
+        return {
+            'enabled': self._task is not None,
+            'min_browsers': self.config.min_browsers,
+            'max_browsers': self.config.max_browsers,
+            'current_browsers': len(self.browser_manager.browsers),
+            **self.stats,
+            'recent_events': list(self.events)
+        }
+
+@dataclass
+class RecycleConfig:
+    """إعدادات إعادة تدوير المتصفحات"""
+    max_rss_mb: float = PUBG_RECYCLE_MAX_RSS_MB
+    max_lookups: int = PUBG_RECYCLE_MAX_LOOKUPS
+    max_age: float = PUBG_RECYCLE_MAX_AGE
+    stuck_busy_limit: float = PUBG_STUCK_BUSY_LIMIT
+    stuck_initializing_limit: float = PUBG_STUCK_INITIALIZING_LIMIT
+    check_interval: float = 15.0
+
+class BrowserRecycler:
+    """
+    مراقبة ذاكرة وعمر المتصفحات وإعادة تدويرها
+    - خانة واحدة فقط خارج الخدمة في أي وقت (السعة لا تقل عن N-1)
+    - الخانة المشغولة تُترك حتى تنتهي من طلبها ثم تُعاد في الفحص التالي
+    - watchdog: الخانات العالقة في BUSY أو INITIALIZING بعد الحد يعاد بناؤها فوراً
+    - حد الذاكرة للخانات المستقلة فقط: الخانة المشتركة تستبدل context داخل نفس عملية Chromium
+      فلا ينخفض RSS المقاس للعملية، وكانت نفس المجموعة ستتجاوز الحد في كل فحص إلى ما لا نهاية
+    """
+
+    def __init__(self, browser_manager: BrowserManager, config: RecycleConfig = None):
+        self.browser_manager = browser_manager
+        self.config = config or RecycleConfig()
+        self.events: Deque[dict] = deque(maxlen=AUTOSCALE_EVENTS_MAX)
+        self.stats = {'recycled': 0, 'memory': 0, 'lookups': 0, 'age': 0, 'stuck_busy': 0, 'stuck_initializing': 0}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """بدء المراقبة في الخلفية"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """إيقاف المراقبة"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.config.check_interval)
+            try:
+                await self.check_stuck()
+                await self.browser_manager.update_memory_usage()
+                await self.evaluate()
+            except Exception as e:
+                logger.error("❌ خطأ في إعادة تدوير المتصفحات: %s", e)
+
+    def recycle_reason(self, browser: BrowserInstance) -> Optional[str]:
+        """سبب إعادة التدوير ('memory' أو 'lookups' أو 'age') أو None"""
+        if self.config.max_rss_mb and browser.owns_browser and browser.rss_mb >= self.config.max_rss_mb:
+            return 'memory'
+        if self.config.max_lookups and browser.lookups_total >= self.config.max_lookups:
+            return 'lookups'
+        if self.config.max_age and browser.created_at and time.time() - browser.created_at >= self.config.max_age:
+            return 'age'
+        return None
+
+    async def check_stuck(self) -> List[BrowserInstance]:
+        """
+        إعادة بناء الخانات العالقة في BUSY أو INITIALIZING لفترة أطول من الحد
+
+        Returns:
+            الخانات التي أعيد بناؤها
+        """
+        now = time.time()
+        stuck = []
+        for browser in list(self.browser_manager.browsers):
+            if not browser.state_since:
+                continue
+            elapsed = now - browser.state_since
+            if browser.state == BrowserState.BUSY and elapsed >= self.config.stuck_busy_limit:
+                reason = 'stuck_busy'
+            elif browser.state == BrowserState.INITIALIZING and elapsed >= self.config.stuck_initializing_limit:
+                reason = 'stuck_initializing'
+            else:
+                continue
+
+            self.stats[reason] += 1
+            self.events.append({'time': now, 'browser_id': browser.id, 'reason': reason, 'elapsed': round(elapsed, 1)})
+            logger.warning("🚨 المتصفح %s عالق في %s منذ %.0fث - إعادة بناء", browser.id, browser.state.value, elapsed)
+            stuck.append(browser)
+            # إعادة البناء في الخلفية حتى لا تعلق المراقبة نفسها
+            asyncio.create_task(self.browser_manager.force_recycle_browser(browser, reason))
+        return stuck
+
+    async def evaluate(self) -> Optional[BrowserInstance]:
+        """
+        إعادة تدوير خانة واحدة على الأكثر تجاوزت أحد الحدود
+
+        Returns:
+            الخانة التي أعيد تدويرها أو None
+        """
+        browsers = list(self.browser_manager.browsers)
+        # خانة أخرى خارج الخدمة حالياً (تهيئة أو خطأ) - الانتظار حتى تعود
+        if any(browser.state in (BrowserState.INITIALIZING, BrowserState.ERROR) for browser in browsers):
+            return None
+
+        candidates = [(browser, self.recycle_reason(browser)) for browser in browsers]
+        candidates = [(browser, reason) for browser, reason in candidates if reason]
+        # الأكثر استهلاكاً للذاكرة أولاً
+        candidates.sort(key=lambda candidate: candidate[0].rss_mb, reverse=True)
+
+        for browser, reason in candidates:
+            rss_mb, lookups = browser.rss_mb, browser.lookups_total
+            if await self.browser_manager.recycle_browser(browser, reason):
+                self.stats['recycled'] += 1
+                self.stats[reason] += 1
+                self.events.append({
+                    'time': time.time(), 'browser_id': browser.id, 'reason': reason,
+                    'rss_mb': round(rss_mb, 1), 'lookups': lookups
+                })
+                logger.info("♻️ إعادة تدوير المتصفح %s - السبب: %s (RSS %.0fMB، %s بحث)", browser.id, reason, rss_mb, lookups)
+                return browser
+        return None
+
+    def get_status(self) -> dict:
+        """حالة إعادة التدوير"""
+        return {
+            'max_rss_mb': self.config.max_rss_mb,
+            'max_lookups': self.config.max_lookups,
+            'max_age': self.config.max_age,
+            'stuck_busy_limit': self.config.stuck_busy_limit,
+            'stuck_initializing_limit': self.config.stuck_initializing_limit,
+            **self.stats,
+            'recent_events': list(self.events)
+        }
+
+# ===== المسار السريع بدون متصفح =====
+
+class PubgHttpFastPath:
+    """
+    البحث عبر HTTP مباشرة باستخدام جلسة MidasBuy مأخوذة من المتصفحات
+    - طلب واحد عبر Connection Pool بدلاً من صفحة Chromium كاملة
+    - أي فشل أو استجابة غير حاسمة يعيد None ليتم البحث عبر قائمة المتصفحات
+    - مهمة خلفية تجدد الجلسة عبر المتصفحات عند انتهائها أو فشلها
+      (فترة مضاعفة بعد كل تجديد فاشل حتى لا يأخذ التجديد وقت المتصفحات من الطلبات الحقيقية -
+       البحث الحقيقي عبر المتصفحات يحفظ الجلسة أيضاً عند نجاحه)
+    """
+
+    def __init__(self, browser_manager: BrowserManager, request_queue: RequestQueue,
+                 max_age: float = PUBG_SESSION_MAX_AGE, max_failures: int = PUBG_FAST_PATH_MAX_FAILURES,
+                 check_interval: float = PUBG_SESSION_CHECK_INTERVAL,
+                 max_backoff: float = PUBG_HARVEST_MAX_BACKOFF):
+        self.browser_manager = browser_manager
+        self.request_queue = request_queue
+        self.max_age = max_age
+        self.max_failures = max_failures
+        self.check_interval = check_interval
+        self.max_backoff = max_backoff
+        self.concurrency = 1
+        self._consecutive_failures = 0
+        self._failed_refreshes = 0
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {'lookups': 0, 'found': 0, 'not_found': 0, 'fallbacks': 0, 'invalidated': 0, 'refreshes': 0, 'failed_refreshes': 0}
+
+    @property
+    def session(self) -> Optional[MidasBuySession]:
+        session = self.browser_manager.session
+        if session is None or time.time() - session.harvested_at > self.max_age:
+            return None
+        return session
+
+    def is_ready(self) -> bool:
+        """هل توجد جلسة صالحة للمسار السريع"""
+        return self.session is not None
+
+    async def start(self):
+        """بدء مهمة تجديد الجلسة"""
+        pool = await get_connection_pool()
+        self.concurrency = pool.config.concurrent_requests_per_game
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """إيقاف مهمة تجديد الجلسة"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                if not self.is_ready():
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._refresh_failed()
+                logger.error("❌ خطأ في تجديد جلسة MidasBuy: %s", e)
+            await asyncio.sleep(self.next_check_delay())
+
+    def next_check_delay(self) -> float:
+        """الفترة حتى الفحص التالي - تتضاعف مع كل تجديد فاشل حتى max_backoff"""
+        if self.is_ready():
+            self._failed_refreshes = 0
+        return min(self.max_backoff, self.check_interval * 2 ** self._failed_refreshes)
+
+    def _refresh_failed(self):
+        self._failed_refreshes += 1
+        self.stats['failed_refreshes'] += 1
+
+    async def refresh(self):
+        """تجديد الجلسة ببحث حقيقي عبر قائمة المتصفحات"""
+        self.stats['refreshes'] += 1
+        await self.request_queue.submit_request(PUBG_HARVEST_PLAYER_ID)
+        if self.is_ready():
+            self._failed_refreshes = 0
+            logger.info("🔑 تم تجديد جلسة MidasBuy من %s", self.browser_manager.session.browser_id)
+        else:
+            self._refresh_failed()
+            logger.warning("⚠️ فشل تجديد جلسة MidasBuy (%s محاولة متتالية) - المحاولة التالية بعد %.0f ثانية",
+                           self._failed_refreshes, self.next_check_delay())
+
+    def _invalidate(self, reason: str):
+        self.browser_manager.session = None
+        self._consecutive_failures = 0
+        self.stats['invalidated'] += 1
+        logger.warning("⚠️ إلغاء جلسة MidasBuy: %s", reason)
+
+    async def lookup(self, player_id: str) -> Optional[dict]:
+        """
+        البحث عن اللاعب عبر HTTP
+
+        Returns:
+            نتيجة بنفس شكل BrowserManager.process_request، أو None للرجوع لقائمة المتصفحات
+        """
+        session = self.session
+        if session is None:
+            return None
+        request = session.build_request(player_id)
+        if request is None:
+            self._invalidate("معرف اللاعب غير موجود في طلب التحقق")
+            return None
+
+        self.stats['lookups'] += 1
+        pool = await get_connection_pool()
+        response = await pool.make_request(
+            game_type=GameType.PUBG,
+            url=request['url'],
+            method=request['method'],
+            data=request['data'],
+            headers=request['headers'],
+            cookies=request['cookies']
+        )
+
+        if response and response.get('circuit_open'):
+            # دائرة MidasBuy مفتوحة - الرجوع للمتصفحات بدون احتساب فشل على الجلسة
+            self.stats['fallbacks'] += 1
+            return None
+
+        result = parse_midasbuy_verify_response(response.get('data')) if response and response.get('success') else None
+        if result is None:
+            self.stats['fallbacks'] += 1
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.max_failures:
+                self._invalidate(f"{self._consecutive_failures} إخفاقات متتالية")
+            return None
+
+        self._consecutive_failures = 0
+        if result['found']:
+            self.stats['found'] += 1
+            return {'success': True, 'player_id': player_id, 'player_name': result['player_name'], 'method': 'http_fast_path'}
+        self.stats['not_found'] += 1
+        return {'success': False, 'not_found': True, 'player_id': player_id,
+                'error': 'معرف اللاعب غير صحيح - لم يتم العثور على اللاعب', 'method': 'http_fast_path'}
+
+    def get_status(self) -> dict:
+        """حالة المسار السريع"""
+        session = self.session
+        return {
+            'ready': session is not None,
+            'session_age': time.time() - session.harvested_at if session else None,
+            'sessions_harvested': self.browser_manager.sessions_harvested,
+            'consecutive_failures': self._consecutive_failures,
+            'next_refresh_delay': self.next_check_delay() if session is None else None,
+            **self.stats
         }
 
 # ===== متغيرات عامة =====
 _browser_manager: Optional[BrowserManager] = None
 _request_queue: Optional[RequestQueue] = None
+_autoscaler: Optional[BrowserAutoscaler] = None
+_fast_path: Optional[PubgHttpFastPath] = None
+_recycler: Optional[BrowserRecycler] = None
 _initialized = False
 
 async def initialize_pubg_system():
     """تهيئة نظام PUBG عند بدء تشغيل الـ API"""
-    global _browser_manager, _request_queue, _initialized
+    global _browser_manager, _request_queue, _autoscaler, _fast_path, _recycler, _initialized
 
     if _initialized:
         return True
 
     if not PLAYWRIGHT_AVAILABLE:
-        print("❌ Playwright غير متاح!")
+        logger.error("❌ Playwright غير متاح!")
         return False
 
     try:
-        print("🔧 تهيئة مدير المتصفحات للبحث عن لاعبي PUBG...")
-        _browser_manager = BrowserManager(browser_count=3, headless=True)
+        logger.info("🔧 تهيئة مدير المتصفحات للبحث عن لاعبي PUBG...")
+        _browser_manager = BrowserManager(
+            browser_count=PUBG_BROWSER_COUNT,
+            headless=PUBG_HEADLESS,
+            contexts_per_browser=PUBG_CONTEXTS_PER_BROWSER
+        )
 
         if not await _browser_manager.initialize():
-            print("❌ فشل في تهيئة مدير المتصفحات!")
+            logger.error("❌ فشل في تهيئة مدير المتصفحات!")
             return False
 
-        print("📋 تهيئة قائمة الطلبات...")
+        logger.info("📋 تهيئة قائمة الطلبات...")
         _request_queue = RequestQueue(_browser_manager)
         await _request_queue.start()
 
+        if PUBG_AUTOSCALE_ENABLED:
+            _autoscaler = BrowserAutoscaler(_browser_manager, _request_queue, AutoscaleConfig(
+                min_browsers=PUBG_MIN_BROWSERS,
+                max_browsers=PUBG_MAX_BROWSERS
+            ))
+            await _autoscaler.start()
+            logger.info("📐 التوسع التلقائي مفعل: %s-%s متصفح", PUBG_MIN_BROWSERS, PUBG_MAX_BROWSERS)
+
+        if PUBG_RECYCLE_ENABLED:
+            _recycler = BrowserRecycler(_browser_manager)
+            await _recycler.start()
+            logger.info("♻️ إعادة تدوير المتصفحات مفعلة: %sMB / %s بحث / %sث", PUBG_RECYCLE_MAX_RSS_MB, PUBG_RECYCLE_MAX_LOOKUPS, PUBG_RECYCLE_MAX_AGE)
+
+        if PUBG_HTTP_FAST_PATH_ENABLED:
+            _fast_path = PubgHttpFastPath(_browser_manager, _request_queue)
+            await _fast_path.start()
+            logger.info("⚡ المسار السريع عبر HTTP مفعل (جلسة MidasBuy من المتصفحات)")
+
         _initialized = True
-        print("✅ تم تهيئة نظام PUBG بنجاح!")
+        logger.info("✅ تم تهيئة نظام PUBG بنجاح!")
         return True
 
     except Exception as e:
-        print(f"❌ خطأ في تهيئة نظام PUBG: {e}")
+        logger.error("❌ خطأ في تهيئة نظام PUBG: %s", e)
         return False
 
+async def get_pubg_status() -> dict:
+    """الحصول على حالة نظام PUBG (المتصفحات، قائمة الطلبات، التوسع التلقائي)"""
+    status = {'initialized': _initialized}
+    if _browser_manager:
+        status['browsers'] = await _browser_manager.get_status()
+    if _request_queue:
+        status['queue'] = _request_queue.get_queue_status()
+    if _autoscaler:
+        status['autoscaler'] = _autoscaler.get_status()
+    if _fast_path:
+        status['fast_path'] = _fast_path.get_status()
+    if _recycler:
+        status['recycler'] = _recycler.get_status()
+    return status
+
+def promote_pubg_request(player_id: str, deadline: Optional[float] = None, priority: Optional[str] = None) -> bool:
+    """رفع أولوية أو تمديد مهلة بحث PUBG جارٍ لنفس المعرف (انظر RequestQueue.promote)"""
+    if _request_queue is None:
+        return False
+    return _request_queue.promote(player_id, deadline, priority)
+
+def get_pubg_concurrency() -> int:
+    """عدد عمليات البحث المتوازية الممكنة في PUBG (عدد المتصفحات، أو حد Connection Pool مع المسار السريع)"""
+    if _browser_manager is None:
+        return 1
+    count = max(1, len(_browser_manager.browsers))
+    if _fast_path is not None and _fast_path.is_ready():
+        return max(count, _fast_path.concurrency)
+    return count
+
 async def _initialize_system():
     """تهيئة النظام إذا لم يتم تهيئته بعد (للاستخدام الداخلي)"""
     return await initialize_pubg_system()
@@ -763,7 +2307,7 @@ def get_pubg_player_name(player_id: str) -> Optional[str]:
                 loop.close()
 
     except Exception as e:
-        print(f"❌ خطأ في البحث عن لاعب PUBG {player_id}: {e}")
+        logger.error("❌ خطأ في البحث عن لاعب PUBG %s: %s", player_id, e)
         return None
 
 def _run_search_in_new_loop(player_id: str) -> Optional[str]:
@@ -775,16 +2319,32 @@ def _run_search_in_new_loop(player_id: str) -> Optional[str]:
     finally:
         loop.close()
 
-async def _search_player_async(player_id: str) -> Optional[str]:
-    """البحث عن اللاعب بشكل غير متزامن"""
+async def _search_player_result_async(player_id: str, deadline: Optional[float] = None,
+                                      priority: Optional[str] = None) -> dict:
+    """
+    البحث عن اللاعب وإرجاع النتيجة الكاملة (مع التمييز بين "غير موجود" والأخطاء)
+    deadline وقت انتهاء المهلة (time.time) من العميل - افتراضياً PUBG_LOOKUP_TIMEOUT
+    priority أولوية الطلب في قائمة المتصفحات (high / normal / bulk)
+    """
     global _browser_manager, _request_queue
 
     # تهيئة النظام إذا لم يتم تهيئته
     if not await _initialize_system():
-        return None
+        return {'success': False, 'error': 'نظام PUBG غير متاح', 'player_id': player_id}
+
+    if _fast_path is not None:
+        with tracing.start_span("pubg.fast_path") as span:
+            result = await _fast_path.lookup(player_id)
+            span.set_attribute("used", result is not None)
+        if result is not None:
+            return result
 
+    return await _request_queue.submit_request(player_id, deadline, priority)
+
+async def _search_player_async(player_id: str) -> Optional[str]:
+    """البحث عن اللاعب بشكل غير متزامن"""
     try:
-        result = await _request_queue.submit_request(player_id)
+        result = await _search_player_result_async(player_id)
 
         if result.get('success') and result.get('player_name'):
             return result['player_name']
@@ -792,28 +2352,40 @@ async def _search_player_async(player_id: str) -> Optional[str]:
             return None
 
     except Exception as e:
-        print(f"❌ خطأ في البحث الداخلي: {e}")
+        logger.error("❌ خطأ في البحث الداخلي: %s", e)
         return None
 
 # ===== تنظيف الموارد عند الإغلاق =====
 
 async def cleanup_resources():
     """تنظيف الموارد عند إغلاق التطبيق"""
-    global _browser_manager, _request_queue, _initialized
+    global _browser_manager, _request_queue, _autoscaler, _fast_path, _recycler, _initialized
+
+    if _fast_path:
+        await _fast_path.stop()
+        _fast_path = None
+
+    if _recycler:
+        await _recycler.stop()
+        _recycler = None
+
+    if _autoscaler:
+        await _autoscaler.stop()
+        _autoscaler = None
 
     if _request_queue:
         try:
             await _request_queue.stop()
-            print("✅ تم إيقاف قائمة طلبات PUBG")
+            logger.info("✅ تم إيقاف قائمة طلبات PUBG")
         except Exception as e:
-            print(f"❌ خطأ في إيقاف قائمة طلبات PUBG: {e}")
+            logger.error("❌ خطأ في إيقاف قائمة طلبات PUBG: %s", e)
 
     if _browser_manager:
         try:
             await _browser_manager.cleanup()
-            print("✅ تم إيقاف مدير متصفحات PUBG")
+            logger.info("✅ تم إيقاف مدير متصفحات PUBG")
         except Exception as e:
-            print(f"❌ خطأ في إيقاف مدير متصفحات PUBG: {e}")
+            logger.error("❌ خطأ في إيقاف مدير متصفحات PUBG: %s", e)
 
     _initialized = False
 
@@ -853,7 +2425,7 @@ def get_player_info(player_id):
 @app.route('/pubg/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    global _browser_manager, _request_queue, _initialized
+    global _browser_manager, _request_queue, _autoscaler, _fast_path, _recycler, _initialized
 
     status = {
         'status': 'healthy',
@@ -870,6 +2442,15 @@ def health_check():
         queue_status = _request_queue.get_queue_status()
         status['queue'] = queue_status
 
+    if _autoscaler:
+        status['autoscaler'] = _autoscaler.get_status()
+
+    if _fast_path:
+        status['fast_path'] = _fast_path.get_status()
+
+    if _recycler:
+        status['recycler'] = _recycler.get_status()
+
     return jsonify(status)
 
 @app.route('/pubg/shutdown', methods=['POST'])
@@ -946,6 +2527,7 @@ def main():
         asyncio.run(test_parallel_system())
 
 if __name__ == "__main__":
+    setup_logging()
     try:
         main()
     except KeyboardInterrupt:
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Server-Timing
+تجميع زمن كل مرحلة في الطلب الحالي لإرساله في header الاستجابة Server-Timing
+- كائن واحد لكل طلب في contextvars - المهام الفرعية تسجل فيه تلقائياً
+- التسجيل جمع رقم في قاموس فقط فيبقى مفعلاً دائماً
+- المراحل المتكررة (مثل عدة طلبات HTTP) تُجمع في نفس الاسم
+- العملية المشتركة بين طلبات مدمجة تقيس مراحلها في كائن خاص بها ويضيفها كل منتظر لقياسه (merge)
+"""
+
+import contextvars
+import time
+from typing import Dict, Optional
+
+_current: contextvars.ContextVar = contextvars.ContextVar("server_timing", default=None)
+
+class ServerTiming:
+    """أزمنة مراحل طلب واحد بالثواني"""
+    __slots__ = ("started", "phases")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def merge(self, phases: Dict[str, float]):
+        """إضافة مراحل قيست في سياق آخر (مثل عملية جلب مشتركة بين عدة طلبات)"""
+        for name, seconds in phases.items():
+            self.record(name, seconds)
+
+    def header(self) -> str:
+        """قيمة header الـ Server-Timing بالمللي ثانية مع total في النهاية"""
+        total = time.perf_counter() - self.started
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+def start() -> ServerTiming:
+    """بدء قياس طلب جديد في السياق الحالي"""
+    timing = ServerTiming()
+    _current.set(timing)
+    return timing
+
+def current() -> Optional[ServerTiming]:
+    """قياس الطلب الحالي أو None خارج الطلبات"""
+    return _current.get()
+
+def record(name: str, seconds: float, timing: Optional[ServerTiming] = None):
+    """إضافة زمن مرحلة لقياس الطلب الحالي (أو timing إذا مُرر من سياق آخر)"""
+    if timing is None:
+        timing = _current.get()
+    if timing is not None:
+        timing.record(name, seconds)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Single-Flight Request Coalescing
+دمج الطلبات المتطابقة الجارية في عملية واحدة مشتركة
+- أول طلب لمفتاح معين يبدأ العملية الفعلية
+- الطلبات المتطابقة التالية تنتظر نفس النتيجة بدلاً من تكرار العمل
+- عند إلغاء جميع المنتظرين تُلغى العملية المشتركة نفسها
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+class SingleFlight:
+    """تنفيذ عملية واحدة فقط لكل مفتاح في نفس الوقت ومشاركة نتيجتها مع جميع المنتظرين"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}  # عدد المنتظرين الحاليين لكل مفتاح
+        self.stats = {
+            "executed": 0,
+            "coalesced": 0,
+            "abandoned": 0
+        }
+
+    async def do(self, key: Hashable, operation: Callable[[], Awaitable[Any]],
+                 on_join: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        تنفيذ العملية أو الانضمام لعملية جارية بنفس المفتاح
+
+        Args:
+            key: مفتاح الدمج (مثل (اللعبة، معرف اللاعب))
+            operation: دالة تنشئ العملية الفعلية - تُستدعى فقط إذا لم تكن هناك عملية جارية
+            on_join: دالة تُستدعى عند الانضمام لعملية جارية (مثل رفع أولويتها لتناسب المنتظر الجديد)
+
+        Returns:
+            نتيجة العملية المشتركة
+        """
+        task = self._inflight.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(operation())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.stats["executed"] += 1
+        else:
+            self.stats["coalesced"] += 1
+            if on_join is not None:
+                on_join()
+
+        # shield: إلغاء أحد المنتظرين لا يلغي العملية المشتركة على الباقين
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # آخر منتظر ألغى - لا أحد ينتظر النتيجة فتُلغى العملية
+            if self._waiters[key] == 1 and not task.done():
+                task.cancel()
+                self._forget(key, task)  # طلب جديد بنفس المفتاح يبدأ عملية جديدة
+                self.stats["abandoned"] += 1
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    def is_inflight(self, key: Hashable) -> bool:
+        """هل توجد عملية جارية لهذا المفتاح (طلب جديد سينضم إليها)"""
+        return key in self._inflight
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        """إزالة العملية المنتهية من قائمة العمليات الجارية"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def get_stats(self) -> Dict:
+        """الحصول على إحصائيات الدمج"""
+        return {
+            **self.stats,
+            "in_flight": len(self._inflight)
+        }
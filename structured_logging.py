@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Structured Logging
+سجلات JSON lines غير معطلة لـ event loop
+- QueueHandler يضع السجل في قائمة فقط - التنسيق والكتابة في خيط منفصل (QueueListener)
+- مستوى مستقل لكل وحدة (istation.api، istation.pubg ...)
+- حد لمعدل تكرار نفس رسائل INFO/DEBUG حتى لا تغرق الرسائل المتكررة في كل طلب القرص أو الطرفية
+  (التحذيرات والأخطاء لا تُحذف أبداً، وعدد المحذوف يُكتب دورياً وعند الإيقاف إذا توقف التكرار)
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, TextIO
+
+# متغيرات لا تتغير بعد الاستدعاء - السجل الذي كل متغيراته منها يُنسق في خيط الكتابة
+_IMMUTABLE_ARGS = (str, int, float, bytes, type(None))
+
+# خصائص LogRecord القياسية - أي خاصية أخرى جاءت من extra وتُكتب كحقل في JSON
+_STANDARD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "suppressed"}
+
+class JsonFormatter(logging.Formatter):
+    """تنسيق السجل كسطر JSON واحد مع حقول extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class RateLimitFilter(logging.Filter):
+    """
+    حد لمعدل تكرار كل رسالة أقل من WARNING (نفس المسجل ونفس القالب قبل تعبئة المتغيرات)
+    الرسائل الزائدة تُسقط قبل دخول القائمة، وعددها يُضاف لأول رسالة تمر بعدها (suppressed)
+    أو لسجل ملخص من drain إذا لم تمر رسالة بعدها
+    """
+
+    def __init__(self, rate: float = 20.0, burst: int = 50):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[tuple, list] = {}  # المفتاح -> [الرصيد، آخر تحديث، عدد المحذوف]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                bucket[2] += 1
+                return False
+            bucket[0] = tokens - 1
+            record.suppressed, bucket[2] = bucket[2], 0
+        return True
+
+    def drain(self) -> List[logging.LogRecord]:
+        """
+        سجلات ملخص لعدد الرسائل المحذوفة التي لم تمر بعدها رسالة من نفس النوع
+        وحذف الرسائل التي امتلأ رصيدها (لم تعد تتكرر) حتى لا يكبر القاموس بلا حد
+        """
+        summaries = []
+        now = time.monotonic()
+        with self._lock:
+            for key, bucket in list(self._buckets.items()):
+                name, msg = key
+                if bucket[2]:
+                    summary = logging.LogRecord(name, logging.INFO, __file__, 0,
+                                                "🔇 رسائل مكررة محذوفة: %s", (msg,), None)
+                    summary.suppressed, bucket[2] = bucket[2], 0
+                    summaries.append(summary)
+                elif bucket[0] + (now - bucket[1]) * self.rate >= self.burst:
+                    del self._buckets[key]
+        return summaries
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler بدون تنسيق في خيط الاستدعاء - المتغيرات الثابتة (نصوص وأرقام) تُعبأ في خيط الكتابة
+    السجل الذي يحمل متغيراً قابلاً للتعديل (مثل قاموس الاستجابة الخام) يُنسق هنا قبل أن يتغير
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+_rate_limiter: Optional[RateLimitFilter] = None
+_flusher: Optional[threading.Thread] = None
+_flusher_stop = threading.Event()
+
+def _flush_suppressed():
+    """كتابة ملخص الرسائل المحذوفة المعلقة (يتجاوز الفلتر)"""
+    if _rate_limiter is None or _queue_handler is None:
+        return
+    for summary in _rate_limiter.drain():
+        _queue_handler.enqueue(summary)
+
+def _run_flusher(interval: float):
+    while not _flusher_stop.wait(interval):
+        _flush_suppressed()
+
+def setup_logging(level: str = "INFO", module_levels: Optional[Dict[str, str]] = None, path: str = "-",
+                  rate: float = 20.0, burst: int = 50, stream: Optional[TextIO] = None,
+                  flush_interval: float = 60.0) -> logging.Handler:
+    """
+    تفعيل السجلات المنظمة لجميع مسجلات istation
+
+    Args:
+        level: المستوى الافتراضي لمسجلات istation
+        module_levels: مستويات خاصة {"istation.pubg": "WARNING", "playwright": "ERROR"}
+        path: ملف السجلات أو "-" لـ stdout
+        rate / burst: الحد الأقصى لتكرار نفس الرسالة في الثانية والرصيد الأولي (rate=0 بدون حد)
+        stream: كتابة السجلات لهذا الـ stream بدلاً من path
+        flush_interval: كل كم ثانية يُكتب عدد الرسائل المحذوفة التي لم تمر بعدها رسالة مماثلة
+    """
+    global _listener, _queue_handler, _rate_limiter, _flusher
+    shutdown_logging()
+
+    if stream is not None:
+        target = logging.StreamHandler(stream)
+    elif path == "-":
+        target = logging.StreamHandler(sys.stdout)
+    else:
+        target = logging.FileHandler(path, encoding="utf-8")
+    target.setFormatter(JsonFormatter())
+
+    records: "queue.SimpleQueue" = queue.SimpleQueue()
+    _queue_handler = _DeferredQueueHandler(records)
+    _rate_limiter = RateLimitFilter(rate, burst)
+    _queue_handler.addFilter(_rate_limiter)
+    _listener = logging.handlers.QueueListener(records, target, respect_handler_level=True)
+    _listener.start()
+    if rate > 0 and flush_interval > 0:
+        _flusher_stop.clear()
+        _flusher = threading.Thread(target=_run_flusher, args=(flush_interval,), name="log-flusher", daemon=True)
+        _flusher.start()
+
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    # مكتبات الطرف الثالث (asyncio، playwright، werkzeug) تسجل التحذيرات فقط ما لم يُحدد غير ذلك
+    root.setLevel(logging.WARNING)
+    logging.getLogger("istation").setLevel(level.upper())
+    for name, module_level in (module_levels or {}).items():
+        logging.getLogger(name).setLevel(module_level.upper())
+    return _queue_handler
+
+def shutdown_logging():
+    """كتابة السجلات المتبقية (مع ملخص الرسائل المحذوفة) وإيقاف خيط الكتابة"""
+    global _listener, _queue_handler, _rate_limiter, _flusher
+    if _flusher is not None:
+        _flusher_stop.set()
+        _flusher.join()
+        _flusher = None
+    _flush_suppressed()
+    _rate_limiter = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات التحكم في قبول الطلبات
+"""
+
+import asyncio
+
+import pytest
+
+from admission import AdmissionController
+
+class TestAdmissionController:
+    """اختبارات AdmissionController"""
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_queue_exceeds_slo(self):
+        """اختبار تقدير الترتيب والزمن المتوقع ورفض ما يتجاوز الهدف مع Retry-After"""
+        controller = AdmissionController(slo=10.0, default_service_time=2.0)
+        release = asyncio.Event()
+
+        async def lookup():
+            async with controller.track("pubg", 2):
+                await release.wait()
+
+        tasks = [asyncio.create_task(lookup()) for _ in range(9)]
+        await asyncio.sleep(0)
+
+        # 9 جارية على خانتين: الطلب الجديد ينتظر 8 طلبات (4 دورات) ثم يُخدم = 10 ثوانٍ
+        decision = controller.evaluate("pubg", 2)
+        assert decision.admitted and decision.position == 8 and decision.eta == pytest.approx(10.0)
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert controller.evaluate("pubg", 2).position == 0
+
+        for _ in range(11):
+            controller._inflight["pubg"] = controller._inflight.get("pubg", 0) + 1
+        service = controller.service_time("pubg")
+        decision = controller.evaluate("pubg", 1, slo=service * 5)
+        assert not decision.admitted
+        assert decision.retry_after >= 1
+        assert controller.stats == {"admitted": 2, "admitted_best_effort": 0, "rejected": 1}
+
+    def test_client_timeout_below_service_time(self):
+        """اختبار أن مهلة عميل أقصر من زمن الخدمة لا تُرفض بدون انتظار، وأن Retry-After يخص الانتظار فقط"""
+        controller = AdmissionController(default_service_time=3.0)
+        decision = controller.evaluate("pubg", 3, slo=2.0)
+        assert decision.admitted and decision.position == 0 and decision.retry_after == 0
+        assert controller.stats["admitted_best_effort"] == 1
+
+        # 6 جارية على 3 خانات: الانتظار 4 ثوانٍ - بعدها يُقبل الطلب (بأفضل جهد) فإعادة المحاولة بعد 4
+        controller._inflight["pubg"] = 6
+        decision = controller.evaluate("pubg", 3, slo=2.0)
+        assert not decision.admitted and decision.position == 4 and decision.retry_after == 4
+        # مع هدف 10 ثوانٍ يتبقى 7 للانتظار: 9 جارية تعني انتظار 7 ثوانٍ (مقبول) و 12 تعني 10 (بعد 3)
+        controller._inflight["pubg"] = 12
+        decision = controller.evaluate("pubg", 3, slo=10.0)
+        assert not decision.admitted and decision.retry_after == 3
+
+    @pytest.mark.asyncio
+    async def test_samples_only_without_queueing(self):
+        """اختبار تسجيل زمن الخدمة فقط للعمليات التي بدأت بخانة متاحة"""
+        controller = AdmissionController(default_service_time=5.0)
+
+        async def lookup(delay):
+            async with controller.track("jawaker", 1):
+                await asyncio.sleep(delay)
+
+        await asyncio.gather(lookup(0.05), lookup(0.3))
+        assert len(controller._samples["jawaker"]) == 1
+        assert controller.service_time("jawaker") < 0.2
+        assert controller.get_stats()["games"]["jawaker"]["inflight"] == 0
@@ -53,6 +53,15 @@ class TestAPI:
         data = response.json()
         assert "status" in data
     
+    def test_metrics_endpoint(self, client):
+        """اختبار مقاييس Prometheus"""
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE istation_lookup_duration_seconds histogram" in response.text
+        assert "# TYPE istation_pubg_browsers gauge" in response.text
+        assert 'istation_cache_hit_ratio{cache="memory"}' in response.text
+
     def test_get_player_name_invalid_request(self, client):
         """اختبار طلب غير صحيح"""
         # طلب فارغ
@@ -107,6 +116,447 @@ class TestAPI:
         result = await get_player_name_async("1230574182", "jawaker")
         assert result is None or isinstance(result, str)
 
+class TestLookupCaching:
+    """اختبارات الذاكرة المؤقتة في طبقة التوزيع"""
+
+    @pytest.fixture
+    def fake_fetch(self, monkeypatch):
+        """استبدال الجلب من المصدر بدالة وهمية تسجل الاستدعاءات"""
+        if not MAIN_AVAILABLE:
+            pytest.skip("main.py غير متوفر")
+        import main
+
+        calls = []
+        outcomes = {}
+
+        async def fetch(player_id, game_type, deadline=None, priority=None):
+            calls.append((game_type, player_id))
+            return outcomes.get(player_id, ("Cached Player", main.OUTCOME_FOUND))
+
+        main._lookup_cache.clear()
+        monkeypatch.setattr(main, "_fetch_player_name", fetch)
+        monkeypatch.setattr(main, "_persistent_cache", None)
+        yield calls, outcomes
+        main._lookup_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_aliases_share_cache_entry(self, fake_fetch):
+        """اختبار مشاركة ff و freefire لنفس المدخل"""
+        calls, _ = fake_fetch
+        assert await get_player_name_async("42", "ff") == "Cached Player"
+        assert await get_player_name_async("42", "freefire") == "Cached Player"
+        assert calls == [("freefire", "42")]
+
+    @pytest.mark.asyncio
+    async def test_errors_are_not_cached(self, fake_fetch):
+        """اختبار عدم تخزين أخطاء المصدر مع تخزين نتائج "غير موجود\""""
+        import main
+        calls, outcomes = fake_fetch
+        outcomes["err"] = (None, main.OUTCOME_ERROR)
+        outcomes["missing"] = (None, main.OUTCOME_NOT_FOUND)
+
+        await get_player_name_async("err", "jawaker")
+        await get_player_name_async("err", "jawaker")
+        await get_player_name_async("missing", "jawaker")
+        assert await get_player_name_async("missing", "jawaker") is None
+        assert calls.count(("jawaker", "err")) == 2
+        assert calls.count(("jawaker", "missing")) == 1
+
+    @pytest.mark.asyncio
+    async def test_only_explicit_not_found_is_not_found(self, monkeypatch):
+        """اختبار أن رسائل خطأ المصدر برد HTTP ناجح تُصنف خطأ وليس غير موجود"""
+        if not MAIN_AVAILABLE:
+            pytest.skip("main.py غير متوفر")
+        import main
+
+        cases = [
+            ("freefire", "get_freefire_player_name_async", {"status": 404, "msg": "id_not_found"}, main.OUTCOME_NOT_FOUND),
+            ("freefire", "get_freefire_player_name_async", {"status": 429, "msg": "rate limit exceeded"}, main.OUTCOME_ERROR),
+            ("freefire", "get_freefire_player_name_async", {"status": 503, "msg": "maintenance"}, main.OUTCOME_ERROR),
+            ("jawaker", "get_jawaker_player_name_async", {"user": None}, main.OUTCOME_NOT_FOUND),
+            ("jawaker", "get_jawaker_player_name_async", {"error": "too many requests"}, main.OUTCOME_ERROR),
+            ("bigolive", "get_bigolive_player_name_async",
+             {"success": True, "data": {"matched": True, "exists": False}}, main.OUTCOME_NOT_FOUND),
+            ("bigolive", "get_bigolive_player_name_async", {"success": True, "data": {}}, main.OUTCOME_ERROR),
+            ("poppolive", "get_poppolive_player_name_async",
+             {"success": True, "data": {"matched": False}}, main.OUTCOME_NOT_FOUND),
+            ("poppolive", "get_poppolive_player_name_async", {"success": True, "data": {"msg": "busy"}}, main.OUTCOME_ERROR),
+        ]
+        for game, function, data, expected in cases:
+            async def fetch(player_id, data=data):
+                return {"success": True, "data": data}
+            monkeypatch.setattr(main, function, fetch)
+            assert await main._fetch_player_name("1", game) == (None, expected), (game, data)
+
+    @pytest.mark.asyncio
+    async def test_pubg_extraction_timeout_not_cached(self, monkeypatch):
+        """اختبار أن صفحة لم ترسل استجابة التحقق ولم يظهر فيها الاسم لا تُخزن كنتيجة غير موجود"""
+        if not MAIN_AVAILABLE:
+            pytest.skip("main.py غير متوفر")
+        import main
+        import pubg_player
+        from pubg_player import BrowserInstance, BrowserManager, PLAYER_NAME_READY_SELECTOR
+
+        class SilentPage:
+            """صفحة تقبل الإدخال والضغط لكن لا ترسل استجابة تحقق ولا تعرض الاسم"""
+
+            async def wait_for_selector(self, selector, **kwargs):
+                if selector == PLAYER_NAME_READY_SELECTOR:
+                    await asyncio.sleep(kwargs["timeout"] / 1000)
+                    raise asyncio.TimeoutError()
+
+            async def fill(self, selector, value):
+                pass
+
+            async def click(self, selector):
+                pass
+
+            def on(self, event, listener):
+                pass
+
+            def remove_listener(self, event, listener):
+                pass
+
+        manager = BrowserManager(browser_count=1, headless=True)
+        browser = BrowserInstance(id="browser_1", page=SilentPage(), last_used=time.time())
+        results = []
+
+        async def search(player_id, deadline=None, priority=None):
+            results.append(await manager._perform_lookup(browser, player_id, "req"))
+            return results[-1]
+
+        main._lookup_cache.clear()
+        monkeypatch.setattr(pubg_player, "NAME_EXTRACTION_TIMEOUT", 0.05)
+        monkeypatch.setattr(main, "_search_player_result_async", search)
+        monkeypatch.setattr(main, "_persistent_cache", None)
+
+        assert await get_player_name_async("5123", "pubg") is None
+        assert results[0]["timed_out"] and not results[0].get("not_found")
+        assert manager.extraction_stats["timeout"] == 1
+        assert main._lookup_cache.get("pubg", "5123")[0] is False
+        main._lookup_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_lookups_are_coalesced(self, monkeypatch):
+        """اختبار دمج الطلبات المتطابقة المتزامنة في طلب واحد للمصدر"""
+        if not MAIN_AVAILABLE:
+            pytest.skip("main.py غير متوفر")
+        import main
+
+        calls = []
+
+        async def slow_fetch(player_id, game_type, deadline=None, priority=None):
+            calls.append((game_type, player_id))
+            await asyncio.sleep(0.05)
+            return "Shared Player", main.OUTCOME_FOUND
+
+        main._lookup_cache.clear()
+        monkeypatch.setattr(main, "_fetch_player_name", slow_fetch)
+        monkeypatch.setattr(main, "_persistent_cache", None)
+        coalesced_before = main._single_flight.stats["coalesced"]
+
+        results = await asyncio.gather(*[get_player_name_async("77", "pubg") for _ in range(5)])
+
+        assert results == ["Shared Player"] * 5
+        assert calls == [("pubg", "77")]
+        assert main._single_flight.stats["coalesced"] - coalesced_before == 4
+        main._lookup_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_client_timeout(self, monkeypatch):
+        """اختبار مهلة العميل - تمرير deadline للمصدر وإرجاع None عند انتهائها"""
+        if not MAIN_AVAILABLE:
+            pytest.skip("main.py غير متوفر")
+        import main
+
+        deadlines = []
+
+        async def slow_fetch(player_id, game_type, deadline=None, priority=None):
+            deadlines.append(deadline)
+            await asyncio.sleep(0.5)
+            return "Late Player", main.OUTCOME_FOUND
+
+        main._lookup_cache.clear()
+        monkeypatch.setattr(main, "_fetch_player_name", slow_fetch)
+        monkeypatch.setattr(main, "_persistent_cache", None)
+
+        before = time.time()
+        assert await get_player_name_async("88", "pubg", timeout=0.05) is None
+        assert time.time() - before < 0.4
+        assert before < deadlines[0] <= before + 0.1
+        main._lookup_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_lookup_cancelled_on_disconnect(self):
+        """اختبار إلغاء البحث عند إغلاق العميل للاتصال"""
+        if not MAIN_AVAILABLE:
+            pytest.skip("main.py غير متوفر")
+        import main
+
+        class DisconnectedRequest:
+            async def is_disconnected(self):
+                return True
+
+        cancelled = []
+
+        async def slow_lookup():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        before = time.time()
+        assert await main._cancel_on_disconnect(DisconnectedRequest(), slow_lookup()) is None
+        assert time.time() - before < 2
+        assert cancelled == [True]
+
+    def test_overloaded_game_returns_429(self, monkeypatch):
+        """اختبار رفض الطلب بـ 429 و Retry-After عند تجاوز الزمن المتوقع للهدف وإضافة ETA للمقبول"""
+        if not MAIN_AVAILABLE:
+            pytest.skip("main.py غير متوفر")
+        import main
+        from admission import AdmissionController
+
+        async def fetch(player_id, game_type, deadline=None, priority=None):
+            return "Admitted Player", main.OUTCOME_FOUND
+
+        async def concurrency(game_type):
+            return 1
+
+        admission = AdmissionController(slo=10.0, default_service_time=4.0)
+        admission._inflight["jawaker"] = 3
+        main._lookup_cache.clear()
+        monkeypatch.setattr(main, "_admission", admission)
+        monkeypatch.setattr(main, "_game_concurrency", concurrency)
+        monkeypatch.setattr(main, "_fetch_player_name", fetch)
+        monkeypatch.setattr(main, "_persistent_cache", None)
+        client = TestClient(app)
+
+        # 3 جارية على خانة واحدة: 3 × 4 + 4 = 16 ثانية > 10
+        response = client.post("/get_player_name", json={"player_id": "1", "game_type": "jawaker"})
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "6"
+
+        admission._inflight["jawaker"] = 0
+        response = client.post("/get_player_name", json={"player_id": "1", "game_type": "jw"})
+        assert response.status_code == 200
+        assert response.json()["player_name"] == "Admitted Player"
+        assert response.headers["X-Queue-Position"] == "0"
+        assert float(response.headers["X-Queue-ETA"]) == pytest.approx(4.0)
+        main._lookup_cache.clear()
+
+    def test_server_timing_header(self, monkeypatch):
+        """اختبار تقسيم زمن الطلب في Server-Timing للطلب الفردي وعناصر الدفعة"""
+        if not MAIN_AVAILABLE:
+            pytest.skip("main.py غير متوفر")
+        import main
+        import server_timing
+
+        async def fetch(player_id, game_type, deadline=None, priority=None):
+            server_timing.record("upstream", 0.25)
+            return "Timed Player", main.OUTCOME_FOUND
+
+        main._lookup_cache.clear()
+        monkeypatch.setattr(main, "_fetch_player_name", fetch)
+        monkeypatch.setattr(main, "_persistent_cache", None)
+        client = TestClient(app)
+
+        response = client.post("/get_player_name", json={"player_id": "7", "game_type": "jawaker"})
+        phases = dict(part.split(";dur=") for part in response.headers["Server-Timing"].split(", "))
+        assert list(phases)[-1] == "total"
+        assert {"admission", "cache", "upstream"} <= set(phases)
+        assert float(phases["upstream"]) == 250.0
+        assert float(phases["total"]) >= float(phases["cache"])
+
+        response = client.post("/get_player_names", json={"items": [{"player_id": "7", "game_type": "jw"}]})
+        item = response.json()["results"][0]
+        assert item["player_name"] == "Timed Player"
+        assert item["server_timing"].startswith("cache;dur=") and "upstream" not in item["server_timing"]
+
+        # مسارات الرجوع المبكر تحمل الـ header أيضاً
+        response = client.post("/get_player_name", json={"player_id": "7", "game_type": "unknown"})
+        assert response.headers["Server-Timing"].startswith("total;dur=")
+        main._lookup_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_coalesced_waiters_get_shared_phases(self, monkeypatch):
+        """اختبار إضافة مراحل العملية المشتركة لقياس كل طلب مدمج وليس لأول طلب فقط"""
+        if not MAIN_AVAILABLE:
+            pytest.skip("main.py غير متوفر")
+        import main
+        import server_timing
+
+        async def slow_fetch(player_id, game_type, deadline=None, priority=None):
+            server_timing.record("upstream", 0.25)
+            await asyncio.sleep(0.05)
+            return "Shared Player", main.OUTCOME_FOUND
+
+        main._lookup_cache.clear()
+        monkeypatch.setattr(main, "_fetch_player_name", slow_fetch)
+        monkeypatch.setattr(main, "_persistent_cache", None)
+
+        async def timed_lookup():
+            timing = server_timing.start()
+            await get_player_name_async("78", "jawaker")
+            return timing
+
+        timings = await asyncio.gather(*[timed_lookup() for _ in range(3)])
+        assert [timing.phases.get("upstream") for timing in timings] == [0.25] * 3
+        main._lookup_cache.clear()
+
+class TestBatchLookup:
+    """اختبارات البحث الجماعي"""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        """عميل اختبار مع جلب وهمي من المصدر"""
+        if not MAIN_AVAILABLE:
+            pytest.skip("main.py غير متوفر")
+        import main
+
+        calls = []
+
+        async def fetch(player_id, game_type, deadline=None, priority=None):
+            calls.append((game_type, player_id))
+            if player_id == "boom":
+                raise RuntimeError("upstream exploded")
+            if player_id.startswith("missing"):
+                return None, main.OUTCOME_NOT_FOUND
+            return f"{game_type}-{player_id}", main.OUTCOME_FOUND
+
+        async def concurrency(game_type):
+            return 2
+
+        main._lookup_cache.clear()
+        monkeypatch.setattr(main, "_fetch_player_name", fetch)
+        monkeypatch.setattr(main, "_persistent_cache", None)
+        monkeypatch.setattr(main, "_game_concurrency", concurrency)
+        self.calls = calls
+        yield TestClient(app)
+        main._lookup_cache.clear()
+
+    def test_batch_preserves_order_and_deduplicates(self, client):
+        """اختبار ترتيب النتائج وإزالة التكرار"""
+        items = [
+            {"player_id": "1", "game_type": "pubg"},
+            {"player_id": "2", "game_type": "ff"},
+            {"player_id": "1", "game_type": "pubg"},
+            {"player_id": "2", "game_type": "freefire"},
+            {"player_id": "missing-3", "game_type": "jawaker"},
+        ]
+        response = client.post("/get_player_names", json={"items": items})
+        assert response.status_code == 200
+        results = response.json()["results"]
+
+        assert [r["player_name"] for r in results] == [
+            "pubg-1", "freefire-2", "pubg-1", "freefire-2", None
+        ]
+        assert [r["player_id"] for r in results] == ["1", "2", "1", "2", "missing-3"]
+        assert sorted(self.calls) == [("freefire", "2"), ("jawaker", "missing-3"), ("pubg", "1")]
+
+    def test_batch_item_errors_do_not_fail_batch(self, client):
+        """اختبار أن أخطاء العناصر لا تفشل الدفعة"""
+        items = [
+            {"player_id": "boom", "game_type": "bigolive"},
+            {"player_id": "", "game_type": "pubg"},
+            {"player_id": "5", "game_type": "unknown"},
+            {"player_id": "6", "game_type": "poppo"},
+        ]
+        response = client.post("/get_player_names", json={"items": items})
+        assert response.status_code == 200
+        results = response.json()["results"]
+
+        assert results[0]["player_name"] is None
+        assert results[1]["error"] == "invalid_player_id"
+        assert results[2]["error"] == "unsupported_game"
+        assert results[3]["player_name"] == "poppolive-6"
+        assert results[3]["error"] is None
+
+    def test_batch_too_large(self, client):
+        """اختبار رفض الدفعات الكبيرة جداً"""
+        import main
+        items = [{"player_id": str(i), "game_type": "ff"} for i in range(main.BATCH_MAX_ITEMS + 1)]
+        response = client.post("/get_player_names", json={"items": items})
+        assert response.status_code == 413
+
+class TestStreamingLookup:
+    """اختبارات البث المتتابع لنتائج البحث الجماعي"""
+
+    @pytest.fixture
+    def fake_fetch(self, monkeypatch):
+        """جلب وهمي - المعرفات التي تبدأ بـ slow تتأخر"""
+        if not MAIN_AVAILABLE:
+            pytest.skip("main.py غير متوفر")
+        import main
+
+        calls = []
+
+        async def fetch(player_id, game_type, deadline=None, priority=None):
+            calls.append(player_id)
+            if player_id.startswith("slow"):
+                await asyncio.sleep(0.2)
+            return f"name-{player_id}", main.OUTCOME_FOUND
+
+        async def concurrency(game_type):
+            return 1
+
+        main._lookup_cache.clear()
+        monkeypatch.setattr(main, "_fetch_player_name", fetch)
+        monkeypatch.setattr(main, "_persistent_cache", None)
+        monkeypatch.setattr(main, "_game_concurrency", concurrency)
+        yield calls
+        main._lookup_cache.clear()
+
+    def test_ndjson_stream(self, fake_fetch):
+        """اختبار بث NDJSON - سطر لكل عنصر مع index"""
+        import json
+        client = TestClient(app)
+        items = [
+            {"player_id": "slow-1", "game_type": "pubg"},
+            {"player_id": "2", "game_type": "ff"},
+            {"player_id": "3", "game_type": "nope"},
+        ]
+        response = client.post("/get_player_names/stream", json={"items": items})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        lines = [json.loads(line) for line in response.text.splitlines() if line]
+        by_index = {line["index"]: line for line in lines}
+        assert len(lines) == 3
+        assert by_index[0]["player_name"] == "name-slow-1"
+        assert by_index[1]["player_name"] == "name-2"
+        assert by_index[2]["error"] == "unsupported_game"
+        # النتيجة السريعة تصل قبل البطيئة
+        assert [line["index"] for line in lines].index(1) < [line["index"] for line in lines].index(0)
+
+    def test_sse_stream(self, fake_fetch):
+        """اختبار بث SSE مع حدث done في النهاية"""
+        client = TestClient(app)
+        response = client.post("/get_player_names/stream?format=sse",
+                               json={"items": [{"player_id": "9", "game_type": "jw"}]})
+        assert response.status_code == 200
+        assert response.text.count("event: result") == 1
+        assert response.text.rstrip().endswith("event: done\ndata: {}")
+
+        response = client.post("/get_player_names/stream?format=xml", json={"items": []})
+        assert response.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_closing_stream_cancels_pending_lookups(self, fake_fetch):
+        """اختبار أن إغلاق البث يلغي الطلبات التي لم تبدأ"""
+        import main
+        calls = fake_fetch
+        items = [("1", "pubg")] + [(f"slow-{i}", "pubg") for i in range(20)]
+
+        stream = main.stream_player_names(items)
+        first = await stream.__anext__()
+        assert '"index": 0' in first
+        await stream.aclose()
+        await asyncio.sleep(0.3)
+
+        assert len(calls) < len(items)
+
 class TestPerformance:
     """اختبارات الأداء"""
     
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات ذاكرة الملفات الثابتة المشتركة بين المتصفحات
+"""
+
+import pytest
+
+from asset_cache import StaticAssetCache, freshness_lifetime
+
+CACHEABLE = {"cache-control": "public, max-age=86400"}
+
+class TestStaticAssetCache:
+    """اختبارات StaticAssetCache"""
+
+    @pytest.mark.asyncio
+    async def test_survives_restart(self, tmp_path):
+        """اختبار بقاء الملفات بعد إعادة التشغيل مع headers الأصلية"""
+        directory = str(tmp_path / "assets")
+        cache = StaticAssetCache(directory)
+        await cache.put("https://www.midasbuy.com/app.js", b"console.log(1)", {"content-type": "application/javascript", **CACHEABLE})
+        assert await cache.get("https://www.midasbuy.com/app.js") == (
+            b"console.log(1)", {"content-type": "application/javascript", **CACHEABLE})
+        assert cache.stats["memory_hits"] == 1
+        await cache.save()
+
+        reopened = StaticAssetCache(directory)
+        await reopened.load()
+        body, headers = await reopened.get("https://www.midasbuy.com/app.js")
+        assert body == b"console.log(1)"
+        assert headers["content-type"] == "application/javascript"
+        assert await reopened.get("https://www.midasbuy.com/other.js") is None
+        assert (reopened.stats["hits"], reopened.stats["memory_hits"], reopened.stats["misses"]) == (1, 0, 1)
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction_and_shared_content(self, tmp_path):
+        """اختبار حذف الأقل استخداماً وحساب المحتوى المكرر مرة واحدة"""
+        cache = StaticAssetCache(str(tmp_path), max_bytes=25, memory_max_bytes=10)
+        await cache.put("a.js", b"a" * 10, CACHEABLE)
+        await cache.put("a2.js", b"a" * 10, CACHEABLE)  # نفس المحتوى برابط مختلف
+        await cache.put("b.js", b"b" * 10, CACHEABLE)
+        assert cache.size_bytes == 20
+
+        await cache.get("a.js")
+        await cache.put("c.js", b"c" * 10, CACHEABLE)
+
+        # a2.js ثم b.js هما الأقدم استخداماً
+        assert cache.stats["evictions"] == 2
+        assert await cache.get("b.js") is None
+        assert (await cache.get("a.js"))[0] == b"a" * 10
+        assert (await cache.get("c.js"))[0] == b"c" * 10
+        assert cache.size_bytes <= 25
+        assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+            [entry[0] for entry in cache._index.values()])
+
+    def test_freshness_lifetime(self):
+        """اختبار قراءة max-age ورفض no-store / no-cache / private والملفات بدون max-age"""
+        assert freshness_lifetime({"Cache-Control": "public, max-age=600"}) == 600
+        assert freshness_lifetime({"cache-control": "max-age=31536000, immutable"}) == 31536000
+        for value in ("no-store", "no-cache, max-age=600", "private, max-age=600", "public", "max-age=0"):
+            assert freshness_lifetime({"cache-control": value}) is None
+        assert freshness_lifetime({}) is None
+
+    @pytest.mark.asyncio
+    async def test_respects_cache_control(self, tmp_path):
+        """اختبار عدم تخزين ما يمنعه Cache-Control وانتهاء الملف بعد max-age حتى بعد إعادة التشغيل"""
+        now = [1000.0]
+        cache = StaticAssetCache(str(tmp_path), clock=lambda: now[0])
+        await cache.put("nostore.js", b"x", {"cache-control": "no-store"})
+        await cache.put("short.js", b"short", {"cache-control": "max-age=60"})
+        await cache.put("long.js", b"long", {"cache-control": "max-age=3600"})
+        assert await cache.get("nostore.js") is None
+        assert cache.stats["uncacheable"] == 1
+
+        now[0] += 61
+        assert await cache.get("short.js") is None
+        assert cache.stats["expired"] == 1
+        assert (await cache.get("long.js"))[0] == b"long"
+        assert sorted(p.name for p in tmp_path.iterdir()) == [cache._index["long.js"][0]]
+
+        await cache.save()
+        now[0] += 3600
+        reopened = StaticAssetCache(str(tmp_path), clock=lambda: now[0])
+        await reopened.load()
+        assert await reopened.get("long.js") is None
+
+    @pytest.mark.asyncio
+    async def test_size_and_refs_follow_index(self, tmp_path):
+        """اختبار أن الحجم وعدد مستخدمي كل بصمة يتبعان الفهرس بعد الاستبدال والحذف"""
+        cache = StaticAssetCache(str(tmp_path), max_bytes=100)
+        await cache.put("a.js", b"a" * 10, CACHEABLE)
+        await cache.put("a2.js", b"a" * 10, CACHEABLE)
+        await cache.put("a.js", b"b" * 20, CACHEABLE)  # محتوى جديد لنفس الرابط
+        assert cache.size_bytes == 30
+        assert cache._refs == {entry[0]: 1 for entry in cache._index.values()}
+
+        await cache.put("a2.js", b"c" * 5, CACHEABLE)
+        # المحتوى القديم لم يعد يستخدمه أي رابط - يُحذف من القرص
+        assert cache.size_bytes == 25
+        assert sorted(p.name for p in tmp_path.iterdir()) == sorted(entry[0] for entry in cache._index.values())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات قاطع الدائرة لكل لعبة
+"""
+
+import pytest
+
+from circuit_breaker import (CircuitBreaker, CircuitBreakerConfig, OUTCOME_ERROR, OUTCOME_SUCCESS,
+                             OUTCOME_TIMEOUT, STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN)
+from connection_pool import ConnectionPoolConfig, GameType, HighPerformanceConnectionPool
+
+class FakeClock:
+    """ساعة يدوية للتحكم في مرور الوقت"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def make_breaker(clock: FakeClock, **overrides) -> CircuitBreaker:
+    config = CircuitBreakerConfig(window=30.0, min_requests=4, error_rate_threshold=0.5,
+                                  timeout_rate_threshold=0.3, open_duration=10.0, max_open_duration=25.0,
+                                  half_open_probes=1, close_after_successes=2)
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    return CircuitBreaker("freefire", config, clock=clock)
+
+class TestCircuitBreaker:
+    """اختبارات CircuitBreaker"""
+
+    def test_opens_on_error_and_timeout_rates(self):
+        """اختبار الفتح عند تجاوز نسبة الأخطاء أو نسبة المهلات بعد الحد الأدنى للطلبات"""
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(3):
+            breaker.record(OUTCOME_ERROR)
+        # أقل من min_requests - لا حكم بعد
+        assert breaker.state == STATE_CLOSED
+        breaker.record(OUTCOME_SUCCESS)
+        assert breaker.state == STATE_OPEN
+        assert not breaker.allow()
+        assert breaker.stats["rejected"] == 1
+
+        # 2 مهلة من 6 (33%) تتجاوز حد المهلات رغم أن نسبة الفشل أقل من 50%
+        breaker = make_breaker(clock)
+        for outcome in [OUTCOME_SUCCESS] * 4 + [OUTCOME_TIMEOUT]:
+            breaker.record(outcome)
+        assert breaker.state == STATE_CLOSED
+        breaker.record(OUTCOME_TIMEOUT)
+        assert breaker.state == STATE_OPEN
+
+    def test_old_failures_leave_window(self):
+        """اختبار أن الأخطاء الأقدم من النافذة لا تُحسب"""
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(3):
+            breaker.record(OUTCOME_ERROR)
+        clock.now += 31
+        for _ in range(3):
+            breaker.record(OUTCOME_SUCCESS)
+        breaker.record(OUTCOME_ERROR)
+        assert breaker.state == STATE_CLOSED
+        assert breaker.get_status()["window_requests"] == 4
+
+    def test_half_open_probes(self):
+        """اختبار طلبات الاختبار: الفشل يعيد الفتح بمدة مضاعفة والنجاح يغلق الدائرة"""
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(4):
+            breaker.record(OUTCOME_TIMEOUT)
+        assert breaker.retry_after() == pytest.approx(10.0)
+
+        clock.now += 10
+        assert breaker.allow()
+        assert breaker.state == STATE_HALF_OPEN
+        # طلب اختبار واحد فقط في نفس الوقت
+        assert not breaker.allow()
+        breaker.record(OUTCOME_ERROR, probe=True)
+        assert breaker.state == STATE_OPEN
+        assert breaker.retry_after() == pytest.approx(20.0)
+
+        clock.now += 20
+        assert breaker.allow()
+        breaker.record(OUTCOME_SUCCESS, probe=True)
+        assert breaker.state == STATE_HALF_OPEN
+        assert breaker.allow()
+        breaker.record(OUTCOME_SUCCESS, probe=True)
+        assert breaker.state == STATE_CLOSED
+        assert breaker.get_status()["window_requests"] == 0
+
+        # بعد الإغلاق تعود مدة الفتح لقيمتها الأولى
+        for _ in range(4):
+            breaker.record(OUTCOME_ERROR)
+        assert breaker.retry_after() == pytest.approx(10.0)
+
+class TestConnectionPoolBreaker:
+    """اختبارات دمج القاطع في Connection Pool"""
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_fails_fast(self, monkeypatch):
+        """اختبار رفض الطلبات فوراً بدون حجز خانة عند فتح دائرة اللعبة فقط"""
+        config = ConnectionPoolConfig(circuit_breaker=CircuitBreakerConfig(min_requests=2))
+        pool = HighPerformanceConnectionPool(config)
+        sent = []
+
+        async def send_request(game_type, *args):
+            sent.append(game_type)
+            return {"success": False, "error": "Request timeout", "timed_out": True, "response_time": 30.0}
+        monkeypatch.setattr(pool, "_send_request", send_request)
+
+        for _ in range(2):
+            await pool.make_request(GameType.FREEFIRE, "https://api.example/1", method="GET")
+        result = await pool.make_request(GameType.FREEFIRE, "https://api.example/1", method="GET")
+        assert result["circuit_open"] and result["response_time"] == 0.0
+        assert len(sent) == 2
+
+        # الألعاب الأخرى غير متأثرة
+        await pool.make_request(GameType.JAWAKER, "https://api.example/2")
+        assert sent[-1] == GameType.JAWAKER
+
+        status = pool.get_stats()["circuit_breakers"]
+        assert status["freefire"]["state"] == STATE_OPEN
+        assert status["freefire"]["rejected"] == 1
+        assert status["jawaker"]["state"] == STATE_CLOSED
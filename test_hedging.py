@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات طلبات التحوط وإعادة المحاولة في Connection Pool
+"""
+
+import asyncio
+
+import pytest
+
+from connection_pool import ConnectionPoolConfig, GameType, HighPerformanceConnectionPool
+from hedging import HedgePolicy, HedgingConfig
+
+def make_pool(monkeypatch, responses, **overrides):
+    """
+    Connection Pool بطلبات وهمية
+
+    Args:
+        responses: لكل طلب مرسل (التأخير بالثواني، النتيجة) بالترتيب
+    """
+    settings = dict(default_delay=0.05, min_delay=0.01, retry_backoff=0.001)
+    settings.update(overrides)
+    pool = HighPerformanceConnectionPool(ConnectionPoolConfig(hedging=HedgingConfig(**settings)))
+    calls = {"sent": 0, "cancelled": 0}
+
+    async def send_request(*args):
+        delay, result = responses[calls["sent"]]
+        calls["sent"] += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            calls["cancelled"] += 1
+            raise
+        return dict(result, response_time=delay)
+    monkeypatch.setattr(pool, "_send_request", send_request)
+    return pool, calls
+
+class TestHedgePolicy:
+    """اختبارات HedgePolicy"""
+
+    def test_delay_from_observed_quantile(self):
+        """اختبار حساب تأخير التحوط من p90 بعد جمع عينات كافية"""
+        policy = HedgePolicy(HedgingConfig(min_samples=10, default_delay=1.0))
+        for value in range(1, 10):
+            policy.observe(value / 10)
+        assert policy.hedge_delay() == 1.0
+        policy.observe(1.0)
+        assert policy.hedge_delay() == pytest.approx(1.0)
+        for _ in range(90):
+            policy.observe(0.1)
+        assert policy.hedge_delay() == pytest.approx(0.1)
+
+    def test_budget_caps_extra_load(self):
+        """اختبار أن الطلبات الإضافية لا تتجاوز نسبة الميزانية بعد نفاد الرصيد الأولي"""
+        policy = HedgePolicy(HedgingConfig(budget_ratio=0.05, budget_burst=2))
+        spent = 0
+        for _ in range(1000):
+            policy.deposit()
+            spent += policy.try_spend()
+        assert spent <= 2 + 1000 * 0.05
+        assert policy.stats["budget_exhausted"] > 0
+
+class TestHedgedRequests:
+    """اختبارات make_request مع التحوط وإعادة المحاولة"""
+
+    @pytest.mark.asyncio
+    async def test_hedge_wins_and_loser_cancelled(self, monkeypatch):
+        """اختبار إرسال نسخة ثانية بعد زمن التحوط واعتماد أول رد وإلغاء الطلب الأبطأ"""
+        pool, calls = make_pool(monkeypatch, [
+            (1.0, {"success": True, "data": "slow"}),
+            (0.01, {"success": True, "data": "fast"}),
+        ])
+        result = await pool.make_request(GameType.FREEFIRE, "https://api.example/1", method="GET")
+        assert result["data"] == "fast" and result["attempts"] == 2
+        assert result["response_time"] < 0.5
+        await asyncio.sleep(0)
+        assert calls == {"sent": 2, "cancelled": 1}
+        status = pool.get_stats()["hedging"]["freefire"]
+        assert status["hedges"] == 1 and status["hedge_wins"] == 1
+
+    @pytest.mark.asyncio
+    async def test_retry_only_retryable_failures(self, monkeypatch):
+        """اختبار إعادة المحاولة بعد 503 وعدم إعادتها بعد المهلة أو لـ PUBG"""
+        pool, calls = make_pool(monkeypatch, [
+            (0, {"success": False, "error": "HTTP 503", "status_code": 503}),
+            (0, {"success": True, "data": "ok"}),
+            (0, {"success": False, "error": "Request timeout", "timed_out": True}),
+            (0, {"success": False, "error": "HTTP 503", "status_code": 503}),
+        ])
+        result = await pool.make_request(GameType.JAWAKER, "https://api.example/2")
+        assert result["data"] == "ok" and result["attempts"] == 2
+        result = await pool.make_request(GameType.JAWAKER, "https://api.example/2")
+        assert result["timed_out"] and calls["sent"] == 3
+        # PUBG غير مفعلة افتراضياً - محاولة واحدة فقط
+        result = await pool.make_request(GameType.PUBG, "https://api.example/3")
+        assert result["status_code"] == 503 and calls["sent"] == 4
+        assert pool.get_stats()["hedging"]["jawaker"]["retries"] == 1
+
+    @pytest.mark.asyncio
+    async def test_retry_connection_errors_only(self, monkeypatch):
+        """اختبار إعادة المحاولة بعد خطأ اتصال فقط وليس بعد أخطاء أخرى بدون status (مثل JSON غير صالح)"""
+        pool, calls = make_pool(monkeypatch, [
+            (0, {"success": False, "error": "Cannot connect to host", "connection_error": True}),
+            (0, {"success": True, "data": "ok"}),
+            (0, {"success": False, "error": "Attempt to decode JSON with unexpected mimetype: text/html"}),
+        ])
+        result = await pool.make_request(GameType.JAWAKER, "https://api.example/5")
+        assert result["data"] == "ok" and result["attempts"] == 2
+        result = await pool.make_request(GameType.JAWAKER, "https://api.example/5")
+        assert not result["success"] and result["attempts"] == 1 and calls["sent"] == 3
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_without_budget(self, monkeypatch):
+        """اختبار عدم إرسال طلب التحوط بعد نفاد الميزانية"""
+        pool, calls = make_pool(monkeypatch, [(0.1, {"success": True, "data": "slow"})],
+                                budget_burst=0.5, budget_ratio=0.01)
+        result = await pool.make_request(GameType.BIGOLIVE, "https://api.example/4")
+        assert result["data"] == "slow" and result["attempts"] == 1
+        assert calls["sent"] == 1
+        assert pool.get_stats()["hedging"]["bigolive"]["budget_exhausted"] == 1
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات الذاكرة المؤقتة لنتائج البحث
+"""
+
+import pytest
+
+from lookup_cache import LookupCache
+
+class TestLookupCache:
+    """اختبارات LookupCache"""
+
+    def test_hit_and_miss(self):
+        """اختبار الإصابة والإخفاق"""
+        cache = LookupCache(max_entries=10)
+        assert cache.get("pubg", "1") == (False, None)
+
+        cache.set("pubg", "1", "Player")
+        assert cache.get("pubg", "1") == (True, "Player")
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_negative_caching(self):
+        """اختبار تخزين نتائج "غير موجود" بمدة منفصلة"""
+        cache = LookupCache(max_entries=10, not_found_ttl=60)
+        cache.set("freefire", "404", None)
+        assert cache.get("freefire", "404") == (True, None)
+        assert cache.get_stats()["negative_hits"] == 1
+
+        disabled = LookupCache(max_entries=10, not_found_ttl=0)
+        disabled.set("freefire", "404", None)
+        assert disabled.get("freefire", "404") == (False, None)
+
+    def test_expiry(self, monkeypatch):
+        """اختبار انتهاء الصلاحية"""
+        now = [1000.0]
+        monkeypatch.setattr("lookup_cache.time.monotonic", lambda: now[0])
+
+        cache = LookupCache(max_entries=10, found_ttl=5)
+        cache.set("jawaker", "7", "Name")
+        now[0] += 4
+        assert cache.get("jawaker", "7") == (True, "Name")
+        now[0] += 2
+        assert cache.get("jawaker", "7") == (False, None)
+        assert cache.get_stats()["expired"] == 1
+
+    def test_lru_eviction(self):
+        """اختبار إخلاء الأقدم استخداماً"""
+        cache = LookupCache(max_entries=2, eviction_policy="lru")
+        cache.set("pubg", "a", "A")
+        cache.set("pubg", "b", "B")
+        cache.get("pubg", "a")
+        cache.set("pubg", "c", "C")
+
+        assert cache.get("pubg", "b") == (False, None)
+        assert cache.get("pubg", "a") == (True, "A")
+        assert len(cache) == 2
+
+    def test_lfu_eviction(self):
+        """اختبار إخلاء الأقل استخداماً"""
+        cache = LookupCache(max_entries=2, eviction_policy="lfu")
+        cache.set("pubg", "a", "A")
+        cache.set("pubg", "b", "B")
+        cache.get("pubg", "a")
+        cache.get("pubg", "a")
+        cache.get("pubg", "b")
+        cache.set("pubg", "c", "C")
+
+        assert cache.get("pubg", "b") == (False, None)
+        assert cache.get("pubg", "a") == (True, "A")
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_invalid_policy(self):
+        """اختبار سياسة إخلاء غير مدعومة"""
+        with pytest.raises(ValueError):
+            LookupCache(eviction_policy="fifo")
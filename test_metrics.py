@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات مقاييس Prometheus
+"""
+
+import pytest
+
+from metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+class TestMetrics:
+    """اختبارات Counter و Gauge و Histogram وصيغة العرض"""
+
+    def test_histogram_renders_cumulative_buckets(self):
+        """اختبار تراكم الـ buckets و sum و count لكل مجموعة labels"""
+        registry = MetricsRegistry()
+        histogram = Histogram("lookup_seconds", "زمن البحث", ["game", "outcome"],
+                              buckets=(0.1, 1.0), registry=registry)
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.labels("pubg", "found").observe(value)
+        histogram.labels("jawaker", "error").observe(2)
+
+        lines = registry.render().splitlines()
+        assert lines[:2] == ["# HELP lookup_seconds زمن البحث", "# TYPE lookup_seconds histogram"]
+        assert 'lookup_seconds_bucket{game="pubg",outcome="found",le="0.1"} 2' in lines
+        assert 'lookup_seconds_bucket{game="pubg",outcome="found",le="1"} 3' in lines
+        assert 'lookup_seconds_bucket{game="pubg",outcome="found",le="+Inf"} 4' in lines
+        assert 'lookup_seconds_sum{game="pubg",outcome="found"} 3.65' in lines
+        assert 'lookup_seconds_count{game="jawaker",outcome="error"} 1' in lines
+
+    def test_counters_and_collected_gauges(self):
+        """اختبار العدادات والمقاييس المحسوبة عند القراءة وتكرار التسجيل"""
+        registry = MetricsRegistry()
+        counter = Counter("requests_total", "الطلبات", ["result"], registry=registry)
+        counter.labels("hit").inc()
+        counter.labels("hit").inc(2)
+        states = {("ready",): 2, ("busy",): 1}
+        gauge = Gauge("browsers", "المتصفحات", ["state"], registry=registry)
+        gauge.set_function(lambda: states)
+
+        output = registry.render()
+        assert 'requests_total{result="hit"} 3' in output
+        assert 'browsers{state="ready"} 2' in output
+
+        states = {("ready",): 0}
+        gauge.set_function(lambda: states)
+        output = registry.render()
+        assert 'browsers{state="ready"} 0' in output and 'state="busy"' not in output
+
+        with pytest.raises(ValueError):
+            Counter("requests_total", "مكرر", registry=registry)
+        with pytest.raises(ValueError):
+            counter.labels("a", "b")
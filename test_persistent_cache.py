@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات الذاكرة الدائمة (SQLite) لنتائج البحث
+"""
+
+import pytest
+
+from persistent_cache import PersistentLookupCache
+
+class TestPersistentLookupCache:
+    """اختبارات PersistentLookupCache"""
+
+    @pytest.mark.asyncio
+    async def test_survives_restart(self, tmp_path):
+        """اختبار بقاء النتائج بعد إغلاق وإعادة فتح القاعدة"""
+        path = str(tmp_path / "cache" / "lookups.db")
+
+        cache = PersistentLookupCache(path, found_ttl=60, not_found_ttl=30)
+        await cache.start()
+        cache.put("pubg", "1", "Player One")
+        cache.put("freefire", "2", None)
+        # قبل الكتابة للقاعدة تُقرأ النتائج من قائمة الانتظار
+        assert (await cache.get("pubg", "1"))[:2] == (True, "Player One")
+        await cache.close()
+        assert cache.get_stats()["writes"] == 2
+
+        reopened = PersistentLookupCache(path, found_ttl=60, not_found_ttl=30)
+        hit, name, remaining = await reopened.get("pubg", "1")
+        assert hit and name == "Player One"
+        assert 0 < remaining <= 60
+        assert (await reopened.get("freefire", "2"))[:2] == (True, None)
+        assert (await reopened.get("jawaker", "3"))[:2] == (False, None)
+        await reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_compaction_and_warm_load(self, tmp_path, monkeypatch):
+        """اختبار حذف المنتهي وتحميل أحدث النتائج الصالحة"""
+        now = [1_000_000.0]
+        monkeypatch.setattr("persistent_cache.time.time", lambda: now[0])
+        path = str(tmp_path / "lookups.db")
+
+        cache = PersistentLookupCache(path, found_ttl=100, not_found_ttl=10)
+        cache.put("pubg", "old", None)
+        now[0] += 1
+        cache.put("pubg", "new", "New Player")
+        await cache.flush()
+
+        now[0] += 50
+        await cache.compact()
+        assert cache.stats["compacted"] == 1
+
+        warmed = await cache.load_recent(10)
+        assert [(game, player_id, name) for game, player_id, name, _ in warmed] == [("pubg", "new", "New Player")]
+        assert warmed[0][3] == pytest.approx(50)
+        await cache.close()
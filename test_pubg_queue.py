@@ -0,0 +1,987 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات قائمة طلبات PUBG بدون متصفحات حقيقية
+"""
+
+import asyncio
+import re
+import time
+import pytest
+
+from pubg_player import (AutoscaleConfig, BrowserAutoscaler, BrowserInstance, BrowserManager, BrowserRecycler,
+                         BrowserState, MidasBuySession, PlayerRequest, PubgHttpFastPath, RecycleConfig,
+                         RequestQueue, SuperFastFilter, parse_midasbuy_verify_response)
+from single_flight import SingleFlight
+
+class FakeBrowserManager:
+    """مدير متصفحات وهمي بعدد محدود من المتصفحات يسجل الطلبات ويرجع اسماً ثابتاً"""
+
+    def __init__(self, delay: float = 0.05, browser_count: int = 3):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._idle = asyncio.Queue()
+        for i in range(browser_count):
+            self._idle.put_nowait(BrowserInstance(id=f"fake_{i+1}", state=BrowserState.READY))
+
+    async def wait_for_available_browser(self):
+        browser = await self._idle.get()
+        browser.state = BrowserState.BUSY
+        return browser
+
+    def release_unused_browser(self, browser):
+        browser.state = BrowserState.READY
+        self._idle.put_nowait(browser)
+
+    async def process_request(self, player_id, request_id=None, callback=None, browser=None, deadline=None):
+        if browser is None:
+            browser = await self.wait_for_available_browser()
+        self.calls.append(player_id)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+            browser.state = BrowserState.READY
+            self._idle.put_nowait(browser)
+        return {'success': True, 'player_id': player_id, 'player_name': f"name-{player_id}",
+                'request_id': request_id, 'browser_id': browser.id}
+
+async def start_queue(manager: FakeBrowserManager) -> RequestQueue:
+    """إنشاء وتشغيل قائمة طلبات فوق المدير الوهمي"""
+    queue = RequestQueue(manager)
+    await queue.start()
+    return queue
+
+class TestRequestQueue:
+    """اختبارات RequestQueue"""
+
+    @pytest.mark.asyncio
+    async def test_submit_request(self):
+        """اختبار معالجة طلب واحد"""
+        manager = FakeBrowserManager()
+        queue = await start_queue(manager)
+        try:
+            result = await queue.submit_request("123")
+            assert result['success']
+            assert result['player_name'] == "name-123"
+            assert manager.calls == ["123"]
+        finally:
+            await queue.stop()
+
+    @pytest.mark.asyncio
+    async def test_identical_requests_are_coalesced(self):
+        """اختبار دمج طلبات نفس اللاعب الجارية على عملية متصفح واحدة"""
+        manager = FakeBrowserManager()
+        queue = await start_queue(manager)
+        try:
+            results = await asyncio.gather(*[queue.submit_request("555") for _ in range(10)],
+                                           queue.submit_request("666"))
+
+            assert all(result['success'] for result in results)
+            assert sorted(manager.calls) == ["555", "666"]
+            assert queue.get_queue_status()['coalesced_requests'] == 9
+        finally:
+            await queue.stop()
+
+    @pytest.mark.asyncio
+    async def test_dispatcher_bounded_by_browsers(self):
+        """اختبار أن عدد الطلبات الجارية لا يتجاوز عدد المتصفحات"""
+        manager = FakeBrowserManager(delay=0.02, browser_count=2)
+        queue = await start_queue(manager)
+        try:
+            results = await asyncio.gather(*[queue.submit_request(str(i)) for i in range(8)])
+            assert all(result['success'] for result in results)
+            assert manager.max_active == 2
+            # الطلبات تُوزع بترتيب وصولها
+            assert manager.calls == [str(i) for i in range(8)]
+        finally:
+            await queue.stop()
+
+class TestBrowserCheckout:
+    """اختبارات حجز المتصفحات بدون polling"""
+
+    def make_manager(self, count: int) -> BrowserManager:
+        manager = BrowserManager(browser_count=count, headless=True)
+        manager.browsers = [BrowserInstance(id=f"browser_{i+1}") for i in range(count)]
+        return manager
+
+    @pytest.mark.asyncio
+    async def test_waiters_served_in_fifo_order(self):
+        """اختبار خدمة المنتظرين بترتيب وصولهم فور جاهزية متصفح"""
+        manager = self.make_manager(1)
+        browser = manager.browsers[0]
+        order = []
+
+        async def waiter(name):
+            claimed = await manager.wait_for_available_browser()
+            order.append(name)
+            await asyncio.sleep(0)
+            claimed.state = BrowserState.READY
+            manager._release_browser(claimed)
+
+        tasks = []
+        for name in ["a", "b", "c"]:
+            tasks.append(asyncio.create_task(waiter(name)))
+            await asyncio.sleep(0)
+
+        browser.state = BrowserState.READY
+        manager._release_browser(browser)
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=1)
+
+        assert order == ["a", "b", "c"]
+
+    @pytest.mark.asyncio
+    async def test_stale_and_closed_checkout(self):
+        """اختبار تجاهل المتصفحات التي تغيرت حالتها وإيقاظ المنتظرين عند الإغلاق"""
+        manager = self.make_manager(2)
+        stale, fresh = manager.browsers
+        stale.state = BrowserState.READY
+        fresh.state = BrowserState.READY
+        manager._release_browser(stale)
+        manager._release_browser(fresh)
+        stale.state = BrowserState.ERROR
+
+        claimed = await manager.get_available_browser()
+        assert claimed is fresh
+        assert claimed.state == BrowserState.BUSY
+        assert await manager.get_available_browser() is None
+
+        waiters = [asyncio.create_task(manager.wait_for_available_browser()) for _ in range(2)]
+        await asyncio.sleep(0)
+        await manager.cleanup()
+        assert await asyncio.wait_for(asyncio.gather(*waiters), timeout=1) == [None, None]
+
+class TestBrowserLayout:
+    """اختبارات توزيع الخانات على عمليات Chromium"""
+
+    def test_slots_grouped_per_browser(self):
+        """اختبار توزيع الخانات على العمليات المشتركة حسب النسبة"""
+        manager = BrowserManager(browser_count=7, headless=True, contexts_per_browser=3)
+        manager.browsers = [BrowserInstance(id=f"browser_{i+1}") for i in range(7)]
+        assert [manager._browser_group(browser) for browser in manager.browsers] == [0, 0, 0, 1, 1, 1, 2]
+
+        dedicated = BrowserManager(browser_count=2, headless=True)
+        dedicated.browsers = [BrowserInstance(id=f"browser_{i+1}") for i in range(2)]
+        assert [dedicated._browser_group(browser) for browser in dedicated.browsers] == [0, 1]
+
+class ScalingBrowserManager:
+    """مدير وهمي يضيف ويزيل خانات بدون متصفحات حقيقية"""
+
+    def __init__(self, count: int):
+        self.browsers = [BrowserInstance(id=f"browser_{i+1}", state=BrowserState.READY) for i in range(count)]
+        self.idle = True
+
+    async def add_browser(self):
+        browser = BrowserInstance(id=f"browser_{len(self.browsers)+1}", state=BrowserState.READY)
+        self.browsers.append(browser)
+        return browser
+
+    async def remove_idle_browser(self, idle_for: float = 0):
+        if not self.idle:
+            return None
+        return self.browsers.pop()
+
+class TestBrowserAutoscaler:
+    """اختبارات التوسع التلقائي"""
+
+    def make(self, count: int, **config):
+        manager = ScalingBrowserManager(count)
+        queue = RequestQueue(manager)
+        scaler = BrowserAutoscaler(manager, queue, AutoscaleConfig(
+            min_browsers=config.pop('min_browsers', 1),
+            max_browsers=config.pop('max_browsers', 3),
+            scale_up_queue_depth=2,
+            scale_up_wait_p95=5.0,
+            scale_up_cooldown=0,
+            scale_down_cooldown=0,
+            **config
+        ))
+        return manager, queue, scaler
+
+    @pytest.mark.asyncio
+    async def test_scale_up_on_queue_depth_until_max(self):
+        """اختبار التوسع عند امتلاء قائمة الانتظار حتى الحد الأقصى"""
+        manager, queue, scaler = self.make(1)
+        for i in range(3):
+            queue._push(PlayerRequest(id=str(i), player_id=str(i), timestamp=time.time()))
+
+        assert await scaler.evaluate() == 'scale_up'
+        assert await scaler.evaluate() == 'scale_up'
+        assert await scaler.evaluate() is None
+        assert len(manager.browsers) == 3
+        assert scaler.get_status()['scale_ups'] == 2
+        assert scaler.get_status()['recent_events'][0]['from'] == 1
+
+    @pytest.mark.asyncio
+    async def test_scale_up_on_wait_p95(self):
+        """اختبار التوسع عند ارتفاع p95 لمدة الانتظار"""
+        manager, queue, scaler = self.make(1)
+        for wait in [0.1] * 10 + [8.0] * 2:
+            queue._wait_samples.append((time.time(), wait))
+
+        assert queue.get_wait_percentile(95) == 8.0
+        assert await scaler.evaluate() == 'scale_up'
+
+    @pytest.mark.asyncio
+    async def test_scale_down_respects_min_and_cooldown(self):
+        """اختبار التقليص حتى الحد الأدنى فقط وبعد فترة التهدئة"""
+        manager, queue, scaler = self.make(3, min_browsers=2)
+        assert await scaler.evaluate() == 'scale_down'
+        assert await scaler.evaluate() is None
+        assert len(manager.browsers) == 2
+
+        manager, queue, scaler = self.make(3, min_browsers=1)
+        scaler.config.scale_down_cooldown = 3600
+        scaler._last_change = time.monotonic()
+        assert await scaler.evaluate() is None
+
+    @pytest.mark.asyncio
+    async def test_remove_idle_browser(self):
+        """اختبار إزالة خانة متاحة فقط من مدير المتصفحات"""
+        manager = BrowserManager(browser_count=2, headless=True)
+        idle = BrowserInstance(id="browser_1", state=BrowserState.READY, last_used=time.time())
+        busy = BrowserInstance(id="browser_2", state=BrowserState.BUSY)
+        manager.browsers = [idle, busy]
+        manager._release_browser(idle)
+
+        assert await manager.remove_idle_browser(idle_for=3600) is None
+        assert await manager.remove_idle_browser() is idle
+        assert manager.browsers == [busy]
+        assert idle.state == BrowserState.CLOSED
+        assert await manager.get_available_browser() is None
+
+    @pytest.mark.asyncio
+    async def test_idle_checkout_lifo_leaves_surplus_cold(self):
+        """اختبار تسليم آخر متصفح عاد أولاً فتبقى الخانة الزائدة خاملة حتى تُزال"""
+        manager = BrowserManager(browser_count=2, headless=True)
+        now = time.time()
+        cold = BrowserInstance(id="browser_1", state=BrowserState.READY, last_used=now - 600)
+        warm = BrowserInstance(id="browser_2", state=BrowserState.READY, last_used=now - 600)
+        manager.browsers = [cold, warm]
+        manager._release_browser(cold)
+        manager._release_browser(warm)
+
+        # حمل متتابع بطلب واحد في كل مرة يستخدم نفس الخانة دائماً
+        for _ in range(3):
+            browser = await manager.get_available_browser()
+            assert browser is warm
+            browser.last_used = time.time()
+            manager.release_unused_browser(browser)
+
+        assert await manager.remove_idle_browser(idle_for=300) is cold
+        assert manager.browsers == [warm]
+
+class EmptyPage:
+    """صفحة وهمية لا يظهر فيها الاسم أبداً"""
+
+    async def query_selector(self, selector):
+        return None
+
+    async def wait_for_selector(self, selector, **kwargs):
+        await asyncio.sleep(kwargs["timeout"] / 1000)
+        raise asyncio.TimeoutError()
+
+class LateNamePage(EmptyPage):
+    """صفحة وهمية يظهر فيها الاسم بعد تأخير بدون استجابة تحقق"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.selector_waits = 0
+
+    async def wait_for_selector(self, selector, **kwargs):
+        self.selector_waits += 1
+        await asyncio.sleep(self.delay)
+        self.shown = True
+
+    async def query_selector(self, selector):
+        return FakeElement("Page Player") if getattr(self, "shown", False) else None
+
+class TestVerifyResponse:
+    """اختبارات استخراج الاسم من استجابة التحقق"""
+
+    def test_parse_response(self):
+        """اختبار تحليل JSON استجابة التحقق"""
+        assert parse_midasbuy_verify_response({'ret': 0, 'data': {'charac_name': ' Player '}}) == {'found': True, 'player_name': 'Player'}
+        assert parse_midasbuy_verify_response({'ret': 1001, 'msg': 'role not exist'}) == {'found': False}
+        # أخطاء الجلسة ليست "غير موجود" - لا يجب تخزينها كنتيجة سلبية
+        assert parse_midasbuy_verify_response({'ret': 1018, 'msg': 'token expired'}) is None
+        assert parse_midasbuy_verify_response({'ret': 429, 'msg': 'too many requests'}) is None
+        assert parse_midasbuy_verify_response({'ret': 0, 'data': {}}) is None
+        assert parse_midasbuy_verify_response([]) is None
+
+    @pytest.mark.asyncio
+    async def test_result_available_when_response_arrives(self):
+        """اختبار إرجاع الاسم أو عدم الوجود فور وصول الاستجابة بدون انتظار المهلة"""
+        manager = BrowserManager(browser_count=1, headless=True)
+        browser = BrowserInstance(id="browser_1", page=EmptyPage(), last_used=time.time())
+        loop = asyncio.get_running_loop()
+
+        for result, expected in [({'found': True, 'player_name': 'Player'}, 'Player'), ({'found': False}, None)]:
+            verify_response = loop.create_future()
+            loop.call_later(0.02, verify_response.set_result, result)
+            started = time.monotonic()
+            name = await manager._extract_player_name_smart(browser, "1", "req", verify_response=verify_response)
+            assert name == expected
+            assert time.monotonic() - started < 0.5
+
+        assert manager.extraction_stats['response'] == 1
+        assert manager.extraction_stats['response_not_found'] == 1
+
+    @pytest.mark.asyncio
+    async def test_xpath_fallback_without_response(self):
+        """اختبار قراءة الاسم من الصفحة بانتظار واحد عند عدم وصول استجابة التحقق"""
+        manager = BrowserManager(browser_count=1, headless=True)
+        page = LateNamePage(delay=0.05)
+        browser = BrowserInstance(id="browser_1", page=page, last_used=time.time())
+        verify_response = asyncio.get_running_loop().create_future()
+
+        started = time.monotonic()
+        name = await manager._extract_player_name_smart(browser, "1", "req", verify_response=verify_response)
+        assert name == "Page Player"
+        assert time.monotonic() - started < 0.5
+        assert page.selector_waits == 1 and manager.extraction_stats['xpath'] == 1
+
+class FakeConnectionPool:
+    """Connection Pool وهمي يرجع استجابات محددة مسبقاً"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def make_request(self, **kwargs):
+        self.requests.append(kwargs)
+        return self.responses.pop(0)
+
+class TestHttpFastPath:
+    """اختبارات المسار السريع عبر HTTP"""
+
+    def make_session(self, **overrides):
+        fields = dict(
+            url="https://www.midasbuy.com/interface/getCharac?openid=111&ts=1", method="POST",
+            headers={'content-type': 'application/json'}, cookies={'select_country': 'us'},
+            post_data='{"openid": "111"}', player_id="111", harvested_at=time.time()
+        )
+        fields.update(overrides)
+        return MidasBuySession(**fields)
+
+    def test_build_request_replaces_player_id(self):
+        """اختبار استبدال معرف اللاعب في الرابط والـ body"""
+        request = self.make_session().build_request("222")
+        assert request['url'] == "https://www.midasbuy.com/interface/getCharac?openid=222&ts=1"
+        assert request['data'] == '{"openid": "222"}'
+        assert self.make_session(url="https://www.midasbuy.com/x", post_data=None).build_request("222") is None
+
+    @pytest.mark.asyncio
+    async def test_lookup_and_fallback(self, monkeypatch):
+        """اختبار البحث عبر HTTP والرجوع للمتصفحات عند الفشل"""
+        pool = FakeConnectionPool([
+            {'success': True, 'data': {'ret': 0, 'data': {'charac_name': 'Player'}}},
+            {'success': True, 'data': {'ret': 1001}},
+            {'success': False, 'error': 'HTTP 403'},
+            {'success': True, 'data': {'ret': 0}},
+        ])
+
+        async def get_pool():
+            return pool
+        monkeypatch.setattr("pubg_player.get_connection_pool", get_pool)
+
+        manager = FakeBrowserManager()
+        manager.session = self.make_session()
+        fast_path = PubgHttpFastPath(manager, RequestQueue(manager), max_failures=2)
+
+        assert (await fast_path.lookup("222"))['player_name'] == 'Player'
+        assert (await fast_path.lookup("333"))['not_found'] is True
+        assert await fast_path.lookup("444") is None
+        assert await fast_path.lookup("555") is None
+        # إخفاقان متتاليان يلغيان الجلسة
+        assert manager.session is None
+        assert await fast_path.lookup("666") is None
+        assert len(pool.requests) == 4
+        assert pool.requests[0]['url'].endswith("openid=222&ts=1")
+
+    @pytest.mark.asyncio
+    async def test_expired_token_falls_back(self, monkeypatch):
+        """اختبار أن رد توكن منتهٍ (HTTP 200 مع رمز خطأ) يرجع للمتصفحات ويلغي الجلسة بدلاً من نتيجة غير موجود"""
+        pool = FakeConnectionPool([{'success': True, 'data': {'ret': 1018, 'msg': 'token expired'}}] * 2)
+
+        async def get_pool():
+            return pool
+        monkeypatch.setattr("pubg_player.get_connection_pool", get_pool)
+
+        manager = FakeBrowserManager()
+        manager.session = self.make_session()
+        fast_path = PubgHttpFastPath(manager, RequestQueue(manager), max_failures=2)
+
+        assert await fast_path.lookup("222") is None
+        assert await fast_path.lookup("333") is None
+        assert manager.session is None
+        assert fast_path.stats['not_found'] == 0 and fast_path.stats['invalidated'] == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_harvest_backs_off(self):
+        """اختبار مضاعفة فترة التجديد بعد كل تجديد فاشل وإعادتها بعد النجاح"""
+        manager = FakeBrowserManager()
+        manager.session = None
+        session = self.make_session()
+
+        class HarvestQueue:
+            harvest = False
+
+            async def submit_request(self, player_id):
+                if self.harvest:
+                    manager.session = session
+
+        queue = HarvestQueue()
+        fast_path = PubgHttpFastPath(manager, queue, check_interval=30, max_backoff=100)
+        for expected in (60, 100, 100):
+            await fast_path.refresh()
+            assert fast_path.next_check_delay() == expected
+        assert fast_path.stats['failed_refreshes'] == 3
+
+        queue.harvest = True
+        await fast_path.refresh()
+        assert fast_path.next_check_delay() == 30
+
+    def test_expired_session_not_used(self):
+        """اختبار تجاهل الجلسة المنتهية"""
+        manager = FakeBrowserManager()
+        manager.session = self.make_session(harvested_at=time.time() - 3600)
+        fast_path = PubgHttpFastPath(manager, RequestQueue(manager), max_age=600)
+        assert not fast_path.is_ready()
+
+class ResultPage:
+    """صفحة وهمية تعرض اسم البحث السابق حتى يتم تفريغه"""
+
+    def __init__(self, has_input: bool = True):
+        self.name = "Old Player"
+        self.input_value = "111"
+        self.has_input = has_input
+
+    async def query_selector(self, selector):
+        if selector.startswith("xpath="):
+            return FakeElement(self.name) if self.name else None
+        return FakeElement(self.input_value, self) if self.has_input else None
+
+    async def evaluate(self, script, arg=None):
+        self.name = ""
+
+class FakeElement:
+    def __init__(self, text, page=None):
+        self.text = text
+        self.page = page
+
+    async def text_content(self):
+        return self.text
+
+    async def fill(self, value):
+        self.page.input_value = value
+
+class TestSoftReset:
+    """اختبارات إعادة التجهيز السريعة بين عمليات البحث"""
+
+    def test_full_reset_policy(self):
+        """اختبار اختيار إعادة التحميل الكاملة كل N بحث أو بعد خطأ"""
+        manager = BrowserManager(browser_count=1, headless=True, reset_mode="soft", full_reset_every=3)
+        browser = BrowserInstance(id="browser_1", lookups_since_reload=1)
+
+        assert not manager._needs_full_reset(browser, {'success': True, 'player_name': 'P'})
+        assert not manager._needs_full_reset(browser, {'success': False, 'not_found': True})
+        assert manager._needs_full_reset(browser, {'success': False, 'error': 'timeout'})
+        browser.lookups_since_reload = 3
+        assert manager._needs_full_reset(browser, {'success': True, 'player_name': 'P'})
+        assert BrowserManager(browser_count=1, headless=True, reset_mode="full")._needs_full_reset(
+            BrowserInstance(id="browser_2"), None)
+
+    @pytest.mark.asyncio
+    async def test_soft_reset_clears_page_in_place(self):
+        """اختبار تفريغ الحقل والنتيجة وإعادة المتصفح للاستخدام فوراً"""
+        manager = BrowserManager(browser_count=1, headless=True, reset_mode="soft")
+        page = ResultPage()
+        browser = BrowserInstance(id="browser_1", page=page, state=BrowserState.BUSY, lookups_since_reload=1)
+        manager.browsers = [browser]
+
+        await manager._reset_browser_immediate(browser, {'success': True, 'player_name': 'Old Player'})
+
+        assert page.input_value == "" and page.name == ""
+        assert manager.reset_stats['soft'] == 1
+        assert await manager.get_available_browser() is browser
+
+class FakeContext:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+class OpenPage:
+    def is_closed(self):
+        return False
+
+class TestStandbyContexts:
+    """اختبارات context الاحتياطي الجاهز"""
+
+    @pytest.mark.asyncio
+    async def test_swap_to_standby_instead_of_reload(self):
+        """اختبار تبديل الـ context المستخدم بالاحتياطي فوراً عند الحاجة لإعادة تجهيز كاملة"""
+        manager = BrowserManager(browser_count=1, headless=True, reset_mode="full", standby_contexts=False)
+        used_context, standby_context, standby_page = FakeContext(), FakeContext(), OpenPage()
+        browser = BrowserInstance(id="browser_1", context=used_context, page=OpenPage(), state=BrowserState.BUSY,
+                                  standby_context=standby_context, standby_page=standby_page, lookups_since_reload=4)
+        manager.browsers = [browser]
+
+        await manager._reset_browser_immediate(browser, {'success': True, 'player_name': 'Player'})
+
+        assert browser.context is standby_context and browser.page is standby_page
+        assert browser.standby_page is None and browser.lookups_since_reload == 0
+        assert used_context.closed and not standby_context.closed
+        assert manager.reset_stats['standby_swaps'] == 1
+        assert await manager.get_available_browser() is browser
+
+    @pytest.mark.asyncio
+    async def test_standby_discarded_after_slot_rebuild(self):
+        """اختبار إغلاق الـ context الاحتياطي إذا أُعيد بناء الخانة أثناء تجهيزه"""
+        manager = BrowserManager(browser_count=1, headless=True, standby_contexts=True)
+        browser = BrowserInstance(id="browser_1", page=OpenPage(), state=BrowserState.READY)
+        manager.browsers = [browser]
+        old_context = FakeContext()
+        scheduled = []
+
+        async def open_page(browser_instance):
+            return old_context, OpenPage()
+
+        async def load_page(context, page):
+            browser.generation += 1  # تدوير الخانة أثناء التحميل
+
+        manager._open_page = open_page
+        manager._load_page = load_page
+        manager._schedule_standby = scheduled.append
+        browser.standby_building = True
+        await manager._build_standby(browser)
+
+        assert old_context.closed
+        assert browser.standby_context is None and browser.standby_page is None
+        assert not browser.standby_building and scheduled == [browser]
+
+def matches_blocked_urls(url: str, patterns) -> bool:
+    """مطابقة رابط مع أنماط Network.setBlockedURLs (* فقط هو الرمز الخاص)"""
+    return any(re.fullmatch(re.escape(pattern).replace(r"\*", ".*"), url) for pattern in patterns)
+
+class FakeCdpSession:
+    """جلسة CDP وهمية تسجل الأوامر وتستدعي معالجات الأحداث يدوياً"""
+
+    def __init__(self):
+        self.sent = {}
+        self.handlers = {}
+
+    async def send(self, method, params=None):
+        self.sent.setdefault(method, []).append(params)
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def emit(self, event, params):
+        self.handlers[event](params)
+
+class TestCdpBlocking:
+    """اختبارات تحويل فلتر المحتوى إلى أنماط حجب Chromium"""
+
+    def test_patterns_match_python_filter(self):
+        """اختبار تطابق أنماط CDP مع قرارات should_block للروابط"""
+        content_filter = SuperFastFilter()
+        patterns = content_filter.blocked_url_patterns()
+        urls = [
+            "https://www.midasbuy.com/midasbuy/us/redeem/pubgm",
+            "https://www.midasbuy.com/interface/getCharac?openid=1",
+            "https://static.midasbuy.com/app.js",
+            "https://www.google-analytics.com/collect?v=1",
+            "https://cdn.midasbuy.com/banner.png",
+            "https://cdn.midasbuy.com/banner.webp?x=1",
+            "https://cdn.midasbuy.com/fonts/font.woff2",
+            "https://example.com/tracking/pixel",
+        ]
+        for url in urls:
+            assert matches_blocked_urls(url, patterns) == content_filter.should_block(url), url
+
+    def test_stats_from_cdp_events(self):
+        """اختبار تقدير الإحصائيات من أحداث CDP"""
+        content_filter = SuperFastFilter()
+        for _ in range(3):
+            content_filter.record_cdp_request()
+        content_filter.record_cdp_blocked('Image')
+        content_filter.record_cdp_blocked('Script')
+        assert content_filter.stats == {'blocked': 2, 'allowed': 1, 'blocked_media': 1, 'blocked_tracking': 1}
+
+    @pytest.mark.asyncio
+    async def test_resource_types_blocked_via_fetch_once(self):
+        """اختبار حجب أنواع الموارد عبر Fetch وحساب الطلب المحجوب مرة واحدة فقط"""
+        manager = BrowserManager(browser_count=1, headless=True)
+        cdp = FakeCdpSession()
+
+        class Context:
+            async def new_cdp_session(self, page):
+                return cdp
+
+        assert await manager._enable_cdp_blocking(Context(), None)
+        fetch_patterns = cdp.sent["Fetch.enable"][0]["patterns"]
+        assert sorted(pattern["resourceType"] for pattern in fetch_patterns) == ["Font", "Image", "Media", "Other"]
+
+        cdp.emit("Network.requestWillBeSent", {"requestId": "n1"})
+        cdp.emit("Network.requestWillBeSent", {"requestId": "n2"})
+        cdp.emit("Fetch.requestPaused", {"requestId": "f1", "networkId": "n1", "resourceType": "Image"})
+        cdp.emit("Network.loadingFailed", {"requestId": "n1", "type": "Image", "blockedReason": "inspector"})
+        await asyncio.sleep(0)
+        assert cdp.sent["Fetch.failRequest"] == [{"requestId": "f1", "errorReason": "BlockedByClient"}]
+        assert manager.filter.stats == {'blocked': 1, 'allowed': 1, 'blocked_media': 1, 'blocked_tracking': 0}
+
+    @pytest.mark.asyncio
+    async def test_static_asset_not_recounted_with_cdp(self):
+        """اختبار أن ملفات JS/CSS التي حسبها CDP لا تُحسب مرة أخرى عند خدمتها من الذاكرة"""
+        manager = BrowserManager(browser_count=1, headless=True)
+
+        class Cache:
+            async def get(self, url):
+                return b"js", {}
+
+        class Route:
+            request = type("Request", (), {"url": "https://www.midasbuy.com/app.js", "resource_type": "script", "method": "GET"})()
+            fulfilled = False
+
+            async def fulfill(self, **kwargs):
+                self.fulfilled = True
+
+        manager.asset_cache = Cache()
+        route = Route()
+        await manager._serve_static_asset(route, cdp_blocking=True)
+        assert route.fulfilled and manager.filter.stats['allowed'] == 0
+        await manager._serve_static_asset(Route(), cdp_blocking=False)
+        assert manager.filter.stats['allowed'] == 1
+
+class TestBrowserRecycler:
+    """اختبارات إعادة تدوير المتصفحات حسب الذاكرة وعدد البحث والعمر"""
+
+    def make(self, states):
+        manager = BrowserManager(browser_count=len(states), headless=True)
+        rebuilt = []
+
+        async def fake_setup(browser):
+            rebuilt.append(browser.id)
+            browser.state = BrowserState.READY
+            browser.created_at = time.time()
+            browser.lookups_total = 0
+            manager._release_browser(browser)
+
+        manager._setup_browser = fake_setup
+        for i, state in enumerate(states):
+            browser = BrowserInstance(id=f"browser_{i+1}", state=state, created_at=time.time())
+            manager.browsers.append(browser)
+            manager._release_browser(browser)
+        recycler = BrowserRecycler(manager, RecycleConfig(max_rss_mb=500, max_lookups=100, max_age=600))
+        return manager, recycler, rebuilt
+
+    @pytest.mark.asyncio
+    async def test_recycles_one_idle_browser_at_a_time(self):
+        """اختبار إعادة تدوير خانة متاحة واحدة في كل فحص مع تسجيل السبب"""
+        manager, recycler, rebuilt = self.make([BrowserState.READY, BrowserState.READY, BrowserState.BUSY])
+        first, second, busy = manager.browsers
+        first.lookups_total = 150
+        second.rss_mb = 900
+        busy.created_at = time.time() - 3600
+
+        assert (await recycler.evaluate()) is second
+        assert (await recycler.evaluate()) is first
+        # الخانة المشغولة تنتظر حتى تصبح متاحة
+        assert await recycler.evaluate() is None
+        assert rebuilt == ["browser_2", "browser_1"]
+        assert first.last_recycle_reason == 'lookups' and second.last_recycle_reason == 'memory'
+        assert recycler.get_status()['memory'] == 1
+
+        status = await manager.get_status()
+        assert status['browsers'][0]['recycle_count'] == 1
+
+    def test_memory_limit_skips_shared_slots(self):
+        """اختبار أن حد الذاكرة لا يُطبق على الخانات المشتركة (إعادة تدويرها لا تخفض RSS العملية)"""
+        manager, recycler, _ = self.make([BrowserState.READY])
+        browser = manager.browsers[0]
+        browser.rss_mb = 900
+        assert recycler.recycle_reason(browser) == 'memory'
+        browser.owns_browser = False
+        assert recycler.recycle_reason(browser) is None
+
+    @pytest.mark.asyncio
+    async def test_waits_while_another_slot_is_out_of_rotation(self):
+        """اختبار عدم إعادة التدوير أثناء تهيئة خانة أخرى (السعة لا تقل عن N-1)"""
+        manager, recycler, rebuilt = self.make([BrowserState.READY, BrowserState.INITIALIZING])
+        manager.browsers[0].rss_mb = 900
+        assert await recycler.evaluate() is None
+        assert rebuilt == []
+
+class HangingPage:
+    """صفحة وهمية لا يظهر فيها حقل الإدخال أبداً"""
+
+    async def wait_for_selector(self, selector, **kwargs):
+        await asyncio.sleep(3600)
+
+class TestLookupDeadline:
+    """اختبارات مهلة البحث ومراقبة الخانات العالقة"""
+
+    @pytest.mark.asyncio
+    async def test_hung_lookup_is_cut_at_deadline(self):
+        """اختبار قطع البحث المعلق عند المهلة وإعادة بناء الخانة"""
+        manager = BrowserManager(browser_count=1, headless=True)
+        recycled = []
+
+        async def fake_recycle(browser, reason):
+            recycled.append((browser.id, reason))
+
+        manager.force_recycle_browser = fake_recycle
+        browser = BrowserInstance(id="browser_1", page=HangingPage(), state=BrowserState.BUSY)
+        manager.browsers = [browser]
+
+        started = time.monotonic()
+        result = await manager.process_request("1", browser=browser, deadline=time.time() + 0.1)
+        await asyncio.sleep(0)
+
+        assert result['timed_out'] and not result['success']
+        assert time.monotonic() - started < 1
+        assert recycled == [("browser_1", "deadline")]
+        assert manager.deadline_stats['deadline_exceeded'] == 1
+
+    @pytest.mark.asyncio
+    async def test_request_expires_in_queue_without_taking_browser(self):
+        """اختبار انتهاء مهلة طلب في قائمة الانتظار دون حجز متصفح له"""
+        manager = FakeBrowserManager(delay=0.3, browser_count=1)
+        queue = await start_queue(manager)
+        try:
+            busy = asyncio.create_task(queue.submit_request("busy"))
+            await asyncio.sleep(0.01)
+            result = await queue.submit_request("late", deadline=time.time() + 0.05)
+            assert result['timed_out']
+            assert (await busy)['success']
+            await asyncio.sleep(0.05)
+            assert manager.calls == ["busy"]
+            assert queue.get_queue_status()['expired_in_queue'] == 1
+        finally:
+            await queue.stop()
+
+    @pytest.mark.asyncio
+    async def test_watchdog_rebuilds_stuck_browsers(self):
+        """اختبار كشف الخانات العالقة في BUSY أو INITIALIZING وإعادة بنائها"""
+        manager = BrowserManager(browser_count=3, headless=True)
+        recycled = []
+
+        async def fake_recycle(browser, reason):
+            recycled.append((browser.id, reason))
+
+        manager.force_recycle_browser = fake_recycle
+        now = time.time()
+        manager.browsers = [
+            BrowserInstance(id="busy", state=BrowserState.BUSY, state_since=now - 500),
+            BrowserInstance(id="init", state=BrowserState.INITIALIZING, state_since=now - 500),
+            BrowserInstance(id="fresh", state=BrowserState.BUSY, state_since=now - 5),
+        ]
+        recycler = BrowserRecycler(manager, RecycleConfig(stuck_busy_limit=60, stuck_initializing_limit=120))
+
+        stuck = await recycler.check_stuck()
+        await asyncio.sleep(0)
+
+        assert [browser.id for browser in stuck] == ["busy", "init"]
+        assert recycled == [("busy", "stuck_busy"), ("init", "stuck_initializing")]
+        assert recycler.get_status()['stuck_busy'] == 1
+
+    @pytest.mark.asyncio
+    async def test_force_recycle_cancels_hung_lookup_before_rebuild(self):
+        """اختبار إلغاء البحث العالق قبل إعادة البناء القسري دون إعادة تجهيز مكررة أو تحرير الخانة مرتين"""
+        manager = BrowserManager(browser_count=1, headless=True)
+        setups, resets = [], []
+
+        async def fake_setup(browser):
+            setups.append(browser.id)
+            browser.state = BrowserState.READY
+            manager._release_browser(browser)
+
+        async def fake_reset(browser, result=None):
+            resets.append(browser.id)
+
+        manager._setup_browser = fake_setup
+        manager._reset_browser_immediate = fake_reset
+        browser = BrowserInstance(id="browser_1", page=HangingPage(), state=BrowserState.BUSY)
+        manager.browsers = [browser]
+
+        lookup = asyncio.create_task(manager.process_request("1", browser=browser))
+        await asyncio.sleep(0.05)
+        await manager.force_recycle_browser(browser, 'stuck_busy')
+        result = await lookup
+        await asyncio.sleep(0)
+
+        assert not result['success'] and result['browser_id'] == "browser_1"
+        assert setups == ["browser_1"] and resets == []
+        assert list(manager._idle_browsers) == [browser] and browser.active_task is None
+        assert manager.deadline_stats['cancelled_mid_lookup'] == 0
+
+class TestPriorityQueue:
+    """اختبارات أولوية الطلبات ومهلها في قائمة الانتظار"""
+
+    @pytest.mark.asyncio
+    async def test_highest_priority_dispatched_first(self):
+        """اختبار خدمة الأولوية الأعلى أولاً ثم الأقرب مهلة داخل نفس الأولوية"""
+        manager = FakeBrowserManager(delay=0.05, browser_count=1)
+        queue = await start_queue(manager)
+        try:
+            first = asyncio.create_task(queue.submit_request("running"))
+            await asyncio.sleep(0.01)
+            now = time.time()
+            waiting = [
+                asyncio.create_task(queue.submit_request("bulk", priority="bulk")),
+                asyncio.create_task(queue.submit_request("normal-late", deadline=now + 20)),
+                asyncio.create_task(queue.submit_request("normal-soon", deadline=now + 10)),
+                asyncio.create_task(queue.submit_request("high", priority="high")),
+            ]
+            await asyncio.gather(first, *waiting)
+            assert manager.calls == ["running", "high", "normal-soon", "normal-late", "bulk"]
+        finally:
+            await queue.stop()
+
+    @pytest.mark.asyncio
+    async def test_joining_request_promotes_priority_and_deadline(self):
+        """اختبار أن انضمام طلب high لبحث bulk منتظر يرفع أولويته ويمدد مهلته"""
+        manager = FakeBrowserManager(delay=0.05, browser_count=1)
+        queue = await start_queue(manager)
+        try:
+            first = asyncio.create_task(queue.submit_request("running"))
+            await asyncio.sleep(0.01)
+            now = time.time()
+            bulk = asyncio.create_task(queue.submit_request("x", deadline=now + 0.08, priority="bulk"))
+            normal = asyncio.create_task(queue.submit_request("y"))
+            await asyncio.sleep(0.01)
+            high = asyncio.create_task(queue.submit_request("x", deadline=now + 20, priority="high"))
+            results = await asyncio.gather(first, bulk, normal, high)
+
+            assert manager.calls == ["running", "x", "y"]
+            # المهلة الممددة تشمل المنتظر الأول أيضاً - النتيجة مشتركة
+            assert all(result['success'] for result in results)
+            assert queue.get_queue_status()['promoted'] == 1
+        finally:
+            await queue.stop()
+
+    @pytest.mark.asyncio
+    async def test_depth_ignores_stale_entries(self):
+        """اختبار أن عمق قائمة الانتظار لا يحسب المدخلات المكررة أو الطلبات الملغاة والمنتهية"""
+        manager = FakeBrowserManager(delay=0.1, browser_count=1)
+        queue = await start_queue(manager)
+        try:
+            busy = asyncio.create_task(queue.submit_request("busy"))
+            await asyncio.sleep(0.01)
+            bulk = asyncio.create_task(queue.submit_request("x", priority="bulk"))
+            abandoned = asyncio.create_task(queue.submit_request("y"))
+            expiring = asyncio.create_task(queue.submit_request("z", deadline=time.time() + 0.02))
+            await asyncio.sleep(0.01)
+            high = asyncio.create_task(queue.submit_request("x", priority="high"))
+            await asyncio.sleep(0)
+            assert queue.get_queue_status()['promoted'] == 1
+            assert queue.pending_count == 3
+
+            abandoned.cancel()
+            await asyncio.gather(abandoned, expiring, return_exceptions=True)
+            # مدخلات x القديمة و y و z ما زالت في قائمة الأولوية لكنها لا تُحسب
+            assert queue.pending_requests.qsize() > 1
+            assert queue.pending_count == queue.get_queue_status()['pending_requests'] == 1
+
+            await asyncio.gather(busy, bulk, high)
+            assert queue.pending_count == 0
+        finally:
+            await queue.stop()
+
+    @pytest.mark.asyncio
+    async def test_unreachable_deadline_dropped_without_browser(self):
+        """اختبار إسقاط الطلب الذي لا يكفي وقته لإكمال البحث بخطأ مميز"""
+        manager = FakeBrowserManager(delay=0.2, browser_count=1)
+        queue = await start_queue(manager)
+        try:
+            queue._lookup_samples.append(1.0)
+            first = asyncio.create_task(queue.submit_request("running"))
+            await asyncio.sleep(0.01)
+            result = await queue.submit_request("tight", deadline=time.time() + 0.5)
+            await first
+
+            assert result['expired'] and result['timed_out']
+            assert manager.calls == ["running"]
+            assert queue.get_queue_status()['dropped_unreachable'] == 1
+        finally:
+            await queue.stop()
+
+class TestClientCancellation:
+    """اختبارات إلغاء الطلبات التي تخلى عنها العميل"""
+
+    @pytest.mark.asyncio
+    async def test_cancelled_queued_request_never_takes_browser(self):
+        """اختبار عدم وصول طلب ملغى في قائمة الانتظار إلى أي متصفح"""
+        manager = FakeBrowserManager(delay=0.1, browser_count=1)
+        queue = await start_queue(manager)
+        try:
+            busy = asyncio.create_task(queue.submit_request("busy"))
+            await asyncio.sleep(0.01)
+            abandoned = asyncio.create_task(queue.submit_request("abandoned"))
+            await asyncio.sleep(0.01)
+            abandoned.cancel()
+            await asyncio.gather(abandoned, return_exceptions=True)
+
+            assert (await busy)['success']
+            assert (await queue.submit_request("next"))['success']
+            assert manager.calls == ["busy", "next"]
+            assert queue.get_queue_status()['cancelled'] == 1
+        finally:
+            await queue.stop()
+
+    @pytest.mark.asyncio
+    async def test_cancel_mid_lookup_resets_browser(self):
+        """اختبار قطع البحث الجاري عند الإلغاء وإعادة تجهيز الخانة بدلاً من تركها في حالة غير معروفة"""
+        manager = BrowserManager(browser_count=1, headless=True)
+        resets = []
+
+        async def fake_reset(browser, result=None):
+            resets.append((browser.id, result['error']))
+
+        manager._reset_browser_immediate = fake_reset
+        browser = BrowserInstance(id="browser_1", page=HangingPage(), state=BrowserState.BUSY)
+        manager.browsers = [browser]
+
+        lookup = asyncio.create_task(manager.process_request("1", browser=browser))
+        await asyncio.sleep(0.05)
+        lookup.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await lookup
+        await asyncio.sleep(0)
+
+        assert resets == [("browser_1", "cancelled")]
+        assert manager.deadline_stats['cancelled_mid_lookup'] == 1
+
+    @pytest.mark.asyncio
+    async def test_single_flight_cancels_only_when_all_waiters_leave(self):
+        """اختبار استمرار العملية المشتركة ما دام هناك منتظر وإلغائها عند مغادرة الجميع"""
+        flight = SingleFlight()
+        started = []
+
+        async def operation():
+            started.append(1)
+            await asyncio.sleep(0.1)
+            return "shared"
+
+        first = asyncio.create_task(flight.do("key", operation))
+        second = asyncio.create_task(flight.do("key", operation))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "shared"
+        assert flight.stats['abandoned'] == 0
+
+        waiters = [asyncio.create_task(flight.do("other", operation)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        assert flight.stats['abandoned'] == 1
+        assert (await flight.do("other", operation)) == "shared"
+        assert len(started) == 3
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات السجلات المنظمة
+"""
+
+import json
+import logging
+
+from structured_logging import RateLimitFilter, setup_logging, shutdown_logging
+
+class TestStructuredLogging:
+    """اختبارات الكتابة من خيط منفصل وحد تكرار الرسائل"""
+
+    def test_json_lines_with_module_levels(self, tmp_path):
+        """اختبار كتابة JSON مع حقول extra واحترام مستوى كل وحدة"""
+        path = tmp_path / "app.log"
+        setup_logging("INFO", {"istation.test.quiet": "WARNING"}, str(path), rate=0)
+        try:
+            logging.getLogger("istation.test").info("✅ تم العثور على %s", "Player", extra={"request_id": "r1"})
+            logging.getLogger("istation.test.quiet").info("رسالة مخفية")
+            logging.getLogger("istation.test").debug("رسالة debug مخفية")
+        finally:
+            shutdown_logging()
+
+        lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        assert len(lines) == 1
+        assert lines[0]["msg"] == "✅ تم العثور على Player"
+        assert (lines[0]["level"], lines[0]["logger"], lines[0]["request_id"]) == ("info", "istation.test", "r1")
+
+    def test_rate_limit_counts_suppressed(self, monkeypatch):
+        """اختبار حذف الرسائل المتكررة الزائدة وإضافة عددها لأول رسالة تمر بعدها"""
+        now = [100.0]
+        monkeypatch.setattr("structured_logging.time.monotonic", lambda: now[0])
+        limiter = RateLimitFilter(rate=1, burst=2)
+
+        def record(msg):
+            return logging.LogRecord("istation.test", logging.INFO, __file__, 1, msg, ("x",), None)
+
+        passed = [limiter.filter(record("طلب %s")) for _ in range(5)]
+        assert passed == [True, True, False, False, False]
+        assert limiter.filter(record("رسالة أخرى %s"))
+
+        now[0] += 1
+        later = record("طلب %s")
+        assert limiter.filter(later) and later.suppressed == 3
+
+    def test_warnings_never_suppressed(self):
+        """اختبار أن التحذيرات والأخطاء تمر دائماً مهما تكررت"""
+        limiter = RateLimitFilter(rate=1, burst=1)
+        for level in (logging.WARNING, logging.ERROR):
+            records = [logging.LogRecord("istation.test", level, __file__, 1, "فشل %s", ("x",), None) for _ in range(5)]
+            assert all(limiter.filter(record) for record in records)
+
+    def test_suppressed_count_flushed_at_shutdown(self, tmp_path):
+        """اختبار كتابة عدد الرسائل المحذوفة عند الإيقاف إذا توقف التكرار"""
+        path = tmp_path / "app.log"
+        setup_logging("INFO", path=str(path), rate=1, burst=2)
+        try:
+            for i in range(5):
+                logging.getLogger("istation.test").info("طلب %s", i)
+        finally:
+            shutdown_logging()
+
+        lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        assert len(lines) == 3
+        assert lines[-1]["suppressed"] == 3 and "طلب %s" in lines[-1]["msg"]
+
+    def test_mutable_args_snapshot_at_call(self, tmp_path):
+        """اختبار أن قاموساً يتغير بعد التسجيل يُكتب بقيمته وقت الاستدعاء"""
+        path = tmp_path / "app.log"
+        setup_logging("INFO", path=str(path), rate=0)
+        try:
+            response = {"status": "pending"}
+            logging.getLogger("istation.test").info("📋 Raw response: %s", response)
+            response["status"] = "changed"
+        finally:
+            shutdown_logging()
+
+        lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        assert lines[0]["msg"] == "📋 Raw response: {'status': 'pending'}"
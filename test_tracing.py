@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبارات التتبع بالـ spans
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import tracing
+from test_pubg_queue import FakeBrowserManager, start_queue
+
+class MemoryExporter:
+    """مُصدِّر وهمي يحتفظ بالـ spans في قائمة"""
+    dropped = 0
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def shutdown(self):
+        pass
+
+@pytest.fixture
+def exporter(monkeypatch):
+    """tracer عام يتتبع كل الطلبات ويحفظ الـ spans في الذاكرة"""
+    memory = MemoryExporter()
+    monkeypatch.setattr(tracing, "_tracer", tracing.Tracer(1.0, memory))
+    return memory
+
+class TestTracing:
+    """اختبارات Tracer والتصدير وانتقال السياق"""
+
+    @pytest.mark.asyncio
+    async def test_child_spans_follow_tasks(self, exporter):
+        """اختبار ربط الـ spans الفرعية بالـ trace عبر المهام وتسجيل الأخطاء"""
+        async def phase():
+            with tracing.start_span("child", {"step": 1}):
+                await asyncio.sleep(0)
+
+        with tracing.start_span("root", root=True) as root:
+            await asyncio.create_task(phase())
+            with pytest.raises(ValueError):
+                with tracing.start_span("failing"):
+                    raise ValueError("boom")
+
+        child, failing, exported_root = exporter.spans
+        assert exported_root["parentSpanId"] is None and exported_root["spanId"] == root.span_id
+        assert child["traceId"] == root.trace_id and child["parentSpanId"] == root.span_id
+        assert child["attributes"] == {"step": 1}
+        assert failing["status"] == "error" and "boom" in failing["attributes"]["error"]
+        assert len(root.trace_id) == 32 and len(root.span_id) == 16
+
+        # بدون trace نشط لا تُسجل spans
+        with tracing.start_span("orphan"):
+            pass
+        assert len(exporter.spans) == 3
+
+    def test_sampled_out_traces_create_nothing(self):
+        """اختبار عدم إنشاء أي span للطلبات غير المختارة"""
+        exporter = MemoryExporter()
+        tracer = tracing.Tracer(0.0, exporter)
+        with tracer.start_span("root", root=True) as root:
+            assert root is tracing.NOOP_SPAN
+            with tracing.use_span(root):
+                assert tracer.start_span("child") is tracing.NOOP_SPAN
+        assert exporter.spans == []
+        assert tracer.get_stats()["traces_sampled_out"] == 1
+
+    @pytest.mark.asyncio
+    async def test_queue_phases_recorded_under_request_trace(self, exporter):
+        """اختبار تسجيل انتظار القائمة والحصول على المتصفح تحت trace الطلب رغم مروره بموزع القائمة"""
+        queue = await start_queue(FakeBrowserManager(delay=0.01, browser_count=1))
+        try:
+            with tracing.start_span("get_player_name", root=True) as root:
+                await queue.submit_request("1")
+        finally:
+            await queue.stop()
+
+        names = {span["name"]: span for span in exporter.spans}
+        assert {"pubg.queue_wait", "pubg.browser_checkout", "get_player_name"} <= set(names)
+        assert names["pubg.queue_wait"]["parentSpanId"] == root.span_id
+        assert names["pubg.browser_checkout"]["attributes"] == {"browser_id": "fake_1"}
+
+    def test_json_lines_exporter(self, tmp_path):
+        """اختبار كتابة الـ spans كسطور JSON من الخيط الخلفي"""
+        path = tmp_path / "traces.jsonl"
+        exporter = tracing.JsonLinesExporter(str(path))
+        tracer = tracing.Tracer(1.0, exporter)
+        with tracer.start_span("root", {"game": "pubg"}, root=True):
+            pass
+        exporter.shutdown()
+
+        span = json.loads(path.read_text(encoding="utf-8").strip())
+        assert span["name"] == "root" and span["attributes"] == {"game": "pubg"}
+        assert span["endTimeUnixNano"] >= span["startTimeUnixNano"]
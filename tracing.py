@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lightweight Tracing
+تتبع طلب البحث من الـ endpoint حتى المتصفح أو طلب HTTP بـ span لكل مرحلة
+- معرفات بصيغة OpenTelemetry (trace_id من 32 خانة hex و span_id من 16) وحقول JSON بأسماء OTLP
+- الـ span الحالي محفوظ في contextvars فينتقل تلقائياً للمهام الفرعية
+- أخذ العينات عند بداية الـ trace فقط: الطلبات غير المختارة لا تنشئ أي span
+- الكتابة لملف JSON lines أو stdout في خيط منفصل حتى لا تُوقف event loop
+"""
+
+import contextvars
+import json
+import queue
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """مرحلة واحدة موقوتة داخل trace"""
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns",
+                 "attributes", "status", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]] = None, start_ns: Optional[int] = None):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = dict(attributes) if attributes else {}
+        self.status = "ok"
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def end(self, end_ns: Optional[int] = None):
+        """إنهاء الـ span وإرساله للتصدير (مرة واحدة فقط)"""
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        self.tracer.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.status = "cancelled" if exc_type.__name__ == "CancelledError" else "error"
+            self.attributes.setdefault("error", f"{exc_type.__name__}: {exc}")
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+class _NoopSpan:
+    """span فارغ للطلبات غير المختارة في العينة - جميع العمليات بلا تكلفة"""
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def end(self, end_ns: Optional[int] = None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+class JsonLinesExporter:
+    """كتابة الـ spans كسطور JSON لملف أو stdout من خيط خلفي"""
+
+    def __init__(self, path: str = "-", max_pending: int = 10000):
+        self.path = path
+        self.dropped = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Dict[str, Any]):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            # الخيط متأخر - إسقاط الـ span أفضل من إيقاف الطلبات
+            self.dropped += 1
+
+    def _run(self):
+        stream = sys.stdout if self.path == "-" else open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                span = self._queue.get()
+                if span is None:
+                    break
+                stream.write(json.dumps(span, ensure_ascii=False, default=str) + "\n")
+                if self._queue.empty():
+                    stream.flush()
+        finally:
+            stream.flush()
+            if stream is not sys.stdout:
+                stream.close()
+
+    def shutdown(self, timeout: float = 5.0):
+        """كتابة الـ spans المتبقية وإيقاف الخيط"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+class Tracer:
+    """إنشاء الـ spans وأخذ العينات عند بداية كل trace"""
+
+    def __init__(self, sample_ratio: float = 0.0, exporter: Optional[JsonLinesExporter] = None):
+        self.sample_ratio = sample_ratio
+        self.exporter = exporter
+        self.stats = {"traces_started": 0, "traces_sampled_out": 0, "spans_exported": 0}
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None, root: bool = False,
+                   parent=None):
+        """
+        بدء span جديد تحت الـ span الحالي (أو parent إذا مُرر)
+
+        Args:
+            root: بدء trace جديد (مع أخذ العينات) - الـ spans الأخرى بدون trace نشط لا تُسجل
+        """
+        if root:
+            self.stats["traces_started"] += 1
+            if self.exporter is None or random.random() >= self.sample_ratio:
+                self.stats["traces_sampled_out"] += 1
+                return NOOP_SPAN
+            return Span(self, name, "%032x" % random.getrandbits(128), None, attributes)
+
+        if parent is None:
+            parent = _current_span.get()
+        if parent is None or parent is NOOP_SPAN:
+            return NOOP_SPAN
+        return Span(self, name, parent.trace_id, parent.span_id, attributes)
+
+    def record_span(self, name: str, parent, start: float, end: float,
+                    attributes: Optional[Dict[str, Any]] = None):
+        """تسجيل مرحلة انتهت بالفعل بأوقات time.time معروفة (مثل الانتظار في قائمة الطلبات)"""
+        if parent is None or parent is NOOP_SPAN:
+            return
+        span = Span(self, name, parent.trace_id, parent.span_id, attributes, start_ns=int(start * 1e9))
+        span.end(int(end * 1e9))
+
+    def export(self, span: Span):
+        if self.exporter is not None:
+            self.stats["spans_exported"] += 1
+            self.exporter.export(span.to_dict())
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "sample_ratio": self.sample_ratio,
+            "dropped": self.exporter.dropped if self.exporter else 0
+        }
+
+_tracer = Tracer()
+
+def configure(sample_ratio: float, path: str = "-") -> Tracer:
+    """تفعيل التتبع بنسبة عينات معينة والتصدير لملف (أو "-" لـ stdout)"""
+    global _tracer
+    shutdown()
+    _tracer = Tracer(sample_ratio, JsonLinesExporter(path))
+    return _tracer
+
+def shutdown():
+    """إيقاف التصدير وكتابة الـ spans المتبقية"""
+    if _tracer.exporter is not None:
+        _tracer.exporter.shutdown()
+        _tracer.exporter = None
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None, root: bool = False, parent=None):
+    """بدء span بالـ tracer العام (انظر Tracer.start_span)"""
+    return _tracer.start_span(name, attributes, root, parent)
+
+def record_span(name: str, parent, start: float, end: float, attributes: Optional[Dict[str, Any]] = None):
+    """تسجيل مرحلة منتهية بالـ tracer العام (انظر Tracer.record_span)"""
+    _tracer.record_span(name, parent, start, end, attributes)
+
+def current_span():
+    """الـ span النشط في السياق الحالي أو None"""
+    return _current_span.get()
+
+@contextmanager
+def use_span(span):
+    """تفعيل span موجود في سياق آخر (مثل مهمة معالجة طلب أنشأها موزع قائمة الانتظار)"""
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)